@@ -0,0 +1,193 @@
+"""
+Índice persistente de canciones ya descargadas
+"""
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import CACHE_DIR, ensure_dirs
+
+AUDIO_EXTENSIONS = {'.mp3', '.m4a', '.opus', '.ogg', '.webm', '.flac', '.wav', '.aac'}
+
+_VIDEO_ID_RE = re.compile(r'(?:v=|youtu\.be/|shorts/|embed/)([0-9A-Za-z_-]{11})')
+_FILENAME_ID_RE = re.compile(r'\s*\[([0-9A-Za-z_-]{11})\]$')
+
+
+def extract_video_id(url):
+    """Obtiene el ID de video de una URL de YouTube sin acceder a la red"""
+    if not url:
+        return None
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def split_filename_id(stem):
+    """
+    Separa el ID de un nombre de archivo con el patrón "Título [ID]"
+    
+    Returns:
+        tuple: (título, ID de video o None)
+    """
+    match = _FILENAME_ID_RE.search(stem)
+    if not match:
+        return stem, None
+    return stem[:match.start()], match.group(1)
+
+
+def normalize_title(title):
+    """Normaliza un título para compararlo con un nombre de archivo"""
+    return ' '.join(re.sub(r'[^\w]+', ' ', title.lower()).split())
+
+
+class DownloadArchive:
+    """Índice en SQLite de archivos descargados por ID de video y formato"""
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Ruta del archivo SQLite (por defecto en CACHE_DIR)
+        """
+        if path is None:
+            ensure_dirs()
+        self.path = str(path or CACHE_DIR / 'downloads.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS downloads ('
+            ' path TEXT PRIMARY KEY,'
+            ' folder TEXT NOT NULL,'
+            ' video_id TEXT,'
+            ' title TEXT,'
+            ' norm_title TEXT,'
+            ' codec TEXT,'
+            ' quality TEXT,'
+            ' created REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS downloads_id ON downloads (video_id, folder)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS downloads_title ON downloads (norm_title, folder)')
+        self._conn.commit()
+    
+    def find(self, folder, codec, quality, video_id=None, title=None):
+        """
+        Busca un archivo ya descargado en la carpeta con el mismo formato
+        
+        Args:
+            folder (str): Carpeta de destino
+            codec (str): Códec de salida (ej. 'mp3')
+            quality (str): Calidad de salida (ej. '192')
+            video_id (str): ID de YouTube (opcional)
+            title (str): Título del video, para archivos indexados sin ID
+            
+        Returns:
+            str: Ruta del archivo existente, o None
+        """
+        folder = str(Path(folder).resolve())
+        candidates = []
+        with self._lock:
+            if video_id:
+                candidates += self._conn.execute(
+                    'SELECT path, codec, quality FROM downloads WHERE video_id = ? AND folder = ?',
+                    (video_id, folder)
+                ).fetchall()
+            if title:
+                candidates += self._conn.execute(
+                    'SELECT path, codec, quality FROM downloads '
+                    'WHERE norm_title = ? AND folder = ? AND video_id IS NULL',
+                    (normalize_title(title), folder)
+                ).fetchall()
+        
+        for path, row_codec, row_quality in candidates:
+            # Los archivos indexados desde la carpeta no conocen la calidad
+            if row_codec != codec or (row_quality is not None and row_quality != quality):
+                continue
+            if Path(path).exists():
+                return path
+        return None
+    
+    def add(self, path, video_id=None, title=None, codec=None, quality=None):
+        """Registra un archivo descargado"""
+        path = Path(path).resolve()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO downloads '
+                '(path, folder, video_id, title, norm_title, codec, quality, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (str(path), str(path.parent), video_id, title,
+                 normalize_title(title) if title else None, codec, quality, time.time())
+            )
+            self._conn.commit()
+    
+    def add_many(self, entries):
+        """
+        Registra archivos encontrados en disco en una sola transacción
+        
+        Los que ya estaban indexados conservan su ID y su calidad.
+        
+        Args:
+            entries (list): Tuplas (ruta, ID de video, título, códec)
+        """
+        rows = []
+        now = time.time()
+        for path, video_id, title, codec in entries:
+            path = Path(path).resolve()
+            rows.append((str(path), str(path.parent), video_id, title,
+                         normalize_title(title) if title else None, codec, None, now))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO downloads '
+                '(path, folder, video_id, title, norm_title, codec, quality, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO NOTHING',
+                rows
+            )
+            self._conn.commit()
+    
+    def remove(self, paths):
+        """Quita del índice archivos borrados o movidos"""
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM downloads WHERE path = ?', [(str(Path(path).resolve()),) for path in paths]
+            )
+            self._conn.commit()
+    
+    def rebuild(self, folder):
+        """
+        Reconstruye el índice a partir de los archivos de una carpeta
+        
+        Los archivos con el patrón "Título [ID].ext" conservan su ID; el
+        resto se indexa por título.
+        
+        Args:
+            folder (str): Carpeta a escanear (incluye subcarpetas)
+            
+        Returns:
+            int: Número de archivos indexados
+        """
+        folder = Path(folder).resolve()
+        rows = []
+        for file in folder.rglob('*'):
+            if not file.is_file() or file.suffix.lower() not in AUDIO_EXTENSIONS:
+                continue
+            title, video_id = split_filename_id(file.stem)
+            rows.append((str(file), str(file.parent), video_id, title, normalize_title(title),
+                         file.suffix.lower().lstrip('.'), None, file.stat().st_mtime))
+        
+        with self._lock:
+            # Quitar entradas de archivos que ya no existen
+            known = self._conn.execute(
+                'SELECT path FROM downloads WHERE folder = ? OR folder LIKE ?',
+                (str(folder), str(folder / '%'))
+            ).fetchall()
+            missing = [(path,) for (path,) in known if not Path(path).exists()]
+            self._conn.executemany('DELETE FROM downloads WHERE path = ?', missing)
+            # Mantener ID y calidad si el archivo ya estaba indexado
+            self._conn.executemany(
+                'INSERT INTO downloads '
+                '(path, folder, video_id, title, norm_title, codec, quality, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO NOTHING',
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
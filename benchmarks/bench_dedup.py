@@ -0,0 +1,43 @@
+"""
+Tiempo de detección de duplicados en colas grandes
+
+Genera una cola con títulos aleatorios y le añade copias con el ID cambiado
+y etiquetas como "(Official Video)" o "[Lyrics]".
+
+Uso: python benchmarks/bench_dedup.py [canciones] [copias]
+"""
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dedup import find_duplicates
+
+SUFFIXES = [' (Official Video)', ' [Lyrics]', ' | Official Audio', ' (Letra)']
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else count // 10
+    random.seed(0)
+    words = [''.join(random.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(30000)]
+    songs = [{'id': f"{i:011d}", 'title': ' '.join(random.sample(words, 4)), 'duration': random.randint(120, 400)}
+             for i in range(count)]
+    for i, song in enumerate(random.sample(songs, copies)):
+        songs.append({
+            'id': f"x{i:010d}",
+            'title': song['title'] + random.choice(SUFFIXES),
+            'duration': song['duration'] + random.randint(-3, 3),
+        })
+    
+    start = time.perf_counter()
+    duplicates = find_duplicates(songs)
+    elapsed = time.perf_counter() - start
+    print(f"{len(songs)} canciones, {copies} copias: {len(duplicates)} duplicados en {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Tiempo de búsqueda en el catálogo de la biblioteca con muchos archivos
+
+Llena un catálogo temporal con títulos aleatorios y mide búsquedas por
+prefijo, aproximadas (con faltas de ortografía) y por ID de video.
+
+Uso: python benchmarks/bench_library.py [archivos]
+"""
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from library import LibraryCatalog
+
+QUERIES = ['bohem rhap', 'queen bohemian', 'bohemain rapsody', 'qeen bohemian rhapsody official',
+           'fJ9rUzIMcZQ', 'zzzz qqq']
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(0)
+    words = [''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(3, 9)))
+             for _ in range(20000)]
+    
+    with tempfile.TemporaryDirectory() as folder:
+        library = LibraryCatalog(Path(folder) / 'library.sqlite3')
+        entries = []
+        for i in range(count):
+            title = ' '.join(random.choice(words) for _ in range(random.randint(2, 5)))
+            info = {'id': f"{i:011d}", 'title': title, 'uploader': random.choice(words), 'duration': 200}
+            entries.append((Path(folder) / f"{i}.mp3", info, 'mp3'))
+        entries.append((Path(folder) / 'queen.mp3', {
+            'id': 'fJ9rUzIMcZQ', 'title': 'Queen – Bohemian Rhapsody (Official Video)',
+            'uploader': 'Queen Official', 'duration': 355,
+        }, 'mp3'))
+        
+        start = time.perf_counter()
+        library.add_many(entries)
+        print(f"{count} archivos indexados en {time.perf_counter() - start:.1f}s")
+        
+        for query in QUERIES:
+            library.search(query, 5)  # Calentar la caché de páginas
+            start = time.perf_counter()
+            results = library.search(query, 5)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = results[0]['title'] if results else '-'
+            print(f"  {query!r}: {elapsed:.1f} ms, {len(results)} resultados, primero: {best[:40]}")
+        library.close()
+
+
+if __name__ == "__main__":
+    main()
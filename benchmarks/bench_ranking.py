@@ -0,0 +1,44 @@
+"""
+Tiempo de ordenar resultados de búsqueda con ResultRanker
+
+Uso: python benchmarks/bench_ranking.py [búsquedas] [resultados_por_búsqueda]
+"""
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ranking import ResultRanker
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_query = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    random.seed(0)
+    words = [''.join(random.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(5000)]
+    batches = []
+    for _ in range(queries):
+        query = ' '.join(random.sample(words, 4))
+        results = [{
+            'title': f"{query} {random.choice(['(Official Video)', '(Live)', 'Lyrics', ''])}",
+            'uploader': random.choice(words),
+            'duration': random.randint(60, 4000),
+            'views': random.randint(0, 10 ** 9),
+        } for _ in range(per_query)]
+        batches.append((query, results))
+    
+    ranker = ResultRanker()
+    start = time.perf_counter()
+    for query, results in batches:
+        ranker.rank(query, results)
+    elapsed = time.perf_counter() - start
+    candidates = queries * per_query
+    print(f"{candidates} resultados de {queries} búsquedas en {elapsed * 1000:.1f} ms "
+          f"({elapsed / candidates * 1e6:.1f} µs por resultado)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Tiempo de resolver una lista completa (búsqueda + orden de resultados)
+
+Simula yt-dlp con una latencia fija por petición: una búsqueda normal abre
+la página de resultados y después la de cada video; una búsqueda plana
+(extract_flat) solo la de resultados. El límite de peticiones se desactiva
+para medir solo el coste de las búsquedas.
+
+Uso: python benchmarks/bench_resolve.py [canciones] [latencia_ms] [resultados]
+"""
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from downloader import YouTubeDownloader
+from library import LibraryCatalog
+from ranking import ResultRanker
+from retry import RetryPolicy
+
+
+class FakeYDL:
+    """Devuelve resultados inventados tras esperar la latencia de cada petición"""
+    
+    def __init__(self, opts, latency, counter):
+        self.flat = bool(opts.get('extract_flat'))
+        self.latency = latency
+        self.counter = counter
+    
+    def extract_info(self, search_query, download=False):
+        prefix, _, query = search_query.partition(':')
+        limit = int(prefix[len('ytsearch'):])
+        requests = 1 if self.flat else 1 + limit
+        self.counter.append(requests)
+        time.sleep(self.latency * requests)
+        entries = []
+        for i in range(limit):
+            entry = {
+                'id': f"{abs(hash((query, i))) % 10 ** 11:011d}",
+                'title': f"{query} {['(Official Video)', '(Live)', 'Lyrics', '', 'Cover'][i % 5]}",
+                'duration': 180 + 40 * i,
+                'channel': f"Canal {i}",
+                'view_count': 10 ** (6 - i),
+            }
+            if self.flat:
+                entry['url'] = f"https://www.youtube.com/watch?v={entry['id']}"
+            else:
+                entry.update(webpage_url=f"https://www.youtube.com/watch?v={entry['id']}", uploader=entry['channel'])
+            entries.append(entry)
+        return {'entries': entries}
+
+
+class FakeSession:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = []
+    
+    @contextmanager
+    def acquire(self, opts, **hooks):
+        yield FakeYDL(opts, self.latency, self.requests)
+
+
+def run(downloader, songs, limit, latency, flat):
+    """Resuelve la lista y retorna (segundos, peticiones)"""
+    downloader.session = FakeSession(latency)
+    search_song = downloader.search_song
+    if not flat:
+        # Comportamiento anterior: extracción completa de cada resultado
+        downloader.search_song = lambda query, limit, **kwargs: search_song(query, limit, **dict(kwargs, flat=False))
+    start = time.perf_counter()
+    resolved = sum(1 for _, _, results, error in downloader.resolve_songs(songs, limit) if results and not error)
+    elapsed = time.perf_counter() - start
+    downloader.__dict__.pop('search_song', None)
+    assert resolved == len(songs)
+    return elapsed, sum(downloader.session.requests)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    songs = [{'query': f"artista {i} - cancion {i}", 'duration': 200} for i in range(count)]
+    
+    with tempfile.TemporaryDirectory() as folder:
+        downloader = YouTubeDownloader()
+        downloader.search_cache = None
+        downloader.library = LibraryCatalog(Path(folder) / 'library.sqlite3')
+        downloader.retry = RetryPolicy(rate=0)
+        for flat in (False, True):
+            elapsed, requests = run(downloader, songs, limit, latency, flat)
+            label = 'Plana' if flat else 'Completa'
+            print(f"{label}: {count} canciones ({limit} resultados) en {elapsed:.2f}s, {requests} peticiones "
+                  f"({elapsed / count * 1000:.1f} ms por canción)")
+        downloader.library.close()
+    
+    # Lo que añade ordenar los resultados
+    entries = FakeYDL({'extract_flat': True}, 0, []).extract_info(f"ytsearch{limit}:artista - cancion")['entries']
+    results = [{'title': e['title'], 'uploader': e['channel'], 'duration': e['duration'], 'views': e['view_count']}
+               for e in entries]
+    ranker = ResultRanker()
+    start = time.perf_counter()
+    for _ in range(count):
+        ranker.rank('artista - cancion', results, 200)
+    print(f"Ordenar: {(time.perf_counter() - start) / count * 1e6:.1f} µs por canción")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark del planificador de descargas con un extractor falso (sin red)
+
+Uso: python benchmarks/bench_scheduler.py [canciones] [latencia_s]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scheduler import DownloadScheduler
+
+
+class FakeDownloader:
+    """Simula la latencia de red + FFmpeg de download_song"""
+    
+    def __init__(self, latency):
+        self.latency = latency
+    
+    def download_song(self, url, output_path=None, title=None, force=False, progress=None):
+        time.sleep(self.latency)
+        return True, f"✓ Descargado: {url}", 'transcode'
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    songs = [{'url': f"fake://{i}", 'title': f"Canción {i}"} for i in range(count)]
+    
+    for workers in (1, 2, 4, 8):
+        scheduler = DownloadScheduler(FakeDownloader(latency), workers=workers)
+        summary = scheduler.run(songs)
+        print(f"workers={workers}: {summary['elapsed']:.2f}s, "
+              f"{summary['songs_per_minute']:.0f} canciones/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark del coste por llamada de crear YoutubeDL frente al pool
+
+Uso: python benchmarks/bench_session.py [llamadas]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import yt_dlp
+from session import YDLSessionPool
+
+OPTS = {'quiet': True, 'no_warnings': True}
+
+
+def bench_fresh(calls):
+    """Crea una instancia nueva por llamada (comportamiento anterior)"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        with yt_dlp.YoutubeDL(dict(OPTS)) as ydl:
+            ydl.get_info_extractor('Youtube')
+    return time.perf_counter() - start
+
+
+def bench_pool(calls):
+    """Reutiliza instancias del pool"""
+    pool = YDLSessionPool()
+    start = time.perf_counter()
+    for _ in range(calls):
+        with pool.acquire(OPTS) as ydl:
+            ydl.get_info_extractor('Youtube')
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    fresh = bench_fresh(calls)
+    pooled = bench_pool(calls)
+    print(f"Sin pool: {fresh / calls * 1000:.2f} ms/llamada")
+    print(f"Con pool: {pooled / calls * 1000:.2f} ms/llamada")
+
+
+if __name__ == "__main__":
+    main()
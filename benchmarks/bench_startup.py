@@ -0,0 +1,68 @@
+"""
+Benchmark del tiempo de arranque (importaciones) de la GUI y del modo consola
+
+Usa "python -X importtime" en un proceso nuevo y falla si se supera el
+presupuesto o si se importa al arrancar alguna librería que debe cargarse
+en diferido.
+
+Uso: python benchmarks/bench_startup.py
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Presupuesto de importación en milisegundos (tiempo acumulado del módulo)
+BUDGETS_MS = {
+    'gui': 250,
+    'cli': 150,
+}
+# Librerías que no deben importarse al arrancar
+LAZY_MODULES = ('yt_dlp', 'pygame')
+
+
+def measure(module):
+    """
+    Importa un módulo en un proceso nuevo
+    
+    Returns:
+        tuple: (milisegundos acumulados, conjunto de módulos importados)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(result.stderr)
+    
+    total_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue
+        imported.add(name.split('.')[0])
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+def main():
+    ok = True
+    for module, budget in BUDGETS_MS.items():
+        elapsed, imported = measure(module)
+        eager = [name for name in LAZY_MODULES if name in imported]
+        status = "OK" if elapsed <= budget and not eager else "FALLO"
+        ok = ok and status == "OK"
+        print(f"{module}: {elapsed:.1f} ms (presupuesto {budget} ms) {status}")
+        if eager:
+            print(f"  importa al arrancar: {', '.join(eager)}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Segundos de CPU por canción: recodificar frente a copiar sin recodificar
+
+Genera con FFmpeg pistas de prueba como las que sirve YouTube (AAC en m4a y
+Opus en webm) y mide el tiempo de CPU de los procesos de FFmpeg al
+guardarlas como MP3 192k (recodificando) o en su propio códec (copiando).
+
+Uso: python benchmarks/bench_transcode.py [segundos_por_pista] [pistas]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import get_ffmpeg_path
+from transcoder import transcode
+
+SOURCES = {
+    'aac': ('m4a', ['-c:a', 'aac', '-b:a', '128k']),
+    'opus': ('webm', ['-c:a', 'libopus', '-b:a', '128k']),
+}
+
+
+def make_source(folder, codec, seconds):
+    """Crea una pista de prueba con el códec indicado"""
+    ext, args = SOURCES[codec]
+    path = Path(folder) / f"origen_{codec}.{ext}"
+    subprocess.run(
+        [get_ffmpeg_path(), '-y', '-loglevel', 'error', '-f', 'lavfi',
+         '-i', f"sine=frequency=440:duration={seconds}", '-ac', '2', *args, str(path)],
+        check=True
+    )
+    return path
+
+
+def children_cpu():
+    """Segundos de CPU acumulados por los procesos hijos (FFmpeg)"""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def bench(source, dest, codec, quality, copy, tracks):
+    cpu_start = children_cpu()
+    start = time.perf_counter()
+    for _ in range(tracks):
+        transcode(source, dest, codec, quality, copy=copy)
+    return (children_cpu() - cpu_start) / tracks, (time.perf_counter() - start) / tracks
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 180
+    tracks = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    if not get_ffmpeg_path():
+        print("FFmpeg no está instalado")
+        return 1
+    if os.name == 'nt':
+        print("Aviso: en Windows os.times() no cuenta la CPU de los procesos hijos")
+    
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Pistas de {seconds}s, media de {tracks} conversiones:")
+        for codec in SOURCES:
+            source = make_source(folder, codec, seconds)
+            ext = 'm4a' if codec == 'aac' else 'opus'
+            cpu, wall = bench(source, Path(folder) / 'salida.mp3', 'mp3', '192', False, tracks)
+            print(f"  {codec} -> mp3 192k (recodificar): {cpu:.2f}s CPU, {wall:.2f}s reales por pista")
+            cpu, wall = bench(source, Path(folder) / f"salida.{ext}", codec, None, True, tracks)
+            print(f"  {codec} -> {ext} (copiar):           {cpu:.2f}s CPU, {wall:.2f}s reales por pista")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Caché persistente de resultados de búsqueda
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from config import CACHE_DIR, SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES, ensure_dirs
+
+
+class SearchCache:
+    """Caché en SQLite con caducidad (TTL) y expulsión LRU"""
+    
+    def __init__(self, path=None, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path (str): Ruta del archivo SQLite (por defecto en CACHE_DIR)
+            ttl (int): Segundos que una entrada es válida
+            max_entries (int): Número máximo de entradas antes de expulsar
+        """
+        if path is None:
+            ensure_dirs()
+        self.path = str(path or CACHE_DIR / 'search_cache.sqlite3')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS searches ('
+            ' query TEXT NOT NULL,'
+            ' lim INTEGER NOT NULL,'
+            ' results TEXT NOT NULL,'
+            ' created REAL NOT NULL,'
+            ' accessed REAL NOT NULL,'
+            ' PRIMARY KEY (query, lim))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS searches_accessed ON searches (accessed)')
+        self._conn.commit()
+    
+    @staticmethod
+    def normalize(query):
+        """Normaliza la búsqueda para que variaciones triviales compartan entrada"""
+        return ' '.join(query.lower().split())
+    
+    def _key(self, query, flat=False):
+        """Clave de una búsqueda; las planas van aparte porque traen menos datos"""
+        key = self.normalize(query)
+        return f"{key}\x00flat" if flat else key
+    
+    def get(self, query, limit, flat=False):
+        """
+        Busca resultados en la caché
+        
+        Args:
+            query (str): Término de búsqueda
+            limit (int): Número de resultados pedidos
+            flat (bool): Si es True, también sirven los de una búsqueda
+                completa (traen todos los datos de una plana)
+        
+        Returns:
+            list: Resultados guardados, o None si no hay o caducaron
+        """
+        keys = [self._key(query, flat)]
+        if flat:
+            keys.append(self._key(query))
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    'SELECT results, created FROM searches WHERE query = ? AND lim = ?',
+                    (key, limit)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    break
+            else:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE searches SET accessed = ? WHERE query = ? AND lim = ?',
+                (now, key, limit)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+    
+    def put(self, query, limit, results, flat=False):
+        """Guarda resultados y expulsa las entradas menos usadas si hace falta"""
+        key = self._key(query, flat)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO searches (query, lim, results, created, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, limit, json.dumps(results), now, now)
+            )
+            self._conn.execute('DELETE FROM searches WHERE created < ?', (now - self.ttl,))
+            count = self._conn.execute('SELECT COUNT(*) FROM searches').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM searches WHERE rowid IN '
+                    '(SELECT rowid FROM searches ORDER BY accessed LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+    
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._conn.execute('DELETE FROM searches')
+            self._conn.commit()
+    
+    def stats(self):
+        """Retorna los contadores de aciertos y fallos"""
+        with self._lock:
+            size = self._conn.execute('SELECT COUNT(*) FROM searches').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': size,
+        }
@@ -0,0 +1,283 @@
+"""
+Modo de línea de comandos (sin interfaz gráfica)
+
+Uso:
+    python cli.py search "artista canción"
+    python cli.py download URL [URL ...] -o carpeta
+    python cli.py batch lista.csv --workers 4 --jsonl   (también .txt, .json, .jsonl, .m3u)
+    python cli.py resume
+    python cli.py scan [carpeta]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from config import CACHE_DIR, DOWNLOAD_WORKERS, SEARCH_LIMIT, OUTPUT_PROFILES, SCAN_WORKERS
+from downloader import YouTubeDownloader
+from progress import ProgressTracker
+from playlist import iter_playlist, stage_entries
+from queue_store import DownloadQueueStore, RESOLVING, PENDING, FAILED, DONE
+from retry import summarize_failures
+from scheduler import DownloadScheduler
+
+# Cada cuánto se emite una línea de progreso en bytes en modo JSON
+PROGRESS_INTERVAL = 1.0
+
+
+class Reporter:
+    """Escribe el progreso como texto o como líneas JSON"""
+    
+    def __init__(self, jsonl=False, stream=sys.stdout):
+        self.jsonl = jsonl
+        self.stream = stream
+        self._lock = threading.Lock()
+        self._last_progress = 0.0
+    
+    def emit(self, event, text=None, **data):
+        """Escribe un evento"""
+        with self._lock:
+            if self.jsonl:
+                data['event'] = event
+                self.stream.write(json.dumps(data, ensure_ascii=False, default=str) + '\n')
+            elif text:
+                self.stream.write(text + '\n')
+            self.stream.flush()
+    
+    def on_item(self, event):
+        """Callback de DownloadScheduler"""
+        self.emit(
+            event['status'],
+            f"[{event['index'] + 1}/{event['total']}] {event['message']}",
+            index=event['index'], total=event['total'],
+            title=event['song'].get('title'), url=event['song'].get('url'),
+            message=event['message'], elapsed=round(event['elapsed'], 3),
+            conversion=event.get('conversion'),
+        )
+    
+    def on_bytes(self, snapshot):
+        """Callback de ProgressTracker (limitado a una línea por intervalo)"""
+        if not self.jsonl:
+            return
+        now = time.monotonic()
+        if now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self.emit('progress', **snapshot)
+
+
+def build_downloader(args):
+    """Crea el descargador con el formato pedido"""
+    downloader = YouTubeDownloader()
+    if getattr(args, 'format', None) or getattr(args, 'quality', None):
+        downloader.set_output_format(args.format, args.quality)
+    return downloader
+
+
+def open_store():
+    """Cola persistente del modo consola (separada de la de la interfaz)"""
+    return DownloadQueueStore(CACHE_DIR / 'cli_queue.sqlite3')
+
+
+def run_downloads(downloader, songs, args, reporter, store=None):
+    """Descarga una lista de resultados y retorna el código de salida"""
+    tracker = ProgressTracker(len(songs), reporter.on_bytes)
+    scheduler = DownloadScheduler(downloader, args.workers, reporter.on_item, tracker, store=store)
+    summary = scheduler.run(songs, args.output_dir, args.profile)
+    if store:
+        store.remove((DONE,))
+    
+    reporter.emit(
+        'summary',
+        f"Completadas: {summary['succeeded']} ({summary['copied']} sin recodificar), "
+        f"ya existían: {summary['skipped'] - len(summary['duplicates'])}, "
+        f"duplicadas: {len(summary['duplicates'])}, "
+        f"fallidas: {summary['failed']} en {summary['elapsed']:.1f}s "
+        f"({summary['songs_per_minute']:.1f} canciones/min, "
+        f"{summary['bytes_per_second'] / 1e6:.2f} MB/s)",
+        **{k: v for k, v in summary.items() if k != 'results'}
+    )
+    stages = summary.get('stages')
+    if stages and not reporter.jsonl and summary['elapsed'] > 0:
+        # Ocupación de cada etapa, para ajustar --workers y TRANSCODE_WORKERS
+        fetch_busy = stages['fetch_seconds'] / (summary['elapsed'] * stages['fetch_workers'])
+        transcode_busy = stages['transcode_seconds'] / (summary['elapsed'] * stages['transcode_workers'])
+        reporter.emit(
+            'stages',
+            f"Red: {stages['fetch_workers']} workers, {stages['fetch_seconds']:.1f}s ({fetch_busy:.0%} ocupados) · "
+            f"FFmpeg: {stages['transcode_workers']} workers, {stages['transcode_seconds']:.1f}s "
+            f"({transcode_busy:.0%} ocupados) · red esperando a FFmpeg {stages['transcode_wait_seconds']:.1f}s"
+        )
+    if summary['failures'] and not reporter.jsonl:
+        reporter.emit('failures', summarize_failures(summary['failures'], limit=50))
+    return 1 if summary['failed'] else 0
+
+
+def cmd_search(args, reporter):
+    downloader = YouTubeDownloader()
+    results = downloader.search_song(args.query, args.limit, use_cache=not args.no_cache, include_library=True)
+    for i, result in enumerate(results, 1):
+        location = result['url']
+        if result.get('in_library'):
+            location = f"[en biblioteca] {result['path']}"
+        reporter.emit(
+            'result',
+            f"{i}. {result['title']} ({result['duration'] or 0}s) - {result['uploader']}\n   {location}",
+            **result
+        )
+    return 0
+
+
+def cmd_download(args, reporter):
+    downloader = build_downloader(args)
+    songs = [{'url': url, 'title': url} for url in args.urls]
+    store = open_store()
+    downloader.discard_partial(store.unfinished())
+    store.remove()
+    for song, queue_id in zip(songs, store.add(songs)):
+        song['queue_id'] = queue_id
+    return run_downloads(downloader, songs, args, reporter, store)
+
+
+def resolve_entries(downloader, entries, store, reporter):
+    """
+    Busca las canciones aún sin URL y las marca en la cola persistente
+    
+    Las entradas que ya traen URL no se buscan. Se admite un iterador
+    perezoso: la búsqueda empieza mientras se sigue leyendo la lista.
+    
+    Args:
+        entries (iterable): Tuplas (queue_id, entrada); la entrada es un
+            diccionario con 'url' o con 'query' y opcionalmente 'duration'
+        
+    Returns:
+        list: Canciones listas para descargar, con su 'queue_id'
+    """
+    total = len(entries) if hasattr(entries, '__len__') else None
+    reporter.emit('resolving', f"Buscando {total} canciones..." if total else "Buscando canciones...", total=total)
+    songs = []
+    search_ids = []
+    
+    def searches():
+        for queue_id, entry in entries:
+            if entry.get('url'):
+                songs.append(dict(entry, queue_id=queue_id))
+                continue
+            search_ids.append(queue_id)
+            yield entry
+    
+    for index, query, results, error in downloader.resolve_songs(searches()):
+        queue_id = search_ids[index]
+        if error or not results:
+            store.update(queue_id, state=FAILED, error=str(error or "Sin resultados"))
+            reporter.emit('not_found', f"✗ Sin resultados: {query}", index=index, query=query,
+                          error=str(error) if error else None)
+        else:
+            store.update(queue_id, state=PENDING, url=results[0]['url'],
+                         title=results[0]['title'], song=results[0])
+            songs.append(dict(results[0], queue_id=queue_id))
+            reporter.emit('resolved', None, index=index, query=query, **results[0])
+    store.flush()
+    return songs
+
+
+def cmd_batch(args, reporter):
+    downloader = build_downloader(args)
+    entries = iter_playlist(args.file)
+    store = open_store()
+    downloader.discard_partial(store.unfinished())
+    store.remove()
+    
+    songs = resolve_entries(downloader, stage_entries(entries, store), store, reporter)
+    if not songs:
+        return 1
+    return run_downloads(downloader, songs, args, reporter, store)
+
+
+def cmd_resume(args, reporter):
+    downloader = build_downloader(args)
+    store = open_store()
+    items = store.unfinished()
+    # Las descargas completadas ya no están en la cola; las interrumpidas
+    # continúan desde su .part en la carpeta donde empezaron
+    unresolved = [(item['queue_id'], {'query': item['query'], 'duration': item.get('duration')})
+                  for item in items if item['state'] == RESOLVING]
+    songs = [item for item in items if item.get('url')]
+    if unresolved:
+        songs += resolve_entries(downloader, unresolved, store, reporter)
+    if not songs:
+        reporter.emit('summary', "No hay descargas pendientes", total=0)
+        return 0
+    reporter.emit('resuming', f"Reanudando {len(songs)} descargas...", total=len(songs))
+    return run_downloads(downloader, songs, args, reporter, store)
+
+
+def cmd_scan(args, reporter):
+    downloader = YouTubeDownloader()
+    
+    def on_progress(done, total):
+        reporter.emit('scanning', f"Leyendo etiquetas: {done}/{total}", done=done, total=total)
+    
+    summary = downloader.scan_library(args.folder, on_progress, workers=args.workers)
+    reporter.emit(
+        'summary',
+        f"{summary['found']} archivos: {summary['probed']} leídos, {summary['unchanged']} sin cambios, "
+        f"{summary['removed']} eliminados, {summary['failed']} ilegibles ({summary['elapsed']:.1f}s)",
+        **summary
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Descargador de Música de YouTube (modo consola)")
+    parser.add_argument('--jsonl', action='store_true', help="Progreso como líneas JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    search = subparsers.add_parser('search', help="Buscar canciones")
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=SEARCH_LIMIT)
+    search.add_argument('--no-cache', action='store_true', help="Ignorar la caché de búsquedas")
+    search.set_defaults(func=cmd_search)
+    
+    def add_download_options(sub):
+        sub.add_argument('-o', '--output-dir', default=None, help="Carpeta de descarga")
+        sub.add_argument('-w', '--workers', type=int, default=DOWNLOAD_WORKERS)
+        sub.add_argument('-f', '--format', default=None, help="Códec de salida (mp3, m4a, opus... o best para no recodificar)")
+        sub.add_argument('-q', '--quality', default=None, help="Calidad de salida (ej. 192)")
+        sub.add_argument('-p', '--profile', default=None, choices=sorted(OUTPUT_PROFILES),
+                         help="Perfil de salida (sustituye a -f/-q)")
+    
+    download = subparsers.add_parser('download', help="Descargar URLs")
+    download.add_argument('urls', nargs='+')
+    add_download_options(download)
+    download.set_defaults(func=cmd_download)
+    
+    batch = subparsers.add_parser('batch', help="Buscar y descargar una lista CSV/TXT/JSON/JSONL/M3U")
+    batch.add_argument('file')
+    add_download_options(batch)
+    batch.set_defaults(func=cmd_batch)
+    
+    resume = subparsers.add_parser('resume', help="Reanudar la última descarga interrumpida")
+    add_download_options(resume)
+    resume.set_defaults(func=cmd_resume)
+    
+    scan = subparsers.add_parser('scan', help="Importar una carpeta de música a la biblioteca")
+    scan.add_argument('folder', nargs='?', default=None, help="Carpeta a escanear (por defecto la de descargas)")
+    scan.add_argument('-w', '--workers', type=int, default=SCAN_WORKERS, help="Procesos de ffprobe")
+    scan.set_defaults(func=cmd_scan)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    reporter = Reporter(jsonl=args.jsonl)
+    try:
+        return args.func(args, reporter)
+    except Exception as e:
+        reporter.emit('error', f"Error: {e}", message=str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,16 +3,27 @@ Configuración de la aplicación
 """
 import os
 import shutil
+import sys
+import threading
 from pathlib import Path
 
 # Directorios
 BASE_DIR = Path(__file__).parent
 DOWNLOADS_DIR = BASE_DIR / "descargas"
 TEMP_DIR = BASE_DIR / "temp"
+CACHE_DIR = BASE_DIR / "cache"
+
+_dirs_ready = False
+
+
+def ensure_dirs():
+    """Crea los directorios de la aplicación si no existen (solo la primera vez)"""
+    global _dirs_ready
+    if not _dirs_ready:
+        for directory in (DOWNLOADS_DIR, TEMP_DIR, CACHE_DIR):
+            directory.mkdir(exist_ok=True)
+        _dirs_ready = True
 
-# Crear directorios si no existen
-DOWNLOADS_DIR.mkdir(exist_ok=True)
-TEMP_DIR.mkdir(exist_ok=True)
 
 # Buscar FFmpeg en rutas comunes de Windows
 def find_ffmpeg():
@@ -36,30 +47,111 @@ def find_ffmpeg():
     
     return None
 
-FFMPEG_PATH = find_ffmpeg()
-FFPROBE_PATH = shutil.which('ffprobe')
 
-if not FFMPEG_PATH:
-    print("⚠️  Advertencia: FFmpeg no se encontró en el PATH")
-    print("Descárgalo desde: https://ffmpeg.org/download.html")
+# La búsqueda de FFmpeg se hace la primera vez que se necesita, no al importar
+_ffmpeg_lock = threading.Lock()
+_ffmpeg_paths = None
+
+
+def _discover_ffmpeg():
+    global _ffmpeg_paths
+    with _ffmpeg_lock:
+        if _ffmpeg_paths is None:
+            ffmpeg = find_ffmpeg()
+            ffprobe = shutil.which('ffprobe')
+            if not ffmpeg:
+                # A stderr para no mezclarse con la salida JSON del modo consola
+                print("⚠️  Advertencia: FFmpeg no se encontró en el PATH", file=sys.stderr)
+                print("Descárgalo desde: https://ffmpeg.org/download.html", file=sys.stderr)
+            _ffmpeg_paths = (ffmpeg, ffprobe)
+    return _ffmpeg_paths
+
+
+def get_ffmpeg_path():
+    """Ruta de FFmpeg, o None si no está instalado"""
+    return _discover_ffmpeg()[0]
+
+
+def get_ffprobe_path():
+    """Ruta de ffprobe, o None si no está instalado"""
+    return _discover_ffmpeg()[1]
 
-# Configuración de yt-dlp con FFmpeg explícito
+
+def __getattr__(name):
+    # Compatibilidad con config.FFMPEG_PATH / config.FFPROBE_PATH
+    if name == 'FFMPEG_PATH':
+        return get_ffmpeg_path()
+    if name == 'FFPROBE_PATH':
+        return get_ffprobe_path()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Perfiles de salida: códec, bitrate en kbps y si se permite copiar sin recodificar
+# (codec 'best' conserva el formato original de YouTube)
+OUTPUT_PROFILES = {
+    'mp3-192': {'codec': 'mp3', 'quality': '192'},
+    'mobile-mp3-128': {'codec': 'mp3', 'quality': '128'},
+    'archive-opus-160': {'codec': 'opus', 'quality': '160'},
+    'passthrough': {'codec': 'best', 'quality': None},
+}
+DEFAULT_PROFILE = 'mp3-192'
+
+# Configuración de yt-dlp (YouTubeDownloader añade 'ffmpeg_location' al descargar)
 YTDLP_CONFIG = {
     'format': 'bestaudio/best',
     'postprocessors': [{
         'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',
+        'preferredcodec': OUTPUT_PROFILES[DEFAULT_PROFILE]['codec'],
+        'preferredquality': OUTPUT_PROFILES[DEFAULT_PROFILE]['quality'],
         'nopostoverwrites': False,
     }],
     'outtmpl': str(DOWNLOADS_DIR / '%(title)s.%(ext)s'),
     'quiet': False,
     'no_warnings': False,
     'socket_timeout': 30,
+    'continuedl': True,  # Reanudar los .part de descargas interrumpidas
     'progress_hooks': [],
-    'ffmpeg_location': FFMPEG_PATH if FFMPEG_PATH else None,
 }
 
 # Configuración de búsqueda
 SEARCH_LIMIT = 5  # Máximo de resultados a mostrar
 AUTO_SELECT_FIRST = False  # Si es True, descarga automáticamente el primer resultado
+RESOLVE_WORKERS = 8  # Búsquedas simultáneas al cargar una lista
+SEARCH_CACHE_ENABLED = True  # Guardar resultados de búsqueda en disco
+SEARCH_CACHE_TTL = 7 * 24 * 3600  # Segundos que un resultado guardado es válido
+SEARCH_CACHE_MAX_ENTRIES = 5000  # Se expulsan las búsquedas menos usadas
+LIBRARY_SEARCH_LIMIT = 3  # Canciones de la biblioteca que se muestran antes de los resultados de YouTube
+LIBRARY_FUZZY_THRESHOLD = 0.6  # Similitud mínima (0-1) para las coincidencias aproximadas
+
+# Configuración de descargas
+DOWNLOAD_WORKERS = 3  # Descargas simultáneas de la cola
+PASSTHROUGH = True  # Copiar sin recodificar si el audio original ya está en el formato de salida
+TRANSCODE_WORKERS = os.cpu_count() or 2  # Conversiones de FFmpeg simultáneas
+TRANSCODE_QUEUE_SIZE = 4  # Descargas terminadas que pueden esperar a FFmpeg
+DEDUP_ENABLED = True  # Descargar una sola vez las canciones repetidas de la cola
+DEDUP_DURATION_TOLERANCE = 8  # Segundos de diferencia para considerar dos videos la misma canción
+DEDUP_TITLE_SIMILARITY = 0.88  # Similitud mínima (0-1) de títulos escritos distinto
+RETRY_ATTEMPTS = 4  # Intentos por búsqueda o descarga ante errores de red
+RETRY_BASE_DELAY = 1.0  # Espera máxima tras el primer fallo (se duplica en cada intento)
+RETRY_MAX_DELAY = 30.0  # Tope de la espera entre intentos
+RATE_LIMIT_PER_SECOND = 2.0  # Peticiones por segundo a cada servidor (0 = sin límite)
+RATE_LIMIT_BURST = 5  # Peticiones que pueden salir seguidas antes de limitar
+SEARCH_RATE_LIMIT_PER_SECOND = 10.0  # Búsquedas por segundo (límite propio, no gasta el de las descargas)
+SEARCH_RATE_LIMIT_BURST = 20  # Búsquedas que pueden salir seguidas antes de limitar
+
+# Configuración de temporales
+TEMP_QUOTA_BYTES = 2 * 1024 ** 3  # Espacio máximo de los temporales (0 = sin límite)
+TEMP_QUOTA_WAIT = 120  # Segundos que un trabajo espera a que se libere espacio
+TEMP_ORPHAN_AGE = 6 * 3600  # Antigüedad a partir de la cual se borran descargas a medias sin reanudar (y en Windows, carpetas huérfanas)
+
+# Configuración del escaneo de carpetas
+SCAN_WORKERS = os.cpu_count() or 2  # Procesos que leen etiquetas con ffprobe
+SCAN_BATCH = 64  # Archivos por tarea de cada proceso
+
+# Configuración de la interfaz
+UI_TICK_MS = 50  # Cada cuánto se aplican las actualizaciones pendientes de la interfaz
+
+# Configuración de vistas previas
+PREFETCH_WORKERS = 2  # Precargas simultáneas tras una búsqueda
+PREFETCH_TOP_K = 2  # Cuántos resultados precargar
+PREFETCH_SECONDS = 3  # Segundos de audio a decodificar por resultado (0 = solo la URL)
+PREFETCH_BYTE_BUDGET = 8 * 1024 * 1024  # Memoria máxima para audio precargado
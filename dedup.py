@@ -0,0 +1,135 @@
+"""
+Detección de canciones duplicadas en la cola antes de descargar
+"""
+import difflib
+import re
+
+from archive import extract_video_id
+from config import DEDUP_DURATION_TOLERANCE, DEDUP_TITLE_SIMILARITY
+from library import normalize_text
+
+# Palabras que distinguen subidas de una misma canción pero no la canción
+NOISE_WORDS = {
+    'official', 'oficial', 'video', 'videoclip', 'clip', 'mv', 'audio', 'lyrics', 'lyric', 'letra',
+    'letras', 'music', 'musical', 'visualizer', 'hd', 'hq', '4k', '1080p', '720p', 'with', 'con',
+}
+
+_BRACKETS_RE = re.compile(r'[(\[{]([^)\]}]*)[)\]}]')
+
+# Candidatos por palabra que se consultan para cada canción (las menos frecuentes)
+_INDEX_TOKENS = 2
+
+
+def canonical_title(title):
+    """
+    Título sin acentos, signos ni etiquetas como "(Official Video)" o "[Lyrics]"
+    
+    Args:
+        title (str): Título del video
+    
+    Returns:
+        str: Título para comparar
+    """
+    def strip_noise(match):
+        words = normalize_text(match.group(1)).split()
+        return ' ' if all(word in NOISE_WORDS for word in words) else f" {match.group(1)} "
+    
+    words = normalize_text(_BRACKETS_RE.sub(strip_noise, title or '')).split()
+    # "Canción - Letra", "Canción | Official Audio"...
+    while len(words) > 1 and words[-1] in NOISE_WORDS:
+        words.pop()
+    return ' '.join(words)
+
+
+def _compatible(duration, other, tolerance):
+    """
+    Indica si dos duraciones son de la misma canción
+    
+    Con una duración desconocida (0) no se puede saber: dos "Intro" distintas
+    tienen el mismo título, así que solo se unen si coincide el ID de video.
+    """
+    return bool(duration and other) and abs(duration - other) <= tolerance
+
+
+def _numbers(title):
+    """Números que aparecen en un título"""
+    return [word for word in title.split() if word.isdigit()]
+
+
+def find_duplicates(songs, profile=None, output_path=None,
+                    tolerance=DEDUP_DURATION_TOLERANCE, similarity=DEDUP_TITLE_SIMILARITY):
+    """
+    Busca canciones repetidas en una cola ya resuelta
+    
+    Primero se comparan los IDs de video; después el título sin etiquetas
+    con la duración (si falta la duración de alguna, solo cuenta el ID).
+    Para los títulos casi iguales solo se comparan las canciones ya vistas
+    que comparten alguna palabra poco frecuente, así que el coste crece con
+    la cola y no con el cuadrado de su tamaño. Se conserva siempre la
+    primera aparición. Las canciones con otro perfil o carpeta de salida no
+    se consideran duplicadas.
+    
+    Args:
+        songs (list): Diccionarios con 'url', 'title' y opcionalmente 'id',
+            'duration', 'profile' y 'output_path'
+        profile (str): Perfil de las canciones que no traen el suyo
+        output_path (str): Carpeta de las canciones que no traen la suya
+        tolerance (float): Diferencia máxima de duración en segundos
+        similarity (float): Similitud mínima (0-1) de los títulos casi iguales
+    
+    Returns:
+        dict: Índice del duplicado -> (índice conservado, motivo); el motivo
+            es 'id', 'title' o 'similar'
+    """
+    by_id = {}
+    by_title = {}
+    by_word = {}
+    kept = {}
+    duplicates = {}
+    
+    for index, song in enumerate(songs):
+        group = (song.get('profile') or profile, song.get('output_path') or output_path)
+        video_id = song.get('id') or extract_video_id(song.get('url'))
+        if video_id and (group, video_id) in by_id:
+            duplicates[index] = (by_id[(group, video_id)], 'id')
+            continue
+        
+        title = canonical_title(song.get('title'))
+        duration = song.get('duration') or 0
+        match = None
+        if title:
+            for other in by_title.get((group, title), ()):
+                if _compatible(duration, kept[other][1], tolerance):
+                    match = (other, 'title')
+                    break
+        words = [word for word in set(title.split()) if len(word) > 2]
+        if match is None and duration and words:
+            words.sort(key=lambda word: len(by_word.get((group, word), ())))
+            candidates = set()
+            for word in words[:_INDEX_TOKENS]:
+                candidates.update(by_word.get((group, word), ()))
+            for other in sorted(candidates):
+                other_title, other_duration = kept[other]
+                if not _compatible(duration, other_duration, tolerance):
+                    continue
+                # "Parte 1" y "Parte 2" se parecen mucho pero no son la misma canción
+                if _numbers(title) != _numbers(other_title):
+                    continue
+                if difflib.SequenceMatcher(None, title, other_title).ratio() >= similarity:
+                    match = (other, 'similar')
+                    break
+        
+        if match:
+            duplicates[index] = match
+            if video_id:
+                by_id[(group, video_id)] = match[0]
+            continue
+        
+        kept[index] = (title, duration)
+        if video_id:
+            by_id[(group, video_id)] = index
+        if title:
+            by_title.setdefault((group, title), []).append(index)
+        for word in words:
+            by_word.setdefault((group, word), []).append(index)
+    return duplicates
@@ -1,101 +1,559 @@
 """
 Módulo de descarga de música desde YouTube
 """
-import yt_dlp
-import csv
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
-from config import YTDLP_CONFIG, DOWNLOADS_DIR, FFMPEG_PATH
+from archive import DownloadArchive, extract_video_id
+from cache import SearchCache
+from library import LibraryCatalog
+from playlist import iter_playlist
+from ranking import ResultRanker
+from scanner import LibraryScanner
+from retry import RetryPolicy, RetryError, SEARCH_HOST, TRANSIENT, host_of
+from session import YDLSessionPool
+from workspace import WorkspaceManager
+from transcoder import (
+    COPY_EXTENSIONS, can_copy, normalize_codec, output_extension, preferred_format, transcode,
+)
+from config import (
+    YTDLP_CONFIG, DOWNLOADS_DIR, SEARCH_LIMIT, RESOLVE_WORKERS, ensure_dirs, get_ffmpeg_path,
+    AUTO_SELECT_FIRST, SEARCH_CACHE_ENABLED, PASSTHROUGH, OUTPUT_PROFILES, LIBRARY_SEARCH_LIMIT, SCAN_WORKERS,
+)
+
+
+SEARCH_OPTS = {'quiet': True, 'no_warnings': True}
+# Solo la página de resultados: título, duración, canal y visitas sin abrir cada video
+SEARCH_FLAT_OPTS = dict(SEARCH_OPTS, extract_flat='in_playlist')
 
 
 class YouTubeDownloader:
     """Descargador de música desde YouTube"""
     
     def __init__(self):
+        ensure_dirs()
         self.ydl_opts = YTDLP_CONFIG.copy()
+        self.session = YDLSessionPool()
+        self.workspaces = WorkspaceManager()
+        self.archive = DownloadArchive()
+        self.search_cache = SearchCache() if SEARCH_CACHE_ENABLED else None
+        self.library = LibraryCatalog()
+        self.ranker = ResultRanker()
+        self.retry = RetryPolicy()
+        self.passthrough = PASSTHROUGH
     
-    def search_song(self, query):
+    def search_song(self, query, limit=SEARCH_LIMIT, use_cache=True, include_library=False, flat=False):
         """
         Busca una canción en YouTube y retorna los resultados
         
         Args:
             query (str): Término de búsqueda
+            limit (int): Número máximo de resultados
+            use_cache (bool): Si es False, ignora la caché y consulta YouTube
+            include_library (bool): Si es True, pone primero las canciones
+                de la biblioteca que coinciden (ver search_library)
+            flat (bool): Si es True, usa solo la página de resultados (una
+                petición en lugar de una por video)
             
         Returns:
-            list: Lista de diccionarios con info de resultados
+            list: Lista de diccionarios con info de resultados; los que ya
+                están descargados llevan 'in_library' y 'path'
         """
+        local = self.search_library(query) if include_library else []
+        results = None
+        if use_cache and self.search_cache:
+            results = self.search_cache.get(query, limit, flat)
+        
+        if results is None:
+            try:
+                results = self.retry.call(self._search, query, limit, flat, host=SEARCH_HOST)
+            except Exception as e:
+                raise Exception(f"Error en la búsqueda: {str(e)}")
+            
+            if self.search_cache and results:
+                try:
+                    self.search_cache.put(query, limit, results, flat)
+                except Exception as e:
+                    print(f"Error guardando en caché: {e}")
+        
         try:
-            search_query = f"ytsearch5:{query}"
-            with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-                info = ydl.extract_info(search_query, download=False)
-                results = []
-                for entry in info.get('entries', []):
-                    results.append({
-                        'url': entry['webpage_url'],
-                        'title': entry.get('title', 'Sin título'),
-                        'duration': entry.get('duration', 0),
-                        'uploader': entry.get('uploader', 'Desconocido'),
-                        'views': entry.get('view_count', 0),
-                    })
-                return results
+            in_library = self.library.find_ids([result.get('id') for result in results])
         except Exception as e:
-            raise Exception(f"Error en la búsqueda: {str(e)}")
+            print(f"Error consultando la biblioteca: {e}")
+            in_library = {}
+        for result in results:
+            if result.get('id') in in_library:
+                result['in_library'] = True
+                result['path'] = in_library[result['id']]
+        
+        shown = {result['id'] for result in local if result['id']}
+        return local + [result for result in results if result.get('id') not in shown]
     
-    def download_song(self, url, output_path=None):
+    def search_library(self, query, limit=LIBRARY_SEARCH_LIMIT):
+        """
+        Busca en las canciones ya descargadas, sin acceder a la red
+        
+        Args:
+            query (str): Término de búsqueda
+            limit (int): Número máximo de resultados
+            
+        Returns:
+            list: Resultados con el mismo formato que search_song, más
+                'in_library', 'path' y 'score' (similitud de 0 a 1)
+        """
+        try:
+            tracks = self.library.search(query, limit)
+        except Exception as e:
+            print(f"Error consultando la biblioteca: {e}")
+            return []
+        results = []
+        for track in tracks:
+            if not Path(track['path']).exists():
+                continue
+            url = track['url']
+            if not url and track['video_id']:
+                url = f"https://www.youtube.com/watch?v={track['video_id']}"
+            results.append({
+                'id': track['video_id'],
+                'url': url,
+                'title': track['title'],
+                'duration': track['duration'] or 0,
+                'uploader': track['uploader'] or 'Desconocido',
+                'views': 0,
+                'in_library': True,
+                'path': track['path'],
+                'score': track['score'],
+            })
+        return results
+    
+    def _search(self, query, limit, flat=False):
+        """Un intento de búsqueda en YouTube (sin caché ni reintentos)"""
+        search_query = f"ytsearch{limit}:{query}"
+        with self.session.acquire(SEARCH_FLAT_OPTS if flat else SEARCH_OPTS) as ydl:
+            info = ydl.extract_info(search_query, download=False)
+        results = []
+        for entry in info.get('entries', []):
+            # Las entradas planas traen 'url' en lugar de 'webpage_url', y a veces solo 'channel'
+            url = entry.get('webpage_url') or entry.get('url')
+            if url and not url.startswith(('http://', 'https://')):
+                url = f"https://www.youtube.com/watch?v={entry.get('id') or url}"
+            results.append({
+                'id': entry.get('id'),
+                'url': url,
+                'title': entry.get('title') or 'Sin título',
+                'duration': int(entry.get('duration') or 0),
+                'uploader': entry.get('uploader') or entry.get('channel') or 'Desconocido',
+                'views': entry.get('view_count') or 0,
+            })
+        return results
+    
+    def resolve_songs(self, songs, limit=None, workers=RESOLVE_WORKERS):
+        """
+        Busca muchas canciones en paralelo y entrega cada una al resolverse
+        
+        Solo hay como máximo 2 * workers búsquedas pendientes, así que la
+        lista de entrada puede ser un iterador perezoso. Con varios
+        resultados por búsqueda, se ordenan con ResultRanker para que el
+        primero sea el más probable.
+        
+        Args:
+            songs (iterable): Términos de búsqueda, o diccionarios con
+                'query' y opcionalmente 'duration' (duración esperada en segundos)
+            limit (int): Resultados por búsqueda (por defecto 1 si
+                AUTO_SELECT_FIRST, si no SEARCH_LIMIT)
+            workers (int): Búsquedas simultáneas
+            
+        Yields:
+            tuple: (índice, término, resultados, error) en orden de llegada
+        """
+        if limit is None:
+            limit = 1 if AUTO_SELECT_FIRST else SEARCH_LIMIT
+        songs_iter = enumerate(songs)
+        workers = max(1, int(workers))
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='busqueda') as executor:
+            pending = {}
+            
+            def submit_next():
+                try:
+                    index, song = next(songs_iter)
+                except StopIteration:
+                    return False
+                query, expected = (song['query'], song.get('duration')) if isinstance(song, dict) else (song, None)
+                pending[executor.submit(self._search_ranked, query, limit, expected)] = (index, query)
+                return True
+            
+            for _ in range(workers * 2):
+                if not submit_next():
+                    break
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, song = pending.pop(future)
+                    try:
+                        results, error = future.result(), None
+                    except Exception as e:
+                        results, error = [], e
+                    submit_next()
+                    yield index, song, results, error
+    
+    def _search_ranked(self, query, limit, expected_duration=None):
+        """Busca y ordena los resultados del más al menos probable"""
+        results = self.search_song(query, limit, flat=True)
+        if len(results) > 1:
+            results = self.ranker.rank(query, results, expected_duration)
+        return results
+    
+    def set_output_format(self, codec=None, quality=None):
+        """
+        Cambia el códec y la calidad de salida de este descargador
+        
+        Args:
+            codec (str): Códec de salida (ej. 'mp3', 'm4a', 'opus')
+            quality (str): Calidad de salida (ej. '192')
+        """
+        self.ydl_opts['postprocessors'] = self._postprocessors(codec, quality)
+    
+    def set_profile(self, name):
+        """
+        Usa un perfil de config.OUTPUT_PROFILES como formato por defecto
+        
+        Args:
+            name (str): Nombre del perfil (ej. 'archive-opus-160')
+        """
+        profile = self._profile(name)
+        self.set_output_format(profile['codec'], profile['quality'])
+        self.passthrough = profile['passthrough']
+    
+    def _postprocessors(self, codec=None, quality=None):
+        """Postprocesadores configurados con otro códec y calidad de salida"""
+        postprocessors = []
+        for pp in self.ydl_opts.get('postprocessors', []):
+            pp = dict(pp)
+            if pp.get('key') == 'FFmpegExtractAudio':
+                if codec:
+                    pp['preferredcodec'] = codec
+                if quality:
+                    pp['preferredquality'] = str(quality)
+            postprocessors.append(pp)
+        return postprocessors
+    
+    def _profile(self, profile=None):
+        """
+        Resuelve un perfil de salida
+        
+        Args:
+            profile (str | dict): Nombre de config.OUTPUT_PROFILES, un dict con
+                'codec' y 'quality', o None para el formato de este descargador
+                
+        Returns:
+            dict: 'codec', 'quality' y 'passthrough'
+        """
+        if profile is None:
+            codec, quality = None, None
+            for pp in self.ydl_opts.get('postprocessors', []):
+                if pp.get('key') == 'FFmpegExtractAudio':
+                    codec, quality = pp.get('preferredcodec'), pp.get('preferredquality')
+            return {'codec': codec, 'quality': quality, 'passthrough': self.passthrough}
+        if isinstance(profile, str):
+            if profile not in OUTPUT_PROFILES:
+                raise Exception(f"Perfil de salida desconocido: {profile} (disponibles: {', '.join(OUTPUT_PROFILES)})")
+            profile = OUTPUT_PROFILES[profile]
+        quality = profile.get('quality')
+        return {
+            'codec': profile.get('codec'),
+            'quality': str(quality) if quality else None,
+            'passthrough': profile.get('passthrough', PASSTHROUGH),
+        }
+    
+    def _output_format(self, profile=None):
+        """Retorna (códec, calidad) de un perfil, o del postprocesador configurado"""
+        profile = self._profile(profile)
+        return profile['codec'], profile['quality']
+    
+    def find_downloaded(self, url, output_path=None, title=None, profile=None):
+        """
+        Consulta el índice de descargas sin acceder a la red
+        
+        Args:
+            url (str): URL de YouTube
+            output_path (str): Carpeta de destino (opcional)
+            title (str): Título del video, si se conoce
+            profile (str): Perfil de salida (por defecto el del descargador)
+            
+        Returns:
+            str: Ruta del archivo ya descargado, o None
+        """
+        codec, quality = self._output_format(profile)
+        return self.archive.find(
+            output_path or DOWNLOADS_DIR, codec, quality,
+            video_id=extract_video_id(url), title=title
+        )
+    
+    def rebuild_archive(self, folder=None):
+        """
+        Reconstruye el índice de descargas escaneando una carpeta
+        
+        Args:
+            folder (str): Carpeta a escanear (por defecto DOWNLOADS_DIR)
+            
+        Returns:
+            int: Número de archivos indexados
+        """
+        return self.archive.rebuild(folder or DOWNLOADS_DIR)
+    
+    def scan_library(self, folder=None, progress=None, workers=SCAN_WORKERS):
+        """
+        Importa una carpeta de música a la biblioteca y al índice de descargas
+        
+        Lee etiquetas y duración con ffprobe; en escaneos posteriores solo
+        lee los archivos nuevos o modificados.
+        
+        Args:
+            folder (str): Carpeta a escanear (por defecto DOWNLOADS_DIR)
+            progress (callable): Recibe (archivos leídos, archivos por leer)
+            workers (int): Procesos de ffprobe
+            
+        Returns:
+            dict: Resumen del escaneo (ver LibraryScanner.scan)
+        """
+        scanner = LibraryScanner(self.library, self.archive, workers=workers)
+        try:
+            return scanner.scan(folder or DOWNLOADS_DIR, progress)
+        finally:
+            scanner.manifest.close()
+    
+    def download_song(self, url, output_path=None, title=None, force=False, progress=None, profile=None):
         """
         Descarga una canción desde YouTube
         
         Args:
             url (str): URL de YouTube
             output_path (str): Ruta de salida (opcional)
+            title (str): Título conocido, para detectar archivos ya indexados
+            force (bool): Si es True, descarga aunque ya exista
+            progress (ItemProgress): Recibe el progreso en bytes y del postprocesado (opcional)
+            profile (str): Perfil de salida (por defecto el del descargador)
             
         Returns:
-            tuple: (True, mensaje) o (False, error)
+            tuple: (éxito, mensaje, 'copy' o 'transcode'); el modo es None si
+                no se llegó a convertir nada
         """
         try:
+            settings = self._profile(profile)
+            if not force:
+                existing = self.find_downloaded(url, output_path, title, profile)
+                if existing:
+                    return True, f"✓ Ya descargado: {Path(existing).name}", None
+            
             opts = self.ydl_opts.copy()
+            opts['postprocessors'] = self._postprocessors(settings['codec'], settings['quality'])
             if output_path:
                 opts['outtmpl'] = str(Path(output_path) / '%(title)s.%(ext)s')
+            if settings['passthrough']:
+                # FFmpegExtractAudio ya copia sin recodificar si el códec coincide
+                opts['format'] = preferred_format(settings['codec'])
             
             # Verificar FFmpeg
-            if not FFMPEG_PATH:
+            ffmpeg_path = get_ffmpeg_path()
+            if not ffmpeg_path:
                 raise Exception("FFmpeg no está instalado. Por favor instálalo desde https://ffmpeg.org/download.html")
+            opts['ffmpeg_location'] = ffmpeg_path
+            
+            hooks = {}
+            if progress:
+                hooks = {'progress_hook': progress.on_progress, 'postprocessor_hook': progress.on_postprocess}
+            info = self.retry.call(self._fetch, opts, url, hooks, host=host_of(url))
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                return True, f"✓ Descargado: {info.get('title', 'Sin título')}"
+            self._record_download(info, profile)
+            # Mismo criterio que transcode_download(): FFmpegExtractAudio copia si el códec coincide
+            mode = self.conversion_plan(info, profile)[0]
+            if mode == 'copy':
+                return True, f"✓ Descargado sin recodificar: {info.get('title', 'Sin título')}", mode
+            return True, f"✓ Descargado: {info.get('title', 'Sin título')}", mode
+        except RetryError as e:
+            if e.attempts > 1:
+                return False, f"✗ Error: {str(e)} (tras {e.attempts} intentos)", None
+            return False, f"✗ Error: {str(e)}", None
         except Exception as e:
-            return False, f"✗ Error: {str(e)}"
+            return False, f"✗ Error: {str(e)}", None
     
-    def load_playlist_from_file(self, file_path):
+    def _fetch(self, opts, url, hooks):
+        """Un intento de descarga con yt-dlp (reanuda el .part si existe)"""
+        with self.session.acquire(opts, **hooks) as ydl:
+            return ydl.extract_info(url, download=True)
+    
+    def fetch_audio(self, url, progress=None, profile=None):
         """
-        Carga una lista de canciones desde un archivo CSV o TXT
+        Primera etapa del pipeline: descarga el audio original sin convertirlo
         
         Args:
-            file_path (str): Ruta del archivo
+            url (str): URL de YouTube
+            progress (ItemProgress): Recibe el progreso en bytes (opcional)
+            profile (str): Perfil de salida, para elegir un stream copiable (opcional)
+            
+        Returns:
+            tuple: (info de yt-dlp, ruta del archivo descargado en su carpeta temporal)
+        """
+        opts = self.ydl_opts.copy()
+        opts['postprocessors'] = [
+            pp for pp in opts.get('postprocessors', []) if pp.get('key') != 'FFmpegExtractAudio'
+        ]
+        settings = self._profile(profile)
+        if settings['passthrough']:
+            opts['format'] = preferred_format(settings['codec'])
+        hooks = {'progress_hook': progress.on_progress} if progress else {}
+        # Carpeta fija por video y perfil: tras un cierre, yt-dlp encuentra ahí el .part y lo reanuda
+        workspace = None
+        video_id = extract_video_id(url)
+        if video_id:
+            label = profile if isinstance(profile, str) else settings['codec'] or 'best'
+            workspace = self.workspaces.claim(f"{video_id}-{label}")
+        resumable = workspace is not None
+        if workspace is None:
+            # Sin ID, o la misma canción ya se está descargando: carpeta propia
+            workspace = self.workspaces.create('fetch')
+        opts['outtmpl'] = str(workspace.path / '%(id)s.%(ext)s')
+        try:
+            info = self.retry.call(self._fetch, opts, url, hooks, host=host_of(url))
+            downloads = info.get('requested_downloads') or []
+            source = downloads[-1].get('filepath') if downloads else None
+            if not source or not Path(source).exists():
+                raise Exception("yt-dlp no generó ningún archivo")
+        except RetryError as e:
+            if resumable and e.kind == TRANSIENT:
+                # Se conserva lo descargado para continuar con la cola reanudada
+                self.workspaces.keep(workspace)
+            else:
+                workspace.release()
+            raise
+        except Exception:
+            workspace.release()
+            raise
+        return info, source
+    
+    def discard_partial(self, items):
+        """
+        Borra las descargas a medias de canciones que salen de la cola
+        
+        Args:
+            items (list): Canciones de DownloadQueueStore.items()
+        """
+        self.workspaces.discard(item['part_path'] for item in items if item.get('part_path'))
+    
+    def output_file(self, info, output_path=None, ext=None):
+        """
+        Ruta final de una canción, con el mismo nombre que daría yt-dlp
+        
+        Args:
+            info (dict): Info de yt-dlp de la descarga
+            output_path (str): Carpeta de salida (opcional)
+            ext (str): Extensión final (por defecto la del códec de salida)
             
         Returns:
-            list: Lista de canciones
+            Path: Archivo de salida
         """
-        songs = []
-        file_path = Path(file_path)
+        opts = {'outtmpl': self.ydl_opts.get('outtmpl'), 'quiet': True}
+        if output_path:
+            opts['outtmpl'] = str(Path(output_path) / '%(title)s.%(ext)s')
+        with self.session.acquire(opts) as ydl:
+            name = Path(ydl.prepare_filename(info))
+        return name.with_suffix('.' + (ext or output_extension(self._output_format()[0])))
+    
+    def conversion_plan(self, info, profile=None):
+        """
+        Decide cómo guardar el audio descargado en el formato de salida
         
+        Args:
+            info (dict): Info de yt-dlp de la descarga
+            profile (str): Perfil de salida (por defecto el del descargador)
+            
+        Returns:
+            tuple: ('copy' o 'transcode', códec, calidad, extensión)
+        """
+        settings = self._profile(profile)
+        codec, quality = settings['codec'], settings['quality']
+        downloads = info.get('requested_downloads') or [info]
+        source_codec = normalize_codec(downloads[-1].get('acodec') or info.get('acodec'))
+        source_abr = downloads[-1].get('abr') or info.get('abr')
+        if settings['passthrough'] and can_copy(source_codec, source_abr, codec, quality):
+            return 'copy', source_codec, quality, COPY_EXTENSIONS[source_codec]
+        if codec == 'best':
+            # Igual que FFmpegExtractAudio: si el origen no se puede copiar, MP3
+            codec = 'mp3'
+        return 'transcode', codec, quality, output_extension(codec)
+    
+    def transcode_download(self, info, source, output_path=None, progress=None, profile=None):
+        """
+        Segunda etapa del pipeline: convierte el audio descargado al formato
+        de salida y borra el original
+        
+        Args:
+            info (dict): Info de yt-dlp de la descarga
+            source (str): Archivo descargado por fetch_audio()
+            output_path (str): Carpeta de salida (opcional)
+            progress (ItemProgress): Recibe el inicio y fin de la conversión (opcional)
+            profile (str): Perfil de salida (por defecto el del descargador)
+            
+        Returns:
+            tuple: (éxito, mensaje, 'copy' o 'transcode')
+        """
+        mode, codec, quality, ext = self.conversion_plan(info, profile)
+        if progress:
+            progress.on_postprocess({'status': 'started', 'postprocessor': 'ExtractAudio'})
         try:
-            if file_path.suffix.lower() == '.csv':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    for row in reader:
-                        if row:  # Si la fila no está vacía
-                            songs.append(row[0].strip())  # Primera columna
-            elif file_path.suffix.lower() == '.txt':
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        song = line.strip()
-                        if song:  # Si la línea no está vacía
-                            songs.append(song)
+            if not get_ffmpeg_path():
+                raise Exception("FFmpeg no está instalado. Por favor instálalo desde https://ffmpeg.org/download.html")
+            dest = self.output_file(info, output_path, ext)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            transcode(source, dest, codec, quality, copy=(mode == 'copy'))
+            info = dict(info, requested_downloads=[{'filepath': str(dest)}])
+            self._record_download(info, profile)
+            if mode == 'copy':
+                return True, f"✓ Descargado sin recodificar: {info.get('title', 'Sin título')}", mode
+            return True, f"✓ Descargado: {info.get('title', 'Sin título')}", mode
+        except Exception as e:
+            return False, f"✗ Error: {str(e)}", mode
+        finally:
+            if self.workspaces.owns(Path(source).parent):
+                self.workspaces.release(Path(source).parent)
             else:
-                raise ValueError("Formato no soportado. Use .txt o .csv")
+                Path(source).unlink(missing_ok=True)
+            if progress:
+                progress.on_postprocess({'status': 'finished', 'postprocessor': 'ExtractAudio'})
+    
+    def _record_download(self, info, profile=None):
+        """Guarda en el índice el archivo final de una descarga"""
+        downloads = info.get('requested_downloads') or []
+        filepath = downloads[-1].get('filepath') if downloads else None
+        if not filepath or not Path(filepath).exists():
+            return
+        codec, quality = self._output_format(profile)
+        try:
+            self.archive.add(filepath, info.get('id'), info.get('title'), codec, quality)
+        except Exception as e:
+            print(f"Error actualizando índice de descargas: {e}")
+        try:
+            self.library.add(filepath, info)
+        except Exception as e:
+            print(f"Error actualizando la biblioteca: {e}")
+    
+    def load_playlist_from_file(self, file_path):
+        """
+        Carga una lista de canciones desde un archivo CSV, TXT, JSON, JSONL o M3U
+        
+        Para listas grandes es mejor playlist.iter_playlist, que las lee a
+        medida que se buscan.
+        
+        Args:
+            file_path (str): Ruta del archivo
             
-            return songs
+        Returns:
+            list: Entradas de la lista: diccionarios con 'url' (no hace falta
+                buscarlas) o con 'query' y opcionalmente 'duration'
+        """
+        try:
+            return list(iter_playlist(file_path))
         except Exception as e:
             raise Exception(f"Error cargando archivo: {str(e)}")
     
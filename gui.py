@@ -5,10 +5,64 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 from downloader import YouTubeDownloader
 from player import AudioPlayer
-from config import AUTO_SELECT_FIRST, DOWNLOADS_DIR
+from scheduler import DownloadScheduler
+from progress import ProgressTracker
+from retry import summarize_failures
+from queue_store import DownloadQueueStore, RESOLVING, PENDING, FAILED, DONE
+from playlist import iter_playlist, stage_entries
+from config import (
+    DOWNLOADS_DIR, DOWNLOAD_WORKERS, UI_TICK_MS, OUTPUT_PROFILES, DEFAULT_PROFILE, get_ffmpeg_path,
+)
 import threading
 
 
+class UIDispatcher:
+    """
+    Cola de actualizaciones de la interfaz
+    
+    Los hilos de trabajo publican llamadas con post() y el bucle de Tk las
+    aplica en cada tick. Las llamadas con la misma clave se combinan y solo
+    se aplica la última, así que miles de eventos de progreso no bloquean a
+    los workers ni saturan el redibujado.
+    """
+    
+    def __init__(self, root, interval_ms=UI_TICK_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.root.after(self.interval_ms, self._drain)
+    
+    def post(self, func, *args, key=None):
+        """
+        Publica una llamada para ejecutarla en el hilo de Tk
+        
+        Args:
+            func (callable): Función a llamar
+            *args: Argumentos de la función
+            key (str): Si se indica, reemplaza a la llamada pendiente con la misma clave
+        """
+        with self._lock:
+            if key is None:
+                key = object()
+            else:
+                # Mover al final para respetar el orden de la última actualización
+                self._pending.pop(key, None)
+            self._pending[key] = (func, args)
+    
+    def _drain(self):
+        """Aplica las llamadas pendientes (en el hilo de Tk)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        # Programar el siguiente tick antes, por si una llamada abre un diálogo modal
+        self.root.after(self.interval_ms, self._drain)
+        for func, args in pending.values():
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error actualizando la interfaz: {e}")
+
+
 class MusicDownloaderGUI:
     """Interfaz gráfica del descargador de música"""
     
@@ -19,13 +73,28 @@ class MusicDownloaderGUI:
         self.root.resizable(True, True)
         
         self.downloader = YouTubeDownloader()
-        self.player = AudioPlayer()
+        self.player = AudioPlayer(self.downloader.session, self.downloader.workspaces)
         self.current_results = []
         self.selected_result = None
         self.queue = []
+        self.queue_store = DownloadQueueStore()
         self.is_downloading = False
         
+        self.ui = UIDispatcher(root)
         self.setup_ui()
+        self._restore_queue()
+    
+    def warm_up(self):
+        """
+        Carga en segundo plano lo que es lento de iniciar (FFmpeg, yt-dlp y
+        el mezclador de audio), una vez que la ventana ya se ha dibujado
+        """
+        def warm_up_thread():
+            get_ffmpeg_path()
+            self.player.warm_up()
+            self.downloader.session.warm_up()
+        
+        threading.Thread(target=warm_up_thread, daemon=True).start()
     
     def setup_ui(self):
         """Configura la interfaz gráfica"""
@@ -127,6 +196,12 @@ class MusicDownloaderGUI:
         self.download_path.insert(0, str(DOWNLOADS_DIR))
         
         ttk.Button(options_frame, text="Cambiar", command=self.select_download_path).grid(row=0, column=2, padx=5)
+        ttk.Button(options_frame, text="Reindexar carpeta", command=self.rebuild_archive).grid(row=0, column=3, padx=5)
+        
+        ttk.Label(options_frame, text="Perfil de salida:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE)
+        ttk.Combobox(options_frame, textvariable=self.profile_var, values=list(OUTPUT_PROFILES),
+                     state='readonly', width=20).grid(row=1, column=1, sticky=tk.W, padx=5, pady=(5, 0))
         
         # Frame de estado
         status_frame = ttk.LabelFrame(main_frame, text="Estado", padding="10")
@@ -137,6 +212,9 @@ class MusicDownloaderGUI:
         
         self.progress = ttk.Progressbar(status_frame, mode='indeterminate')
         self.progress.pack(fill=tk.X, pady=5)
+        
+        self.transfer_label = ttk.Label(status_frame, text="")
+        self.transfer_label.pack(pady=2)
     
     def search_song(self):
         """Busca una canción"""
@@ -147,27 +225,38 @@ class MusicDownloaderGUI:
         
         self.update_status("Buscando...", "blue")
         self.progress.start()
+        self.player.cancel_prefetch()
         
         def search_thread():
             try:
-                self.current_results = self.downloader.search_song(query)
-                self.display_results()
+                # La biblioteca responde al instante; YouTube tarda más
+                local = self.downloader.search_library(query)
+                if local:
+                    self.ui.post(self.display_results, local, key='results')
+                    self.update_status(f"{len(local)} en la biblioteca, buscando en YouTube...", "blue")
+                results = self.downloader.search_song(query, include_library=True)
+                self.ui.post(self.display_results, results, key='results')
+                self.player.prefetch(results)
                 self.update_status("Búsqueda completada", "green")
             except Exception as e:
-                messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+                self.ui.post(messagebox.showerror, "Error", f"Error en búsqueda: {str(e)}")
                 self.update_status("Error en búsqueda", "red")
             finally:
-                self.progress.stop()
+                self.ui.post(self.progress.stop, key='progress')
         
         thread = threading.Thread(target=search_thread, daemon=True)
         thread.start()
     
-    def display_results(self):
+    def display_results(self, results=None):
         """Muestra los resultados en la listbox"""
+        if results is not None:
+            self.current_results = results
         self.results_listbox.delete(0, tk.END)
         for i, result in enumerate(self.current_results, 1):
             duration = self._format_duration(result['duration'])
             display_text = f"{i}. {result['title'][:60]} ({duration}) - {result['uploader'][:30]}"
+            if result.get('in_library'):
+                display_text = f"✓ {display_text}  [en biblioteca]"
             self.results_listbox.insert(tk.END, display_text)
     
     def _format_duration(self, seconds):
@@ -198,7 +287,9 @@ class MusicDownloaderGUI:
 Duración: {self._format_duration(info['duration'])}
 Uploader: {info['uploader']}
 Visualizaciones: {info['views']:,}
-URL: {info['url']}"""
+URL: {info['url'] or 'N/A'}"""
+        if info.get('in_library'):
+            text += f"\nYa descargada: {info['path']}"
         
         self.info_text.insert(tk.END, text)
     
@@ -208,33 +299,25 @@ URL: {info['url']}"""
             messagebox.showwarning("Advertencia", "Selecciona un resultado primero")
             return
         
-        # Deshabilitar botones
-        self.play_btn.config(state=tk.DISABLED)
-        self.pause_btn.config(state=tk.DISABLED)
-        self.stop_btn.config(state=tk.DISABLED)
+        # Las canciones ya descargadas suenan desde su archivo, sin red
+        source = self.selected_result['url']
+        if self.selected_result.get('in_library') and self.selected_result.get('path'):
+            source = self.selected_result['path']
+        if not source:
+            messagebox.showwarning("Advertencia", "Este resultado no tiene audio que reproducir")
+            return
         
-        self.update_player_status("Cargando preview...", "blue")
+        # play_preview solo encola la orden en el hilo del reproductor
+        try:
+            self.player.play_preview(source, duration_limit=30)
+            self.update_player_status("Reproduciendo...", "green")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error reproduciendo: {str(e)}")
+            self.update_player_status("Error", "red")
         
-        def play_thread():
-            try:
-                self.player.play_preview(self.selected_result['url'], duration_limit=30)
-                
-                # Habilitar botones después de que se cargue
-                self.play_btn.config(state=tk.NORMAL)
-                self.pause_btn.config(state=tk.NORMAL)
-                self.stop_btn.config(state=tk.NORMAL)
-                
-                self.update_player_status("Reproduciendo...", "green")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error reproduciendo: {str(e)}")
-                self.update_player_status("Error", "red")
-                # Re-habilitar botones aunque falle
-                self.play_btn.config(state=tk.NORMAL)
-                self.pause_btn.config(state=tk.NORMAL)
-                self.stop_btn.config(state=tk.NORMAL)
-        
-        thread = threading.Thread(target=play_thread, daemon=True)
-        thread.start()
+        self.play_btn.config(state=tk.NORMAL)
+        self.pause_btn.config(state=tk.NORMAL)
+        self.stop_btn.config(state=tk.NORMAL)
     
     def pause_player(self):
         """Pausa la reproducción"""
@@ -260,26 +343,35 @@ URL: {info['url']}"""
         self.player.set_volume(vol / 100.0)
     
     def update_player_status(self, message, color="black"):
-        """Actualiza el estado del reproductor"""
-        self.player_status.config(text=message, foreground=color)
-        self.root.update_idletasks()
+        """Actualiza el estado del reproductor (desde cualquier hilo)"""
+        self.ui.post(self._apply_label, self.player_status, message, color, key='player_status')
     
     def add_to_queue(self):
         """Agrega el resultado seleccionado a la cola"""
         if not self.selected_result:
             messagebox.showwarning("Advertencia", "Selecciona un resultado primero")
             return
+        if self.selected_result.get('in_library'):
+            messagebox.showinfo("Ya descargada", f"Ya está en la biblioteca: {self.selected_result['path']}")
+            return
         
-        self.queue.append(self.selected_result)
+        song = dict(self.selected_result)
+        song['queue_id'] = self.queue_store.add([song])[0]
+        self.queue.append(song)
         self.update_queue_label()
         messagebox.showinfo("Éxito", f"Agregado: {self.selected_result['title']}")
     
     def update_queue_label(self):
-        """Actualiza el label de la cola"""
+        """Actualiza el label de la cola (desde cualquier hilo)"""
+        self.ui.post(self._apply_queue_label, key='queue_label')
+    
+    def _apply_queue_label(self):
         self.queue_label.config(text=f"Canciones en cola: {len(self.queue)}")
     
     def clear_queue(self):
         """Limpia la cola de descargas"""
+        self.downloader.discard_partial(self.queue_store.unfinished())
+        self.queue_store.remove()
         self.queue = []
         self.update_queue_label()
         messagebox.showinfo("Éxito", "Cola limpiada")
@@ -291,321 +383,162 @@ URL: {info['url']}"""
             return
         
         self.is_downloading = True
-        self.progress.start()
+        self.progress.config(mode='determinate', maximum=100, value=0)
         
-        def download_thread():
-            for i, song in enumerate(self.queue, 1):
-                self.update_status(f"Descargando {i}/{len(self.queue)}: {song['title'][:50]}", "blue")
-                success, message = self.downloader.download_song(
-                    song['url'],
-                    self.download_path.get()
+        songs = list(self.queue)
+        output_path = self.download_path.get()
+        profile = self.profile_var.get()
+        completed = [0]
+        
+        def on_progress(event):
+            if event['status'] == 'started':
+                self.update_status(
+                    f"Descargando {completed[0]}/{event['total']} completadas - {event['message']}", "blue"
                 )
-                if success:
-                    self.update_status(message, "green")
-                else:
-                    self.update_status(message, "red")
-                    messagebox.showerror("Error", message)
+            elif event['status'] in ('succeeded', 'skipped', 'failed'):
+                completed[0] += 1
+                color = "red" if event['status'] == 'failed' else "green"
+                self.update_status(f"[{completed[0]}/{event['total']}] {event['message']}", color)
+        
+        def on_bytes(snapshot):
+            self.ui.post(self._show_transfer, snapshot, key='transfer')
+        
+        def download_thread():
+            tracker = ProgressTracker(len(songs), on_bytes)
+            scheduler = DownloadScheduler(
+                self.downloader, DOWNLOAD_WORKERS, on_progress, tracker, store=self.queue_store
+            )
+            summary = scheduler.run(songs, output_path, profile)
             
+            # Las completadas salen de la cola; las fallidas se quedan para reintentarlas
+            self.queue_store.remove((DONE,))
+            remaining = [song for song in self.queue_store.unfinished() if song.get('url')]
             self.is_downloading = False
-            self.progress.stop()
-            self.queue = []
-            self.update_queue_label()
-            self.update_status("Descargas completadas", "green")
-            messagebox.showinfo("Éxito", "Todas las descargas completadas")
+            self.ui.post(self._show_transfer, summary['progress'], key='transfer')
+            self.ui.post(self.progress.config, {'mode': 'indeterminate', 'value': 0}, key='progress')
+            self.ui.post(self._set_queue, remaining)
+            self.update_status(
+                f"Descargas completadas, {summary['skipped'] - len(summary['duplicates'])} ya existían, "
+                f"{len(summary['duplicates'])} duplicadas, "
+                f"{summary['copied']} sin recodificar "
+                f"({summary['songs_per_minute']:.1f} canciones/min)", "green"
+            )
+            if summary['failures']:
+                self.ui.post(
+                    messagebox.showwarning, "Descargas con errores",
+                    summarize_failures(summary['failures']) +
+                    "\n\nLas canciones fallidas siguen en la cola para reintentarlas."
+                )
+            else:
+                self.ui.post(messagebox.showinfo, "Éxito", "Todas las descargas completadas")
         
         thread = threading.Thread(target=download_thread, daemon=True)
         thread.start()
     
+    def _show_transfer(self, snapshot):
+        """Muestra el progreso en bytes de la cola"""
+        self.progress.config(value=snapshot['fraction'] * 100)
+        text = (f"{snapshot['downloaded_bytes'] / 1e6:.1f} MB · "
+                f"{snapshot['smoothed_speed'] / 1e6:.2f} MB/s · "
+                f"{snapshot['active']} activas")
+        if snapshot['eta'] is not None and snapshot['items_finished'] < snapshot['items_total']:
+            text += f" · ETA {self._format_duration(int(snapshot['eta']))}"
+        text += (f" · red {snapshot['network_seconds']:.0f}s / "
+                 f"FFmpeg {snapshot['postprocess_seconds']:.0f}s")
+        self.transfer_label.config(text=text)
+    
     def load_playlist(self):
         """Carga una lista de canciones desde archivo"""
         file_path = filedialog.askopenfilename(
-            filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")]
+            filetypes=[("Listas", "*.csv *.txt *.json *.jsonl *.m3u *.m3u8"), ("CSV files", "*.csv"),
+                       ("Text files", "*.txt"), ("All files", "*.*")]
         )
         
         if not file_path:
             return
         
         try:
-            songs = self.downloader.load_playlist_from_file(file_path)
+            entries = iter_playlist(file_path)
             self.queue = []
+            self._apply_queue_label()
+            # Cada lote se guarda antes de buscarlo para no perder la lista si la app se cierra a medias
+            self.downloader.discard_partial(self.queue_store.unfinished())
+            self.queue_store.remove()
             
-            self.update_status(f"Buscando {len(songs)} canciones...", "blue")
+            self.update_status("Buscando canciones...", "blue")
             self.progress.start()
-            
-            def load_thread():
-                for song_name in songs:
-                    try:
-                        results = self.downloader.search_song(song_name)
-                        if results:
-                            if AUTO_SELECT_FIRST:
-                                self.queue.append(results[0])
-                            else:
-                                self.queue.append(results[0])  # Agrega el primero por defecto
-                    except Exception as e:
-                        print(f"Error buscando {song_name}: {e}")
-                
-                self.progress.stop()
-                self.update_queue_label()
-                self.update_status(f"Cargadas {len(self.queue)} canciones", "green")
-                messagebox.showinfo("Éxito", f"Se cargaron {len(self.queue)} canciones en la cola")
-            
-            thread = threading.Thread(target=load_thread, daemon=True)
-            thread.start()
+            self._resolve_queue(stage_entries(entries, self.queue_store))
             
         except Exception as e:
             messagebox.showerror("Error", f"Error cargando archivo: {str(e)}")
     
-    def select_download_path(self):
-        """Selecciona la ruta de descarga"""
-        path = filedialog.askdirectory(title="Selecciona carpeta de descargas")
-        if path:
-            self.download_path.delete(0, tk.END)
-            self.download_path.insert(0, path)
-    
-    def update_status(self, message, color="black"):
-        """Actualiza el estado"""
-        self.status_label.config(text=message, foreground=color)
-        self.root.update_idletasks()
-
-
-def main():
-    root = tk.Tk()
-    app = MusicDownloaderGUI(root)
-    root.mainloop()
-
-
-if __name__ == "__main__":
-    main()
-    
-    def setup_ui(self):
-        """Configura la interfaz gráfica"""
-        # Frame principal
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Título
-        title = ttk.Label(main_frame, text="🎵 Descargador de Música YouTube", 
-                         font=('Arial', 14, 'bold'))
-        title.grid(row=0, column=0, columnspan=3, pady=10)
-        
-        # Frame de búsqueda
-        search_frame = ttk.LabelFrame(main_frame, text="Búsqueda", padding="10")
-        search_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
-        
-        ttk.Label(search_frame, text="Canción:").grid(row=0, column=0, sticky=tk.W)
-        self.search_entry = ttk.Entry(search_frame, width=50)
-        self.search_entry.grid(row=0, column=1, padx=5, sticky=(tk.W, tk.E))
-        self.search_entry.bind('<Return>', lambda e: self.search_song())
-        
-        ttk.Button(search_frame, text="Buscar", command=self.search_song).grid(row=0, column=2, padx=5)
-        ttk.Button(search_frame, text="Cargar CSV/TXT", command=self.load_playlist).grid(row=0, column=3, padx=5)
-        
-        # Frame de resultados
-        results_frame = ttk.LabelFrame(main_frame, text="Resultados", padding="10")
-        results_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
-        
-        # Listbox con scrollbar
-        scrollbar = ttk.Scrollbar(results_frame)
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        
-        self.results_listbox = tk.Listbox(results_frame, yscrollcommand=scrollbar.set, height=8)
-        self.results_listbox.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.results_listbox.bind('<<ListboxSelect>>', self.on_result_select)
-        scrollbar.config(command=self.results_listbox.yview)
-        
-        # Frame de información del resultado seleccionado
-        info_frame = ttk.LabelFrame(main_frame, text="Información del Video", padding="10")
-        info_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
-        
-        self.info_text = scrolledtext.ScrolledText(info_frame, height=4, width=80)
-        self.info_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Frame de cola de descargas
-        queue_frame = ttk.LabelFrame(main_frame, text="Cola de Descargas", padding="10")
-        queue_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
-        
-        ttk.Button(queue_frame, text="+ Agregar a Cola", command=self.add_to_queue).pack(side=tk.LEFT, padx=5)
-        ttk.Button(queue_frame, text="✓ Descargar Cola", command=self.start_download_queue).pack(side=tk.LEFT, padx=5)
-        ttk.Button(queue_frame, text="Limpiar Cola", command=self.clear_queue).pack(side=tk.LEFT, padx=5)
-        
-        self.queue_label = ttk.Label(queue_frame, text="Canciones en cola: 0")
-        self.queue_label.pack(side=tk.RIGHT, padx=5)
-        
-        # Frame de opciones
-        options_frame = ttk.LabelFrame(main_frame, text="Opciones", padding="10")
-        options_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
-        
-        ttk.Label(options_frame, text="Ruta de descarga:").grid(row=0, column=0, sticky=tk.W)
-        self.download_path = ttk.Entry(options_frame, width=50)
-        self.download_path.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
-        self.download_path.insert(0, str(DOWNLOADS_DIR))
-        
-        ttk.Button(options_frame, text="Cambiar", command=self.select_download_path).grid(row=0, column=2, padx=5)
-        
-        # Frame de estado
-        status_frame = ttk.LabelFrame(main_frame, text="Estado", padding="10")
-        status_frame.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
-        
-        self.status_label = ttk.Label(status_frame, text="Listo", foreground="green")
-        self.status_label.pack(pady=5)
-        
-        self.progress = ttk.Progressbar(status_frame, mode='indeterminate')
-        self.progress.pack(fill=tk.X, pady=5)
-    
-    def search_song(self):
-        """Busca una canción"""
-        query = self.search_entry.get().strip()
-        if not query:
-            messagebox.showwarning("Advertencia", "Ingresa un término de búsqueda")
-            return
+    def _resolve_queue(self, entries):
+        """
+        Busca en segundo plano las canciones de la cola que aún no tienen URL
         
-        self.update_status("Buscando...", "blue")
-        self.progress.start()
+        Las entradas que ya traen URL pasan directamente a la cola.
         
-        def search_thread():
+        Args:
+            entries (iterable): Tuplas (queue_id, entrada); la entrada es un
+                diccionario con 'url' o con 'query' y opcionalmente 'duration'
+        """
+        def load_thread():
+            loaded = 0
+            search_ids = []
+            
+            def searches():
+                nonlocal loaded
+                for queue_id, entry in entries:
+                    if entry.get('url'):
+                        loaded += 1
+                        self.ui.post(self._append_to_queue, dict(entry, queue_id=queue_id))
+                        continue
+                    search_ids.append(queue_id)
+                    yield entry
+            
             try:
-                self.current_results = self.downloader.search_song(query)
-                self.display_results()
-                self.update_status("Búsqueda completada", "green")
+                # resolve_songs entrega los resultados ordenados: el primero es el elegido
+                for index, song_name, results, error in self.downloader.resolve_songs(searches()):
+                    queue_id = search_ids[index]
+                    if error or not results:
+                        if error:
+                            print(f"Error buscando {song_name}: {error}")
+                        self.queue_store.update(queue_id, state=FAILED, error=str(error or "Sin resultados"))
+                        continue
+                    loaded += 1
+                    song = dict(results[0], queue_id=queue_id)
+                    self.queue_store.update(
+                        queue_id, state=PENDING, url=song['url'], title=song['title'], song=results[0]
+                    )
+                    self.ui.post(self._append_to_queue, song)
+                    self.update_status(f"Cargadas {loaded} canciones...", "blue")
             except Exception as e:
-                messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
-                self.update_status("Error en búsqueda", "red")
-            finally:
-                self.progress.stop()
-        
-        thread = threading.Thread(target=search_thread, daemon=True)
-        thread.start()
-    
-    def display_results(self):
-        """Muestra los resultados en la listbox"""
-        self.results_listbox.delete(0, tk.END)
-        for i, result in enumerate(self.current_results, 1):
-            duration = self._format_duration(result['duration'])
-            display_text = f"{i}. {result['title'][:60]} ({duration}) - {result['uploader'][:30]}"
-            self.results_listbox.insert(tk.END, display_text)
-    
-    def _format_duration(self, seconds):
-        """Formatea duración en minutos:segundos"""
-        if not seconds:
-            return "N/A"
-        mins = seconds // 60
-        secs = seconds % 60
-        return f"{mins}:{secs:02d}"
-    
-    def on_result_select(self, event):
-        """Cuando se selecciona un resultado"""
-        selection = self.results_listbox.curselection()
-        if selection:
-            idx = selection[0]
-            self.selected_result = self.current_results[idx]
-            self.display_result_info()
-    
-    def display_result_info(self):
-        """Muestra información del resultado seleccionado"""
-        if not self.selected_result:
-            return
-        
-        self.info_text.delete(1.0, tk.END)
-        info = self.selected_result
-        
-        text = f"""Título: {info['title']}
-Duración: {self._format_duration(info['duration'])}
-Uploader: {info['uploader']}
-Visualizaciones: {info['views']:,}
-URL: {info['url']}"""
-        
-        self.info_text.insert(tk.END, text)
-    
-    def add_to_queue(self):
-        """Agrega el resultado seleccionado a la cola"""
-        if not self.selected_result:
-            messagebox.showwarning("Advertencia", "Selecciona un resultado primero")
-            return
-        
-        self.queue.append(self.selected_result)
-        self.update_queue_label()
-        messagebox.showinfo("Éxito", f"Agregado: {self.selected_result['title']}")
-    
-    def update_queue_label(self):
-        """Actualiza el label de la cola"""
-        self.queue_label.config(text=f"Canciones en cola: {len(self.queue)}")
-    
-    def clear_queue(self):
-        """Limpia la cola de descargas"""
-        self.queue = []
-        self.update_queue_label()
-        messagebox.showinfo("Éxito", "Cola limpiada")
-    
-    def start_download_queue(self):
-        """Inicia la descarga de la cola"""
-        if not self.queue:
-            messagebox.showwarning("Advertencia", "No hay canciones en la cola")
-            return
-        
-        self.is_downloading = True
-        self.progress.start()
-        
-        def download_thread():
-            for i, song in enumerate(self.queue, 1):
-                self.update_status(f"Descargando {i}/{len(self.queue)}: {song['title'][:50]}", "blue")
-                success, message = self.downloader.download_song(
-                    song['url'],
-                    self.download_path.get()
-                )
-                if success:
-                    self.update_status(message, "green")
-                else:
-                    self.update_status(message, "red")
-                    messagebox.showerror("Error", message)
+                self.ui.post(messagebox.showerror, "Error", f"Error cargando archivo: {str(e)}")
             
-            self.is_downloading = False
-            self.progress.stop()
-            self.queue = []
-            self.update_queue_label()
-            self.update_status("Descargas completadas", "green")
-            messagebox.showinfo("Éxito", "Todas las descargas completadas")
+            self.queue_store.flush()
+            self.ui.post(self.progress.stop, key='progress')
+            self.update_status(f"Cargadas {loaded} canciones", "green")
+            self.ui.post(messagebox.showinfo, "Éxito", f"Se cargaron {loaded} canciones en la cola")
         
-        thread = threading.Thread(target=download_thread, daemon=True)
+        thread = threading.Thread(target=load_thread, daemon=True)
         thread.start()
     
-    def load_playlist(self):
-        """Carga una lista de canciones desde archivo"""
-        file_path = filedialog.askopenfilename(
-            filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")]
-        )
-        
-        if not file_path:
-            return
-        
+    def _restore_queue(self):
+        """Recupera la cola que quedó sin terminar en la sesión anterior"""
         try:
-            songs = self.downloader.load_playlist_from_file(file_path)
-            self.queue = []
-            
-            self.update_status(f"Buscando {len(songs)} canciones...", "blue")
-            self.progress.start()
-            
-            def load_thread():
-                for song_name in songs:
-                    try:
-                        results = self.downloader.search_song(song_name)
-                        if results:
-                            if AUTO_SELECT_FIRST:
-                                self.queue.append(results[0])
-                            else:
-                                self.queue.append(results[0])  # Agrega el primero por defecto
-                    except Exception as e:
-                        print(f"Error buscando {song_name}: {e}")
-                
-                self.progress.stop()
-                self.update_queue_label()
-                self.update_status(f"Cargadas {len(self.queue)} canciones", "green")
-                messagebox.showinfo("Éxito", f"Se cargaron {len(self.queue)} canciones en la cola")
-            
-            thread = threading.Thread(target=load_thread, daemon=True)
-            thread.start()
-            
+            items = self.queue_store.unfinished()
         except Exception as e:
-            messagebox.showerror("Error", f"Error cargando archivo: {str(e)}")
+            print(f"Error leyendo la cola guardada: {e}")
+            return
+        self.queue = [song for song in items if song.get('url')]
+        self._apply_queue_label()
+        unresolved = [(song['queue_id'], {'query': song['query'], 'duration': song.get('duration')})
+                      for song in items if song['state'] == RESOLVING and song.get('query')]
+        if self.queue:
+            self.update_status(f"Recuperadas {len(self.queue)} canciones de la sesión anterior", "blue")
+        if unresolved:
+            self.progress.start()
+            self._resolve_queue(unresolved)
     
     def select_download_path(self):
         """Selecciona la ruta de descarga"""
@@ -614,15 +547,51 @@ URL: {info['url']}"""
             self.download_path.delete(0, tk.END)
             self.download_path.insert(0, path)
     
+    def rebuild_archive(self):
+        """Importa la carpeta actual a la biblioteca y al índice de descargas"""
+        folder = self.download_path.get()
+        self.update_status("Indexando carpeta...", "blue")
+        self.progress.start()
+        
+        def on_progress(done, total):
+            self.update_status(f"Leyendo etiquetas: {done}/{total}", "blue")
+        
+        def rebuild_thread():
+            try:
+                summary = self.downloader.scan_library(folder, on_progress)
+                self.update_status(
+                    f"Indexados {summary['found']} archivos ({summary['probed']} nuevos o modificados)", "green"
+                )
+            except Exception as e:
+                self.ui.post(messagebox.showerror, "Error", f"Error indexando carpeta: {str(e)}")
+                self.update_status("Error indexando carpeta", "red")
+            finally:
+                self.ui.post(self.progress.stop, key='progress')
+        
+        thread = threading.Thread(target=rebuild_thread, daemon=True)
+        thread.start()
+    
+    def _append_to_queue(self, song):
+        self.queue.append(song)
+        self._apply_queue_label()
+    
+    def _set_queue(self, songs):
+        self.queue = songs
+        self._apply_queue_label()
+    
     def update_status(self, message, color="black"):
-        """Actualiza el estado"""
-        self.status_label.config(text=message, foreground=color)
-        self.root.update_idletasks()
+        """Actualiza el estado (desde cualquier hilo)"""
+        self.ui.post(self._apply_label, self.status_label, message, color, key='status')
+    
+    def _apply_label(self, label, message, color):
+        label.config(text=message, foreground=color)
 
 
 def main():
     root = tk.Tk()
     app = MusicDownloaderGUI(root)
+    # Dejar que la ventana se dibuje antes de cargar las librerías pesadas
+    root.after(100, app.warm_up)
     root.mainloop()
 
 
@@ -0,0 +1,275 @@
+"""
+Catálogo local de la biblioteca con búsqueda instantánea
+"""
+import difflib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from config import CACHE_DIR, LIBRARY_FUZZY_THRESHOLD, ensure_dirs
+
+# Candidatos que la búsqueda aproximada compara uno por uno
+FUZZY_CANDIDATES = 200
+
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+
+def normalize_text(text):
+    """Minúsculas, sin acentos ni signos, para comparar títulos"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split())
+
+
+def _trigrams(text):
+    """Trigramas de cada palabra (las de menos de 3 letras se ignoran)"""
+    grams = []
+    for word in text.split():
+        if len(word) < 3:
+            continue
+        for i in range(len(word) - 2):
+            gram = word[i:i + 3]
+            if gram not in grams:
+                grams.append(gram)
+    return grams
+
+
+class LibraryCatalog:
+    """
+    Catálogo en SQLite de las canciones descargadas, con índice FTS5
+    
+    Guarda título, canal, duración e ID de video de cada archivo. Las
+    búsquedas por prefijo usan el índice de palabras; si no bastan, un
+    índice de trigramas propone candidatos parecidos que se ordenan por
+    similitud, así que ambas responden en milisegundos aunque haya cientos
+    de miles de archivos.
+    """
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Ruta del archivo SQLite (por defecto en CACHE_DIR)
+        """
+        if path is None:
+            ensure_dirs()
+        self.path = str(path or CACHE_DIR / 'library.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tracks ('
+            ' id INTEGER PRIMARY KEY,'
+            ' path TEXT NOT NULL UNIQUE,'
+            ' video_id TEXT,'
+            ' url TEXT,'
+            ' title TEXT,'
+            ' uploader TEXT,'
+            ' duration INTEGER,'
+            ' codec TEXT,'
+            ' norm TEXT,'
+            ' added REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS tracks_video ON tracks (video_id)')
+        # Índice de palabras con prefijos de 2 y 3 letras precalculados
+        self._conn.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5('
+            " title, uploader, content='tracks', content_rowid='id',"
+            " tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        self.fuzzy_index = self._create_trigram_index()
+        self._create_triggers()
+        self._conn.commit()
+    
+    def _create_trigram_index(self):
+        """Crea el índice de trigramas (requiere SQLite 3.34 o posterior)"""
+        try:
+            self._conn.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS tracks_tri USING fts5('
+                " norm, content='tracks', content_rowid='id', tokenize='trigram')"
+            )
+            return True
+        except sqlite3.OperationalError:
+            return False
+    
+    def _create_triggers(self):
+        """Mantiene los índices al día con cada cambio en la tabla"""
+        tri_insert = tri_delete = ''
+        if self.fuzzy_index:
+            tri_insert = 'INSERT INTO tracks_tri (rowid, norm) VALUES (new.id, new.norm);'
+            tri_delete = "INSERT INTO tracks_tri (tracks_tri, rowid, norm) VALUES ('delete', old.id, old.norm);"
+        fts_insert = 'INSERT INTO tracks_fts (rowid, title, uploader) VALUES (new.id, new.title, new.uploader);'
+        fts_delete = ("INSERT INTO tracks_fts (tracks_fts, rowid, title, uploader) "
+                      "VALUES ('delete', old.id, old.title, old.uploader);")
+        self._conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN {fts_insert} {tri_insert} END"
+        )
+        self._conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN {fts_delete} {tri_delete} END"
+        )
+        self._conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN '
+            f"{fts_delete} {tri_delete} {fts_insert} {tri_insert} END"
+        )
+    
+    def add(self, path, info=None, codec=None):
+        """
+        Registra o actualiza un archivo de la biblioteca
+        
+        Args:
+            path (str): Archivo de audio
+            info (dict): Info de yt-dlp de la descarga (id, title, uploader, duration)
+            codec (str): Formato del archivo (por defecto, su extensión)
+        """
+        self.add_many([(path, info or {}, codec)])
+    
+    def add_many(self, entries):
+        """
+        Registra varios archivos en una sola transacción
+        
+        Args:
+            entries (list): Tuplas (ruta, info, códec)
+        """
+        rows = []
+        now = time.time()
+        for path, info, codec in entries:
+            path = Path(path).resolve()
+            title = info.get('title') or path.stem
+            uploader = info.get('uploader') or info.get('channel')
+            duration = info.get('duration')
+            rows.append((
+                str(path), info.get('id'), info.get('webpage_url'), title, uploader,
+                int(duration) if duration else None, codec or path.suffix.lower().lstrip('.'),
+                normalize_text(f"{title} {uploader or ''}"), now,
+            ))
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO tracks (path, video_id, url, title, uploader, duration, codec, norm, added) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(path) DO UPDATE SET video_id = COALESCE(excluded.video_id, video_id), '
+                'url = COALESCE(excluded.url, url), title = excluded.title, '
+                'uploader = COALESCE(excluded.uploader, uploader), '
+                'duration = COALESCE(excluded.duration, duration), codec = excluded.codec, '
+                'norm = excluded.norm',
+                rows
+            )
+            self._conn.commit()
+    
+    def remove(self, paths):
+        """Quita del catálogo archivos borrados o movidos"""
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM tracks WHERE path = ?', [(str(Path(path).resolve()),) for path in paths]
+            )
+            self._conn.commit()
+    
+    def find_ids(self, video_ids):
+        """
+        Indica qué videos ya están en la biblioteca
+        
+        Args:
+            video_ids (list): IDs de YouTube
+        
+        Returns:
+            dict: ID -> ruta del archivo, solo para los que existen
+        """
+        video_ids = [video_id for video_id in video_ids if video_id]
+        if not video_ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT video_id, path FROM tracks WHERE video_id IN ({','.join('?' * len(video_ids))})",
+                video_ids
+            ).fetchall()
+        return {video_id: path for video_id, path in rows if Path(path).exists()}
+    
+    def search(self, query, limit=20):
+        """
+        Busca canciones por título o canal
+        
+        Primero busca las palabras como prefijos ("bohem rhap" encuentra
+        "Bohemian Rhapsody"); si no hay bastantes resultados, completa con
+        títulos parecidos para tolerar faltas de ortografía.
+        
+        Args:
+            query (str): Texto a buscar, o un ID de video
+            limit (int): Máximo de resultados
+        
+        Returns:
+            list: Diccionarios con path, video_id, url, title, uploader,
+                duration, codec y score (1.0 = coincidencia exacta)
+        """
+        query = query.strip()
+        norm = normalize_text(query)
+        if not norm:
+            return []
+        
+        with self._lock:
+            rows = []
+            if _VIDEO_ID_RE.match(query):
+                rows = self._conn.execute(
+                    'SELECT id, path, video_id, url, title, uploader, duration, codec, 1.0 '
+                    'FROM tracks WHERE video_id = ?', (query,)
+                ).fetchall()
+            words = ' '.join(f'"{word}"*' for word in norm.split())
+            rows += self._conn.execute(
+                'SELECT t.id, t.path, t.video_id, t.url, t.title, t.uploader, t.duration, t.codec, 1.0 '
+                'FROM tracks_fts JOIN tracks t ON t.id = tracks_fts.rowid '
+                'WHERE tracks_fts MATCH ? ORDER BY tracks_fts.rank LIMIT ?',
+                (words, limit)
+            ).fetchall()
+            if len(rows) < limit:
+                rows += self._fuzzy(norm, limit)
+        
+        results = []
+        seen = set()
+        for track_id, path, video_id, url, title, uploader, duration, codec, score in rows:
+            if track_id in seen:
+                continue
+            seen.add(track_id)
+            results.append({
+                'path': path, 'video_id': video_id, 'url': url, 'title': title,
+                'uploader': uploader, 'duration': duration, 'codec': codec, 'score': score,
+            })
+        return results[:limit]
+    
+    def _fuzzy(self, norm, limit):
+        """Títulos parecidos: candidatos por trigramas ordenados por similitud"""
+        grams = _trigrams(norm)
+        if self.fuzzy_index and grams:
+            terms = ' OR '.join(f'"{gram}"' for gram in grams)
+            candidates = self._conn.execute(
+                'SELECT t.id, t.path, t.video_id, t.url, t.title, t.uploader, t.duration, t.codec, t.norm '
+                'FROM tracks_tri JOIN tracks t ON t.id = tracks_tri.rowid '
+                'WHERE tracks_tri MATCH ? ORDER BY tracks_tri.rank LIMIT ?',
+                (terms, FUZZY_CANDIDATES)
+            ).fetchall()
+        else:
+            # SQLite sin tokenizador de trigramas: candidatos que empiezan igual
+            candidates = self._conn.execute(
+                'SELECT id, path, video_id, url, title, uploader, duration, codec, norm '
+                'FROM tracks WHERE norm LIKE ? LIMIT ?',
+                (norm[:3] + '%', FUZZY_CANDIDATES)
+            ).fetchall()
+        
+        scored = []
+        for *row, candidate in candidates:
+            # Comparar con el principio del texto, donde está el título
+            score = difflib.SequenceMatcher(None, norm, candidate[:len(norm) + 10]).ratio()
+            if score >= LIBRARY_FUZZY_THRESHOLD:
+                scored.append((*row, round(score, 3)))
+        scored.sort(key=lambda row: row[-1], reverse=True)
+        return scored[:limit]
+    
+    def count(self):
+        """Número de archivos en el catálogo"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM tracks').fetchone()[0]
+    
+    def close(self):
+        """Cierra la conexión"""
+        with self._lock:
+            self._conn.close()
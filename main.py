@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
 """
 Descargador de Música desde YouTube
+
+Sin argumentos abre la interfaz gráfica; con argumentos usa el modo consola
+(ver cli.py).
 """
-from gui import main
+import multiprocessing
+import sys
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos del escaneo en el .exe de Windows
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
+    
+    from gui import main
     main()
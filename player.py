@@ -1,318 +1,649 @@
 """
 Módulo de reproducción de audio
 """
-import yt_dlp
 import threading
 import time
+from collections import deque
+from itertools import chain
 from pathlib import Path
+from config import get_ffmpeg_path
+from prefetch import PreviewPrefetcher
+from session import YDLSessionPool
+from streaming import PCMStream, fetch_preview_range, resolve_stream
+from workspace import WorkspaceManager
 
+# Estados del reproductor
+IDLE = 'idle'
+LOADING = 'loading'
+PLAYING = 'playing'
+PAUSED = 'paused'
 
-class AudioPlayer:
-    """Reproductor de audio desde YouTube"""
+
+def _local_file(source):
+    """Ruta del archivo si la vista previa es de la biblioteca local, o None"""
+    if not source or '://' in source:
+        return None
+    path = Path(source)
+    return path if path.is_file() else None
+
+
+class PlaybackClock:
+    """Reloj de reproducción que descuenta el tiempo en pausa"""
     
     def __init__(self):
-        self.is_playing = False
-        self.is_paused = False
+        self.started = None
+        self.paused_at = None
+        self.paused_total = 0.0
+    
+    def start(self):
+        self.started = time.monotonic()
+    
+    def pause(self):
+        if self.started is not None and self.paused_at is None:
+            self.paused_at = time.monotonic()
+    
+    def resume(self):
+        if self.paused_at is not None:
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+    
+    def elapsed(self):
+        """Segundos reproducidos"""
+        if self.started is None:
+            return 0.0
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        return now - self.started - self.paused_total
+
+
+class AudioPlayer:
+    """
+    Reproductor de audio desde YouTube
+    
+    Todas las órdenes (play, pausa, stop, volumen) se encolan y las ejecuta
+    un único hilo trabajador, que es el único que toca el mezclador. Cada
+    play recibe un número de generación; una vista previa cuya generación
+    ya no es la actual se aborta sola.
+    """
+    
+    def __init__(self, session=None, workspaces=None):
+        """
+        Args:
+            session (YDLSessionPool): Pool de yt-dlp compartido (opcional)
+            workspaces (WorkspaceManager): Gestor de temporales compartido (opcional)
+        """
+        self.session = session or YDLSessionPool()
+        self.workspaces = workspaces or WorkspaceManager()
+        self.state = IDLE
+        self._state_cond = threading.Condition()
+        self._clock = None
+        self._elapsed_fn = None
+        self._commands = deque()
+        self._generation = 0
+        self._active_stream = None
         self.current_url = None
         self.current_process = None
         self.player_thread = None
+        self.channel = None
+        self.volume = 1.0
+        self.preview_stats = []
+        self.prefetcher = None
+        # pygame y el dispositivo de audio se inician en el primer uso
+        self.pygame_available = None
+        self._audio_lock = threading.Lock()
+    
+    def warm_up(self):
+        """Inicia pygame y el mezclador en segundo plano, antes del primer play"""
+        self._send('init')
+    
+    def _ensure_audio(self):
+        """
+        Importa pygame e inicia el mezclador la primera vez que hace falta
         
-        # Intentar importar pygame para reproducción de audio
-        try:
-            import pygame
-            pygame.mixer.init()
-            self.pygame_available = True
-        except:
-            self.pygame_available = False
-            print("⚠️  pygame no disponible, se descargará en temp para reproducir")
+        Returns:
+            bool: True si pygame está disponible
+        """
+        with self._audio_lock:
+            if self.pygame_available is not None:
+                return self.pygame_available
+            
+            # Intentar importar pygame para reproducción de audio
+            try:
+                import pygame
+                pygame.mixer.init()
+                self.pygame_available = True
+            except:
+                self.pygame_available = False
+                print("⚠️  pygame no disponible, se descargará en temp para reproducir")
+            
+            # La precarga solo sirve para el modo streaming (pygame + FFmpeg)
+            if self.pygame_available and get_ffmpeg_path():
+                import pygame
+                frequency, _, channels = pygame.mixer.get_init()
+                self.prefetcher = PreviewPrefetcher(self.session, sample_rate=frequency, channels=channels)
+            return self.pygame_available
+    
+    @property
+    def is_playing(self):
+        """True mientras hay una vista previa cargando, sonando o en pausa"""
+        return self.state in (LOADING, PLAYING, PAUSED)
+    
+    @property
+    def is_paused(self):
+        return self.state == PAUSED
+    
+    def _set_state(self, state, expected=None, generation=None):
+        """
+        Cambia de estado y despierta a los hilos que esperan
+        
+        Args:
+            state (str): Nuevo estado
+            expected (tuple): Estados desde los que se permite el cambio
+            generation (int): Si se indica, solo cambia si sigue siendo la actual
+            
+        Returns:
+            bool: True si se cambió el estado
+        """
+        with self._state_cond:
+            if generation is not None and generation != self._generation:
+                return False
+            if expected is not None and self.state not in expected:
+                return False
+            self.state = state
+            self._state_cond.notify_all()
+            return True
+    
+    def _is_current(self, generation):
+        """True si la vista previa de esa generación debe seguir sonando"""
+        return generation == self._generation and self.is_playing
+    
+    def _wait_for_elapsed(self, elapsed_fn, target, generation, max_wait=None):
+        """
+        Espera sin sondeo hasta que se reproduzcan target segundos
+        
+        Mientras espera atiende las órdenes de pausa, reanudación y volumen.
+        En pausa espera indefinidamente a que se reanude o se detenga.
+        
+        Args:
+            elapsed_fn (callable): Retorna los segundos reproducidos
+            target (float): Segundos a alcanzar
+            generation (int): Generación de la vista previa que espera
+            max_wait (float): Tiempo máximo de espera (opcional)
+            
+        Returns:
+            bool: True si se alcanzó target, False si se detuvo o venció max_wait
+        """
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        with self._state_cond:
+            while True:
+                # Un play nuevo se atiende al volver al bucle principal
+                while self._commands and self._commands[0][0] != 'play':
+                    command, args = self._commands.popleft()
+                    self._handle_command(command, args)
+                if not self._is_current(generation):
+                    break
+                remaining = target - elapsed_fn()
+                if self.state != PAUSED and remaining <= 0:
+                    return True
+                timeout = None if self.state == PAUSED else remaining
+                if deadline is not None:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return False
+                    timeout = left if timeout is None else min(timeout, left)
+                self._state_cond.wait(timeout)
+        return False
+    
+    def get_elapsed(self):
+        """Segundos reproducidos de la vista previa actual"""
+        elapsed_fn = self._elapsed_fn
+        return elapsed_fn() if elapsed_fn else 0.0
+    
+    def prefetch(self, results):
+        """
+        Precarga en segundo plano los primeros resultados de una búsqueda
+        
+        Args:
+            results (list): Resultados de search_song
+        """
+        self._ensure_audio()
+        if self.prefetcher:
+            self.prefetcher.prefetch(results)
+    
+    def cancel_prefetch(self):
+        """Cancela la precarga en curso (por ejemplo, al empezar otra búsqueda)"""
+        if self.prefetcher:
+            self.prefetcher.cancel()
     
     def play_preview(self, url, duration_limit=30):
         """
         Reproduce una vista previa de la canción (30 segundos)
         
+        Si ya hay una sonando, se aborta antes de empezar la nueva.
+        
         Args:
-            url (str): URL de YouTube
+            url (str): URL de YouTube, o ruta de un archivo de la biblioteca
             duration_limit (int): Duración máxima en segundos
             
         Returns:
             bool: True si se inició la reproducción
         """
-        # Limpiar previamente si hay algo en reproducción
-        if self.is_playing:
-            self.stop()
-        
-        self.current_url = url
-        self.is_playing = True
-        self.is_paused = False
-        
-        # Ejecutar reproducción en un thread separado
-        self.player_thread = threading.Thread(
-            target=self._play_thread,
-            args=(url, duration_limit),
-            daemon=True
-        )
-        self.player_thread.start()
+        with self._state_cond:
+            self._generation += 1
+            generation = self._generation
+            self.current_url = url
+            self.state = LOADING
+            self._state_cond.notify_all()
+        self._abort_decoder()
+        self._send('play', generation, url, duration_limit)
         return True
     
-    def _play_thread(self, url, duration_limit):
-        """Hilo para reproducir audio"""
+    def _send(self, command, *args):
+        """Encola una orden para el hilo trabajador"""
+        with self._state_cond:
+            self._commands.append((command, args))
+            self._state_cond.notify_all()
+            if self.player_thread is None or not self.player_thread.is_alive():
+                self.player_thread = threading.Thread(target=self._run, daemon=True)
+                self.player_thread.start()
+    
+    def _run(self):
+        """Bucle del hilo trabajador: ejecuta las órdenes en orden de llegada"""
+        while True:
+            with self._state_cond:
+                while not self._commands:
+                    self._state_cond.wait()
+                command, args = self._commands.popleft()
+            try:
+                self._handle_command(command, args)
+            except Exception as e:
+                print(f"Error en el reproductor: {e}")
+    
+    def _handle_command(self, command, args):
+        """Ejecuta una orden (solo desde el hilo trabajador)"""
+        if command == 'play':
+            generation, url, duration_limit = args
+            # Descartar plays que ya fueron reemplazados o detenidos
+            if self._is_current(generation):
+                self._play_thread(generation, url, duration_limit)
+        elif command == 'pause':
+            self._do_pause()
+        elif command == 'resume':
+            self._do_resume()
+        elif command == 'stop':
+            self._do_stop()
+        elif command == 'volume':
+            self._do_set_volume()
+        elif command == 'init':
+            self._ensure_audio()
+    
+    def _abort_decoder(self):
+        """Corta el FFmpeg en curso para que el trabajador quede libre cuanto antes"""
+        stream = self._active_stream
+        if stream:
+            stream.close()
+        process = self.current_process
+        if process:
+            try:
+                process.terminate()
+            except Exception:
+                pass
+    
+    def _play_thread(self, generation, url, duration_limit):
+        """Reproduce una vista previa (en el hilo trabajador)"""
         try:
+            self._ensure_audio()
+            if self.pygame_available and get_ffmpeg_path():
+                try:
+                    self._play_streaming(generation, url, duration_limit)
+                    return
+                except Exception as e:
+                    if not self._is_current(generation):
+                        return
+                    print(f"Streaming no disponible, descargando preview: {e}")
             if self.pygame_available:
-                self._play_with_pygame(url, duration_limit)
+                self._play_with_pygame(generation, url, duration_limit)
             else:
-                self._play_with_ffmpeg(url, duration_limit)
+                self._play_with_ffmpeg(generation, url, duration_limit)
         except Exception as e:
             print(f"Error reproduciendo: {e}")
-            self.is_playing = False
+            self._set_state(IDLE, generation=generation)
     
-    def _play_with_pygame(self, url, duration_limit):
+    def _play_streaming(self, generation, url, duration_limit):
+        """
+        Reproduce decodificando solo los primeros segundos directamente del
+        stream, sin descargar el archivo completo
+        """
+        import pygame
+        
+        frequency, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            raise Exception(f"Formato de mezclador no soportado: {size}")
+        
+        local = _local_file(url)
+        prefetched = self.prefetcher.get(url) if self.prefetcher and not local else None
+        if local:
+            # Canción de la biblioteca: FFmpeg lee el archivo directamente
+            stream_info = {'url': str(local), 'http_headers': {}}
+        elif prefetched:
+            stream_info = prefetched['stream']
+        else:
+            stream_info = resolve_stream(self.session, url)
+        if not self._is_current(generation):
+            return
+        
+        # Empezar por el audio precargado y seguir el stream desde donde acaba
+        pcm = None
+        offset = 0
+        if prefetched and prefetched['pcm'] and prefetched['seconds'] <= duration_limit:
+            pcm = prefetched['pcm']
+            offset = prefetched['seconds']
+        
+        stream = PCMStream(
+            stream_info['url'], duration_limit - offset,
+            sample_rate=frequency, channels=channels, start=offset,
+            http_headers=stream_info['http_headers'],
+        )
+        chunks = stream.chunks()
+        if pcm:
+            step = frequency // 2 * channels * 2  # Bloques de medio segundo
+            chunks = chain((pcm[i:i + step] for i in range(0, len(pcm), step)), chunks)
+        
+        self._active_stream = stream
+        channel = pygame.mixer.find_channel(True)
+        channel.set_volume(self.volume)
+        self.channel = channel
+        clock = PlaybackClock()
+        bytes_per_second = frequency * channels * 2
+        queued = 0.0  # Segundos entregados al canal
+        last_length = 0.0
+        received = False
+        try:
+            for chunk in chunks:
+                if not self._is_current(generation):
+                    break
+                received = True
+                sound = pygame.mixer.Sound(buffer=chunk)
+                length = len(chunk) / bytes_per_second
+                
+                if clock.started is None:
+                    channel.play(sound)
+                    clock.start()
+                    self._clock = clock
+                    self._elapsed_fn = clock.elapsed
+                    self._set_state(PLAYING, expected=(LOADING,), generation=generation)
+                    queued = length
+                elif not channel.get_busy() and not self.is_paused:
+                    # FFmpeg fue más lento que la reproducción: resincronizar
+                    channel.play(sound)
+                    queued = clock.elapsed() + length
+                else:
+                    # El canal admite un bloque en cola: esperar a que empiece
+                    # a sonar el último bloque entregado
+                    if not self._wait_for_elapsed(clock.elapsed, queued - last_length, generation):
+                        break
+                    channel.queue(sound)
+                    queued += length
+                last_length = length
+            
+            if not received:
+                if not self._is_current(generation):
+                    return
+                raise Exception("FFmpeg no devolvió audio")
+            
+            # Esperar a que termine lo que queda en el canal
+            self._wait_for_elapsed(clock.elapsed, queued, generation)
+        finally:
+            stream.close()
+            self._active_stream = None
+            channel.stop()
+            self.channel = None
+            self._clock = None
+            self._elapsed_fn = None
+            if received:
+                self._set_state(IDLE, generation=generation)
+    
+    def _play_with_pygame(self, generation, url, duration_limit):
         """Reproduce usando pygame.mixer"""
-        temp_file = None
-        wav_file = None
+        workspace = None
         
         try:
             import pygame
-            from pathlib import Path
             import subprocess
-            import time
             
-            # Crear directorio temporal si no existe
-            Path('temp').mkdir(exist_ok=True)
+            # Carpeta propia de esta vista previa: no choca con otras ni con descargas
+            workspace = self.workspaces.create('preview')
+            temp_folder = workspace.path
             
-            # Limpiar archivos temporales previos
-            self._cleanup_temp_files()
-            time.sleep(0.2)  # Esperar a que se liberen
+            temp_file = _local_file(url)
+            if temp_file is None:
+                # Descargar solo el principio del audio en PEOR CALIDAD (más rápido para preview)
+                print("Descargando preview...")
+                temp_file = self._download_preview(
+                    url, duration_limit, temp_folder, 'preview_audio', 'worstaudio/worst'
+                )
             
-            # Descargar el audio en PEOR CALIDAD (más rápido para preview)
-            ydl_opts = {
-                'format': 'worstaudio/worst',  # Audio de peor calidad
-                'quiet': False,
-                'no_warnings': False,
-                'socket_timeout': 30,
-                'outtmpl': 'temp/preview_audio',
-            }
+            if not temp_file or not temp_file.exists():
+                print(f"Error: No se encontró archivo en temp. Archivos: {list(temp_folder.glob('*'))}")
+                raise Exception("No se pudo descargar el audio temporal")
+            if not self._is_current(generation):
+                return
             
-            print("Descargando preview...")
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                ext = info.get('ext', 'webm')
-                print(f"Extensión detectada: {ext}")
-                
-                # Buscar el archivo descargado
-                temp_folder = Path('temp')
-                temp_file = None
-                
-                # Buscar archivos que comiencen con preview_audio
-                for file in temp_folder.glob('preview_audio*'):
-                    if file.is_file():
-                        temp_file = file
-                        print(f"Archivo encontrado: {temp_file}")
-                        break
-                
-                if not temp_file or not temp_file.exists():
-                    print(f"Error: No se encontró archivo en temp. Archivos: {list(temp_folder.glob('*'))}")
-                    raise Exception("No se pudo descargar el audio temporal")
+            # Convertir a WAV si no es formato compatible
+            wav_file = temp_folder / 'preview_audio.wav'
+            if temp_file.suffix.lower() not in ['.wav', '.mp3', '.ogg']:
+                print(f"Convirtiendo {temp_file.suffix} a WAV...")
+                try:
+                    # Usar ffmpeg para convertir
+                    cmd = [get_ffmpeg_path() or 'ffmpeg', '-i', str(temp_file), '-t', str(duration_limit),
+                           '-q:a', '9', '-y', str(wav_file)]
+                    result = subprocess.run(cmd, capture_output=True, timeout=30)
+                    if result.returncode != 0:
+                        print(f"Error en conversión: {result.stderr.decode()}")
+                    
+                    if wav_file.exists():
+                        temp_file = wav_file
+                        print(f"Conversión completada: {wav_file}")
+                except Exception as e:
+                    print(f"Error convirtiendo: {e}")
+                    # Continuar con el archivo original
+            
+            if not self._is_current(generation):
+                return
+            print(f"Cargando: {temp_file}")
+            
+            # Cargar y reproducir
+            try:
+                pygame.mixer.music.load(str(temp_file))
+                pygame.mixer.music.play()
+                print("Reproduciendo...")
                 
-                # Convertir a WAV si no es formato compatible
-                wav_file = temp_folder / 'preview_audio.wav'
-                if temp_file.suffix.lower() not in ['.wav', '.mp3', '.ogg']:
-                    print(f"Convirtiendo {temp_file.suffix} a WAV...")
-                    try:
-                        # Usar ffmpeg para convertir
-                        cmd = ['ffmpeg', '-i', str(temp_file), '-q:a', '9', '-y', str(wav_file)]
-                        result = subprocess.run(cmd, capture_output=True, timeout=30)
-                        if result.returncode != 0:
-                            print(f"Error en conversión: {result.stderr.decode()}")
-                        
-                        if wav_file.exists():
-                            try:
-                                temp_file.unlink()  # Eliminar original
-                            except:
-                                pass
-                            temp_file = wav_file
-                            print(f"Conversión completada: {wav_file}")
-                    except Exception as e:
-                        print(f"Error convirtiendo: {e}")
-                        # Continuar con el archivo original
+                # La posición del mezclador no avanza en pausa
+                def elapsed():
+                    return max(0, pygame.mixer.music.get_pos()) / 1000
                 
-                print(f"Cargando: {temp_file}")
+                self._elapsed_fn = elapsed
+                self._set_state(PLAYING, expected=(LOADING,), generation=generation)
                 
-                # Cargar y reproducir
+                # Reproducir durante duration_limit segundos o hasta que acabe
+                # el audio (se comprueba como mucho una vez por segundo)
+                while self._is_current(generation):
+                    if self._wait_for_elapsed(elapsed, duration_limit, generation, max_wait=1.0):
+                        break
+                    if not self.is_paused and not pygame.mixer.music.get_busy():
+                        break
+            except pygame.error as e:
+                print(f"Error pygame: {e}")
+                raise
+            finally:
+                # Asegurar que se detiene
+                self._elapsed_fn = None
                 try:
-                    pygame.mixer.music.load(str(temp_file))
-                    pygame.mixer.music.play()
-                    print("Reproduciendo...")
-                    
-                    # Reproducir durante duration_limit segundos
-                    elapsed = 0
-                    while self.is_playing and elapsed < duration_limit:
-                        if not self.is_paused:
-                            elapsed += 0.1
-                        time.sleep(0.1)
-                except pygame.error as e:
-                    print(f"Error pygame: {e}")
-                    raise
-                finally:
-                    # Asegurar que se detiene
-                    try:
-                        pygame.mixer.music.stop()
-                        pygame.mixer.music.unload()
-                    except:
-                        pass
-                
-                print("Reproducción completada")
+                    pygame.mixer.music.stop()
+                    pygame.mixer.music.unload()
+                except:
+                    pass
+            
+            print("Reproducción completada")
                 
         except Exception as e:
             print(f"Error con pygame: {e}")
             import traceback
             traceback.print_exc()
         finally:
-            self.is_playing = False
-            
-            # Limpiar archivos con reintentos
-            if temp_file and temp_file.exists():
-                for attempt in range(5):
-                    try:
-                        temp_file.unlink()
-                        print(f"Archivo temporal eliminado: {temp_file}")
-                        break
-                    except PermissionError:
-                        print(f"Archivo en uso, reintentando... ({attempt+1}/5)")
-                        time.sleep(0.3)
-                    except Exception as e:
-                        print(f"Error eliminando {temp_file}: {e}")
-                        break
-            
-            if wav_file and wav_file.exists():
-                for attempt in range(5):
-                    try:
-                        wav_file.unlink()
-                        print(f"Archivo WAV eliminado: {wav_file}")
-                        break
-                    except PermissionError:
-                        print(f"Archivo WAV en uso, reintentando... ({attempt+1}/5)")
-                        time.sleep(0.3)
-                    except Exception as e:
-                        print(f"Error eliminando {wav_file}: {e}")
-                        break
+            self._set_state(IDLE, generation=generation)
+            # El borrado (con reintentos si el archivo sigue abierto) va en segundo plano
+            if workspace:
+                workspace.release()
     
-    def _play_with_ffmpeg(self, url, duration_limit):
+    def _play_with_ffmpeg(self, generation, url, duration_limit):
         """Reproducción alternativa con FFmpeg (solo descarga pequeña)"""
+        workspace = None
         try:
             import subprocess
             
             # Descargar solo los primeros segundos
-            ydl_opts = {
-                'format': 'bestaudio',
-                'quiet': True,
-                'no_warnings': True,
-                'socket_timeout': 30,
-                'outtmpl': 'temp/preview.%(ext)s',
-            }
+            workspace = self.workspaces.create('preview')
+            audio_file = _local_file(url) or self._download_preview(
+                url, duration_limit, workspace.path, 'preview', 'bestaudio'
+            )
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                audio_file = Path(f"temp/preview.{info['ext']}")
-                
-                if audio_file.exists():
-                    # Reproducir con ffplay
-                    cmd = ['ffplay', '-t', str(duration_limit), '-nodisp', '-autoexit', str(audio_file)]
-                    self.current_process = subprocess.Popen(cmd)
-                    self.current_process.wait()
-                    audio_file.unlink()  # Eliminar archivo temporal
+            if audio_file and audio_file.exists() and self._is_current(generation):
+                # Reproducir con ffplay
+                cmd = ['ffplay', '-t', str(duration_limit), '-nodisp', '-autoexit', str(audio_file)]
+                clock = PlaybackClock()
+                self.current_process = subprocess.Popen(cmd)
+                clock.start()
+                self._elapsed_fn = clock.elapsed
+                self._set_state(PLAYING, expected=(LOADING,), generation=generation)
+                self.current_process.wait()
         except Exception as e:
             print(f"Error reproduciendo: {e}")
         finally:
-            self.is_playing = False
+            self.current_process = None
+            self._elapsed_fn = None
+            self._set_state(IDLE, generation=generation)
+            if workspace:
+                workspace.release()
+    
+    def _download_preview(self, url, duration_limit, folder, name, format):
+        """
+        Descarga solo los bytes necesarios para duration_limit segundos
+        
+        Si el fragmento no se puede pedir por rangos, descarga el archivo
+        completo con yt-dlp como antes.
+        
+        Returns:
+            Path: Archivo descargado
+        """
+        folder.mkdir(exist_ok=True)
+        try:
+            stream_info = resolve_stream(self.session, url, format=format)
+            dest = folder / f"{name}.{stream_info.get('ext') or 'webm'}"
+            stats = fetch_preview_range(stream_info, duration_limit, dest)
+            stats['url'] = url
+            self.preview_stats.append(stats)
+            print(f"Preview parcial: {stats['bytes_fetched']} bytes "
+                  f"({stats['bytes_saved']} bytes ahorrados)")
+            return dest
+        except Exception as e:
+            print(f"Descarga parcial no disponible, descargando completo: {e}")
+        
+        ydl_opts = {
+            'format': format,
+            'quiet': False,
+            'no_warnings': False,
+            'socket_timeout': 30,
+            'outtmpl': str(folder / f"{name}.%(ext)s"),
+        }
+        with self.session.acquire(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+        dest = folder / f"{name}.{info.get('ext', 'webm')}"
+        size = dest.stat().st_size if dest.exists() else 0
+        self.preview_stats.append({
+            'url': url, 'ranged': False,
+            'bytes_fetched': size, 'bytes_total': size, 'bytes_saved': 0,
+        })
+        return dest
+    
+    def bytes_saved(self):
+        """Total de bytes que las vistas previas parciales evitaron descargar"""
+        return sum(stats['bytes_saved'] for stats in self.preview_stats)
     
     def pause(self):
         """Pausa la reproducción"""
+        self._send('pause')
+    
+    def resume(self):
+        """Reanuda la reproducción"""
+        self._send('resume')
+    
+    def stop(self):
+        """Detiene la reproducción"""
+        # Invalidar la generación actual para que el trabajador aborte ya
+        with self._state_cond:
+            self._generation += 1
+            self.current_url = None
+            self.state = IDLE
+            self._state_cond.notify_all()
+        self._abort_decoder()
+        self._send('stop')
+    
+    def set_volume(self, volume):
+        """
+        Establece el volumen (0.0 a 1.0)
+        
+        Args:
+            volume (float): Volumen (0.0 a 1.0)
+        """
+        self.volume = max(0.0, min(1.0, volume))
+        self._send('volume')
+    
+    def _do_pause(self):
+        if not self._set_state(PAUSED, expected=(PLAYING,)):
+            return
+        if self._clock:
+            self._clock.pause()
         if self.pygame_available:
             try:
                 import pygame
-                if self.is_playing and not self.is_paused:
-                    pygame.mixer.music.pause()
-                    self.is_paused = True
+                pygame.mixer.music.pause()
+                if self.channel:
+                    self.channel.pause()
             except:
                 pass
     
-    def resume(self):
-        """Reanuda la reproducción"""
+    def _do_resume(self):
+        if self.state != PAUSED:
+            return
         if self.pygame_available:
             try:
                 import pygame
-                if self.is_playing and self.is_paused:
-                    pygame.mixer.music.unpause()
-                    self.is_paused = False
+                pygame.mixer.music.unpause()
+                if self.channel:
+                    self.channel.unpause()
             except:
                 pass
+        if self._clock:
+            self._clock.resume()
+        self._set_state(PLAYING, expected=(PAUSED,))
     
-    def stop(self):
-        """Detiene la reproducción"""
-        self.is_playing = False
-        self.is_paused = False
-        self.current_url = None
-        
+    def _do_stop(self):
         if self.pygame_available:
             try:
                 import pygame
                 pygame.mixer.music.stop()
                 pygame.mixer.music.unload()  # Descargar para liberar archivo
+                if self.channel:
+                    self.channel.stop()
             except:
                 pass
-        
-        if self.current_process:
-            try:
-                self.current_process.terminate()
-                self.current_process = None
-            except:
-                pass
-        
-        # Limpiar archivos temporales
-        self._cleanup_temp_files()
     
-    def set_volume(self, volume):
-        """
-        Establece el volumen (0.0 a 1.0)
-        
-        Args:
-            volume (float): Volumen (0.0 a 1.0)
-        """
+    def _do_set_volume(self):
         if self.pygame_available:
             try:
                 import pygame
-                volume = max(0.0, min(1.0, volume))
-                pygame.mixer.music.set_volume(volume)
+                pygame.mixer.music.set_volume(self.volume)
+                if self.channel:
+                    self.channel.set_volume(self.volume)
             except:
                 pass
-    
-    def _cleanup_temp_files(self):
-        """Limpia archivos temporales de forma segura"""
-        from pathlib import Path
-        import time
-        
-        temp_folder = Path('temp')
-        if not temp_folder.exists():
-            return
-        
-        # Archivos a limpiar
-        patterns = ['preview_audio*']
-        
-        for pattern in patterns:
-            for file in temp_folder.glob(pattern):
-                if file.is_file():
-                    try:
-                        # Esperar a que se libere el archivo
-                        for attempt in range(5):
-                            try:
-                                file.unlink()
-                                print(f"Archivo temporal eliminado: {file}")
-                                break
-                            except PermissionError:
-                                print(f"Archivo en uso, reintentando... ({attempt+1}/5)")
-                                time.sleep(0.5)
-                            except Exception as e:
-                                print(f"Error eliminando {file}: {e}")
-                                break
-                    except Exception as e:
-                        print(f"No se pudo limpiar {file}: {e}")
@@ -0,0 +1,337 @@
+"""
+Lectura de listas de canciones (CSV, TXT, JSON, JSONL y M3U) sin cargarlas enteras
+"""
+import csv
+import io
+import json
+import re
+from pathlib import Path
+
+from archive import extract_video_id
+from queue_store import PENDING, RESOLVING
+from ranking import parse_duration
+
+SUPPORTED_EXTENSIONS = ('.csv', '.txt', '.json', '.jsonl', '.m3u', '.m3u8')
+
+# Canciones que se guardan juntas en la cola antes de empezar a buscarlas
+STAGE_BATCH = 50
+
+# Nombres de columna reconocidos (en minúsculas, sin acentos) para cada campo
+COLUMNS = {
+    'artist': ('artist', 'artists', 'artist name', 'artist name(s)', 'artista', 'artistas', 'interprete',
+               'band', 'grupo', 'uploader', 'channel', 'canal'),
+    'title': ('title', 'track', 'track name', 'song', 'song name', 'name', 'titulo', 'cancion', 'nombre',
+              'tema', 'query', 'busqueda'),
+    'album': ('album', 'album name', 'disco'),
+    'duration': ('duration', 'duracion', 'length', 'time', 'tiempo', 'duration (ms)', 'duration_ms',
+                 'track duration (ms)'),
+    'url': ('url', 'link', 'enlace', 'youtube', 'youtube url', 'webpage_url', 'original_url'),
+    'id': ('id', 'video id', 'video_id', 'videoid', 'youtube id', 'youtube_id'),
+}
+_ALIASES = {alias: field for field, aliases in COLUMNS.items() for alias in aliases}
+
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_ACCENTS = str.maketrans('áéíóúü', 'aeiouu')
+
+
+def _column(name):
+    """Campo al que corresponde un nombre de columna, o None"""
+    return _ALIASES.get(str(name).strip().lower().translate(_ACCENTS))
+
+
+def make_entry(fields):
+    """
+    Convierte los campos de una fila en una entrada de la cola
+    
+    Args:
+        fields (dict): Campos artist, title, album, duration, url e id
+            (todos opcionales)
+    
+    Returns:
+        dict: Con 'url' si la fila ya indica el video (no hace falta
+            buscarlo), o con 'query' y opcionalmente 'duration' y 'album';
+            None si la fila no tiene nada que buscar
+    """
+    artist = str(fields.get('artist') or '').strip()
+    title = str(fields.get('title') or '').strip()
+    query = f"{artist} - {title}" if artist and title else artist or title
+    duration = fields.get('duration')
+    if isinstance(duration, str):
+        duration = parse_duration(duration)
+    duration = int(duration) if duration else None
+    
+    url = str(fields.get('url') or '').strip()
+    video_id = str(fields.get('id') or '').strip()
+    if not url.startswith(('http://', 'https://')):
+        url = ''
+    if not url and _VIDEO_ID_RE.match(video_id):
+        url = f"https://www.youtube.com/watch?v={video_id}"
+    if url:
+        entry = {'url': url, 'title': query or url, 'id': extract_video_id(url)}
+    elif query:
+        entry = {'query': query}
+    else:
+        return None
+    if duration:
+        entry['duration'] = duration
+    if fields.get('album'):
+        entry['album'] = str(fields['album']).strip()
+    return entry
+
+
+def _text_entry(line):
+    """Entrada de una línea de texto: una URL o un término de búsqueda"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith(('http://', 'https://')):
+        return make_entry({'url': line})
+    return make_entry({'title': line})
+
+
+def _iter_txt(f):
+    for line in f:
+        entry = _text_entry(line)
+        if entry:
+            yield entry
+
+
+def _looks_like_data(cell):
+    """Indica si una celda es un valor (duración o URL) y no un nombre de columna"""
+    cell = cell.strip()
+    return bool(parse_duration(cell) or cell.startswith(('http://', 'https://')))
+
+
+def _is_header(row, sample_has_header):
+    """
+    Decide si la primera fila es una cabecera
+    
+    Una lista antigua sin cabecera puede empezar por una canción que se llama
+    como una columna ("Time", "Song"...), así que hacen falta dos columnas
+    reconocidas (o una sola columna que el Sniffer también ve como cabecera)
+    y ninguna celda con aspecto de dato.
+    """
+    recognized = sum(1 for name in row if _column(name))
+    if not recognized or any(_looks_like_data(cell) for cell in row):
+        return False
+    return recognized >= 2 or (sample_has_header and len(row) == 1)
+
+
+def _sniff_csv(sample):
+    """
+    Dialecto y cabecera de un CSV
+    
+    Returns:
+        tuple: (dialecto, True si la primera fila es una cabecera)
+    """
+    sniffer = csv.Sniffer()
+    try:
+        dialect = sniffer.sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        sample_has_header = sniffer.has_header(sample)
+    except csv.Error:
+        sample_has_header = False
+    
+    rows = _sample_rows(sample, dialect)
+    if rows and _is_header(rows[0], sample_has_header):
+        return dialect, True
+    if dialect.delimiter != ',':
+        # Sin cabecera, otro separador solo se acepta en filas "búsqueda;duración":
+        # en una lista de una columna, ";" o "|" suelen ser parte del título
+        if not rows or not all(len(row) == 2 and parse_duration(row[1]) for row in rows):
+            dialect = csv.excel
+            rows = _sample_rows(sample, dialect)
+            return dialect, bool(rows) and _is_header(rows[0], sample_has_header)
+    return dialect, False
+
+
+def _sample_rows(sample, dialect):
+    """Filas completas de la muestra (la última puede estar cortada)"""
+    rows = [row for row in csv.reader(io.StringIO(sample), dialect) if row]
+    if len(rows) > 1 and not sample.endswith(('\n', '\r')):
+        rows.pop()
+    return rows
+
+
+def _iter_csv(f):
+    sample = f.read(4096)
+    f.seek(0)
+    dialect, has_header = _sniff_csv(sample)
+    reader = csv.reader(f, dialect)
+    if not has_header:
+        # Sin cabecera: término de búsqueda y, opcionalmente, la duración esperada
+        for row in reader:
+            yield from _legacy_csv_row(row)
+        return
+    header = next((row for row in reader if row), [])
+    columns = [_column(name) for name in header]
+    
+    # Las exportaciones de Spotify dan la duración en milisegundos
+    in_ms = [column == 'duration' and 'ms' in name.lower() for column, name in zip(columns, header)]
+    for row in reader:
+        fields = {}
+        for column, ms, value in zip(columns, in_ms, row):
+            if not column or not value.strip() or column in fields:
+                continue
+            if ms:
+                value = int(value) // 1000 if value.strip().isdigit() else None
+            fields[column] = value
+        entry = make_entry(fields)
+        if entry:
+            yield entry
+
+
+def _legacy_csv_row(row):
+    if not row or not row[0].strip():
+        return
+    entry = _text_entry(row[0])
+    if entry and len(row) > 1 and parse_duration(row[1]):
+        entry['duration'] = parse_duration(row[1])
+    if entry:
+        yield entry
+
+
+def _json_entry(item):
+    """Entrada de un elemento JSON: un texto o un objeto con columnas reconocidas"""
+    if isinstance(item, str):
+        return _text_entry(item)
+    if not isinstance(item, dict):
+        return None
+    fields = {}
+    for key, value in item.items():
+        column = _column(key)
+        if column and value not in (None, '') and column not in fields:
+            fields[column] = value
+    return make_entry(fields)
+
+
+def _iter_jsonl(f):
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            entry = _json_entry(json.loads(line))
+        except ValueError as e:
+            raise ValueError(f"JSON inválido en la línea {number}: {e}")
+        if entry:
+            yield entry
+
+
+def _iter_json(f):
+    # Un documento JSON no se puede leer a trozos con la librería estándar
+    data = json.load(f)
+    if isinstance(data, dict):
+        # Listas de yt-dlp (-J) y exportaciones que envuelven las canciones
+        data = next((data[key] for key in ('entries', 'tracks', 'items', 'songs') if key in data), [data])
+    for item in data:
+        entry = _json_entry(item)
+        if entry:
+            yield entry
+
+
+def _iter_m3u(f):
+    info = {}
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        if line.upper().startswith('#EXTINF:'):
+            # #EXTINF:duración,Artista - Título
+            length, _, name = line[8:].partition(',')
+            info = {'title': name.strip()}
+            if length.strip().lstrip('-').isdigit() and int(length) > 0:
+                info['duration'] = int(length)
+            continue
+        if line.startswith('#'):
+            continue
+        if line.startswith(('http://', 'https://')):
+            entry = make_entry(dict(info, url=line))
+        else:
+            # Archivo local: se busca por el título de #EXTINF o por el nombre del archivo
+            entry = make_entry(info if info.get('title') else dict(info, title=Path(line).stem))
+        info = {}
+        if entry:
+            yield entry
+
+
+_READERS = {
+    '.csv': _iter_csv,
+    '.txt': _iter_txt,
+    '.json': _iter_json,
+    '.jsonl': _iter_jsonl,
+    '.m3u': _iter_m3u,
+    '.m3u8': _iter_m3u,
+}
+
+
+def iter_playlist(file_path):
+    """
+    Lee una lista de canciones entrada a entrada
+    
+    El archivo se lee a medida que se piden entradas (salvo los .json, que
+    se leen enteros), así que la búsqueda puede empezar por la primera línea
+    de una lista enorme. Los CSV con cabecera reconocen columnas de artista,
+    título, álbum, duración, URL e ID de video.
+    
+    Args:
+        file_path (str): Archivo .csv, .txt, .json, .jsonl, .m3u o .m3u8
+    
+    Returns:
+        iterator: Entradas de make_entry
+    
+    Raises:
+        Exception: Si el formato no está soportado o el archivo no existe
+    """
+    file_path = Path(file_path)
+    reader = _READERS.get(file_path.suffix.lower())
+    if reader is None:
+        raise Exception(f"Formato no soportado. Use {', '.join(SUPPORTED_EXTENSIONS)}")
+    if not file_path.is_file():
+        raise Exception(f"No existe el archivo: {file_path}")
+    
+    def entries():
+        try:
+            with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+                yield from reader(f)
+        except Exception as e:
+            raise Exception(f"Error leyendo {file_path.name}: {e}")
+    return entries()
+
+
+def stage_entries(entries, store, batch_size=STAGE_BATCH):
+    """
+    Guarda las entradas en la cola persistente en lotes pequeños, a medida
+    que se leen
+    
+    Las entradas con URL quedan pendientes de descarga; el resto, pendientes
+    de búsqueda.
+    
+    Args:
+        entries (iterable): Entradas de iter_playlist
+        store (DownloadQueueStore): Cola persistente
+    
+    Yields:
+        tuple: (queue_id, entrada)
+    """
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield from _stage_batch(batch, store)
+            batch = []
+    if batch:
+        yield from _stage_batch(batch, store)
+
+
+def _stage_batch(batch, store):
+    ready = [entry for entry in batch if entry.get('url')]
+    searches = [entry for entry in batch if not entry.get('url')]
+    ids = {}
+    if ready:
+        ids.update(zip(map(id, ready), store.add(ready, state=PENDING)))
+    if searches:
+        ids.update(zip(map(id, searches), store.add(searches, state=RESOLVING)))
+    for entry in batch:
+        yield ids[id(entry)], entry
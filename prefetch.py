@@ -0,0 +1,133 @@
+"""
+Precarga en segundo plano de las vistas previas
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PREFETCH_WORKERS, PREFETCH_TOP_K, PREFETCH_SECONDS, PREFETCH_BYTE_BUDGET
+from streaming import PCMStream, resolve_stream
+
+
+class PreviewPrefetcher:
+    """
+    Resuelve la URL del audio y decodifica los primeros segundos de los
+    mejores resultados de una búsqueda para que la vista previa empiece al
+    instante.
+    """
+    
+    def __init__(self, session, sample_rate=44100, channels=2, workers=PREFETCH_WORKERS,
+                 top_k=PREFETCH_TOP_K, seconds=PREFETCH_SECONDS, byte_budget=PREFETCH_BYTE_BUDGET):
+        """
+        Args:
+            session (YDLSessionPool): Pool de yt-dlp
+            sample_rate (int): Frecuencia del PCM precargado
+            channels (int): Canales del PCM precargado
+            workers (int): Precargas simultáneas
+            top_k (int): Cuántos resultados precargar
+            seconds (float): Segundos de audio a decodificar (0 = solo la URL)
+            byte_budget (int): Máximo de bytes de PCM en memoria
+        """
+        self.session = session
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.top_k = top_k
+        self.seconds = seconds
+        self.byte_budget = byte_budget
+        self.bytes_used = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='precarga')
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+        self._entries = {}
+    
+    def prefetch(self, results):
+        """
+        Cancela la precarga anterior y empieza con los nuevos resultados
+        
+        Args:
+            results (list): Resultados de search_song
+        """
+        with self._lock:
+            generation = self._cancel_locked()
+            # Las canciones de la biblioteca se reproducen desde su archivo
+            results = [result for result in results if result.get('url') and not result.get('in_library')]
+            for result in results[:self.top_k]:
+                self._futures.append(
+                    self._executor.submit(self._prefetch_one, generation, result['url'])
+                )
+    
+    def cancel(self):
+        """Cancela las precargas pendientes y libera lo precargado"""
+        with self._lock:
+            self._cancel_locked()
+    
+    def _cancel_locked(self):
+        """Invalida la generación actual; requiere tener el lock"""
+        self._generation += 1
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self._entries = {}
+        self.bytes_used = 0
+        return self._generation
+    
+    def get(self, url):
+        """
+        Retorna lo precargado para una URL
+        
+        Returns:
+            dict: {'stream': info de resolve_stream, 'pcm': bytes o None,
+                   'seconds': segundos en 'pcm'}, o None
+        """
+        with self._lock:
+            return self._entries.get(url)
+    
+    def _prefetch_one(self, generation, url):
+        """Precarga un resultado (se ejecuta en un worker)"""
+        if generation != self._generation:
+            return
+        try:
+            stream_info = resolve_stream(self.session, url)
+        except Exception as e:
+            print(f"Error precargando {url}: {e}")
+            return
+        
+        entry = {'stream': stream_info, 'pcm': None, 'seconds': 0}
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[url] = entry
+            # Reservar memoria dentro del presupuesto antes de decodificar
+            needed = int(self.sample_rate * self.channels * 2 * self.seconds)
+            if not self.seconds or self.bytes_used + needed > self.byte_budget:
+                return
+            self.bytes_used += needed
+        
+        stream = PCMStream(
+            stream_info['url'], self.seconds,
+            sample_rate=self.sample_rate, channels=self.channels,
+            http_headers=stream_info['http_headers'],
+        )
+        buffer = bytearray()
+        try:
+            for chunk in stream.chunks():
+                if generation != self._generation:
+                    return
+                buffer += chunk
+        except Exception as e:
+            print(f"Error decodificando precarga de {url}: {e}")
+        finally:
+            stream.close()
+        
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.bytes_used -= needed - len(buffer)
+            if buffer:
+                entry['pcm'] = bytes(buffer)
+                entry['seconds'] = len(buffer) / (self.sample_rate * self.channels * 2)
+    
+    def shutdown(self):
+        """Detiene los workers"""
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,156 @@
+"""
+Seguimiento del progreso de descarga a nivel de bytes
+"""
+import threading
+import time
+
+# Suavizado del rendimiento total para el ETA (0 = nada, 1 = sin memoria)
+ETA_SMOOTHING = 0.2
+# Intervalo mínimo entre muestras del rendimiento total
+SAMPLE_INTERVAL = 0.5
+
+
+class ItemProgress:
+    """Progreso de una descarga; sus métodos son los hooks de yt-dlp"""
+    
+    def __init__(self, tracker, key, title):
+        self.tracker = tracker
+        self.key = key
+        self.title = title
+        self.status = 'pending'
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = 0.0
+        self.network_seconds = 0.0
+        self.postprocess_seconds = 0.0
+        self._network_started = None
+        self._postprocess_started = None
+    
+    def on_progress(self, d):
+        """Hook de progreso de yt-dlp (progress_hooks)"""
+        now = time.monotonic()
+        with self.tracker._lock:
+            if d['status'] == 'downloading':
+                if self._network_started is None:
+                    self._network_started = now
+                self.status = 'downloading'
+                self.downloaded_bytes = d.get('downloaded_bytes') or 0
+                self.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or self.total_bytes
+                self.speed = d.get('speed') or 0.0
+            elif d['status'] == 'finished':
+                self.downloaded_bytes = d.get('downloaded_bytes') or d.get('total_bytes') or self.downloaded_bytes
+                self.total_bytes = self.downloaded_bytes or self.total_bytes
+                self.speed = 0.0
+                if self._network_started is not None:
+                    self.network_seconds += now - self._network_started
+                    self._network_started = None
+                self.status = 'downloaded'
+            elif d['status'] == 'error':
+                self.speed = 0.0
+                self.status = 'error'
+        self.tracker._changed()
+    
+    def on_postprocess(self, d):
+        """Hook de postprocesado de yt-dlp (postprocessor_hooks)"""
+        now = time.monotonic()
+        with self.tracker._lock:
+            if d['status'] == 'started':
+                self._postprocess_started = now
+                self.status = 'postprocessing'
+            elif d['status'] == 'finished' and self._postprocess_started is not None:
+                self.postprocess_seconds += now - self._postprocess_started
+                self._postprocess_started = None
+        self.tracker._changed()
+    
+    def finish(self, success):
+        """Marca la descarga como terminada"""
+        with self.tracker._lock:
+            self.status = 'done' if success else 'failed'
+            self.speed = 0.0
+            if self.total_bytes is None:
+                self.total_bytes = self.downloaded_bytes
+        self.tracker._changed()
+
+
+class ProgressTracker:
+    """
+    Agrega el progreso de varias descargas simultáneas: bytes, velocidad
+    total, ETA suavizado de toda la cola y tiempo de red frente a FFmpeg
+    """
+    
+    def __init__(self, total_items=0, on_update=None):
+        """
+        Args:
+            total_items (int): Número de canciones de la cola
+            on_update (callable): Recibe un snapshot() en cada cambio
+        """
+        self.total_items = total_items
+        self.on_update = on_update
+        self.items = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._smoothed_speed = None
+        self._last_sample = 0.0
+    
+    def item(self, key, title=''):
+        """Crea (o retorna) el seguimiento de una descarga"""
+        with self._lock:
+            if key not in self.items:
+                self.items[key] = ItemProgress(self, key, title)
+            return self.items[key]
+    
+    def _changed(self):
+        if self.on_update:
+            self.on_update(self.snapshot())
+    
+    def snapshot(self):
+        """
+        Retorna el estado agregado
+        
+        Returns:
+            dict: Bytes, velocidad, ETA, fracción completada y tiempos por etapa
+        """
+        now = time.monotonic()
+        with self._lock:
+            items = list(self.items.values())
+            speed = sum(item.speed for item in items)
+            if now - self._last_sample >= SAMPLE_INTERVAL or self._smoothed_speed is None:
+                if self._smoothed_speed is None:
+                    self._smoothed_speed = speed
+                else:
+                    self._smoothed_speed += ETA_SMOOTHING * (speed - self._smoothed_speed)
+                self._last_sample = now
+            smoothed = self._smoothed_speed
+        
+        downloaded = sum(item.downloaded_bytes for item in items)
+        known_sizes = [item.total_bytes for item in items if item.total_bytes]
+        average_size = sum(known_sizes) / len(known_sizes) if known_sizes else 0
+        # Las canciones pendientes sin tamaño conocido se estiman con el tamaño medio
+        unknown = max(0, self.total_items - len(items)) + sum(
+            1 for item in items if not item.total_bytes and item.status not in ('done', 'failed')
+        )
+        total = sum(known_sizes) + unknown * average_size
+        finished = sum(1 for item in items if item.status in ('done', 'failed'))
+        remaining = max(0, total - downloaded)
+        
+        if self.total_items:
+            fraction = finished / self.total_items
+            if total:
+                fraction = max(fraction, downloaded / total)
+        else:
+            fraction = 0.0
+        
+        return {
+            'items_total': self.total_items,
+            'items_finished': finished,
+            'active': sum(1 for item in items if item.status in ('downloading', 'postprocessing')),
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'fraction': min(1.0, fraction),
+            'speed': speed,
+            'smoothed_speed': smoothed,
+            'eta': remaining / smoothed if smoothed else None,
+            'elapsed': now - self._started,
+            'network_seconds': sum(item.network_seconds for item in items),
+            'postprocess_seconds': sum(item.postprocess_seconds for item in items),
+        }
@@ -0,0 +1,280 @@
+"""
+Cola de descargas persistente (sobrevive a cierres y fallos)
+"""
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+from config import CACHE_DIR, ensure_dirs
+
+# Estados de cada canción de la cola
+PENDING = 'pending'
+RESOLVING = 'resolving'
+DOWNLOADING = 'downloading'
+TRANSCODING = 'transcoding'
+DONE = 'done'
+FAILED = 'failed'
+
+# Máximo de operaciones que el escritor agrupa en una transacción
+WRITE_BATCH = 500
+
+_FIELDS = ('query', 'url', 'title', 'output_path', 'state', 'part_path', 'filepath', 'error', 'conversion')
+
+
+class DownloadQueueStore:
+    """
+    Cola de descargas en SQLite (modo WAL)
+    
+    Todas las escrituras pasan por un único hilo escritor que agrupa en una
+    sola transacción lo que se haya acumulado mientras escribía la anterior,
+    así que los workers nunca esperan al disco ni compiten por el bloqueo de
+    SQLite. Las lecturas usan su propia conexión y no bloquean al escritor.
+    """
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Ruta del archivo SQLite (por defecto en CACHE_DIR)
+        """
+        if path is None:
+            ensure_dirs()
+        self.path = str(path or CACHE_DIR / 'queue.sqlite3')
+        self._ops = queue.Queue()
+        self._read_lock = threading.Lock()
+        
+        self._writer_conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._writer_conn.execute('PRAGMA journal_mode=WAL')
+        # Con WAL, NORMAL no pierde consistencia ante un cierre inesperado
+        self._writer_conn.execute('PRAGMA synchronous=NORMAL')
+        self._writer_conn.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' query TEXT,'
+            ' url TEXT,'
+            ' title TEXT,'
+            ' song TEXT,'
+            ' output_path TEXT,'
+            ' state TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' part_path TEXT,'
+            ' filepath TEXT,'
+            ' error TEXT,'
+            ' conversion TEXT,'
+            ' updated REAL NOT NULL)'
+        )
+        columns = {row[1] for row in self._writer_conn.execute('PRAGMA table_info(items)')}
+        if 'conversion' not in columns:
+            # Colas creadas por versiones anteriores
+            self._writer_conn.execute('ALTER TABLE items ADD COLUMN conversion TEXT')
+        self._writer_conn.execute('CREATE INDEX IF NOT EXISTS items_state ON items (state)')
+        self._writer_conn.commit()
+        self._read_conn = sqlite3.connect(self.path, check_same_thread=False)
+        
+        self._writer = threading.Thread(target=self._write_loop, name='cola-escritor', daemon=True)
+        self._writer.start()
+    
+    def add(self, songs, state=PENDING):
+        """
+        Agrega canciones a la cola
+        
+        Args:
+            songs (list): Diccionarios de resultados (con 'url' y 'title') o
+                términos de búsqueda aún sin resolver
+            state (str): Estado inicial (RESOLVING para términos sin buscar)
+        
+        Returns:
+            list: IDs de las canciones en el mismo orden
+        """
+        rows = []
+        for song in songs:
+            if isinstance(song, str):
+                song = {'query': song}
+            rows.append(song)
+        return self._submit(('add', rows, state), wait=True)
+    
+    def update(self, item_id, **fields):
+        """
+        Cambia campos de una canción sin esperar a que se escriban
+        
+        Args:
+            item_id (int): ID de la canción
+            **fields: state, url, title, output_path, part_path, filepath,
+                error, conversion ('copy' o 'transcode') o song (diccionario
+                completo del resultado)
+        """
+        self._submit(('update', item_id, fields))
+    
+    def start_attempt(self, item_id, output_path=None):
+        """Marca una canción como descargándose y cuenta el intento"""
+        self._submit(('attempt', item_id, output_path))
+    
+    def remove(self, states=None):
+        """
+        Borra canciones de la cola
+        
+        Args:
+            states (tuple): Solo borra las que estén en estos estados (por defecto todas)
+        """
+        self._submit(('remove', tuple(states) if states else None), wait=True)
+    
+    def flush(self):
+        """Espera a que todas las escrituras pendientes estén en disco"""
+        self._submit(('noop',), wait=True)
+    
+    def items(self, states=None):
+        """
+        Lee las canciones de la cola en orden de llegada
+        
+        Args:
+            states (tuple): Solo las que estén en estos estados (por defecto todas)
+        
+        Returns:
+            list: Diccionarios con el resultado original más 'queue_id',
+                'state', 'attempts', 'part_path' y 'error'
+        """
+        sql = ('SELECT id, query, url, title, song, output_path, state, attempts, part_path, filepath, error, '
+               'conversion FROM items')
+        params = ()
+        if states:
+            sql += f" WHERE state IN ({','.join('?' * len(states))})"
+            params = tuple(states)
+        with self._read_lock:
+            rows = self._read_conn.execute(sql + ' ORDER BY id', params).fetchall()
+        
+        items = []
+        for (item_id, query, url, title, song, output_path, state, attempts,
+             part_path, filepath, error, conversion) in rows:
+            item = json.loads(song) if song else {}
+            item.update({
+                'queue_id': item_id,
+                'query': query,
+                'url': url or item.get('url'),
+                'title': title or item.get('title') or query,
+                'output_path': output_path,
+                'state': state,
+                'attempts': attempts,
+                'part_path': part_path,
+                'filepath': filepath,
+                'error': error,
+                'conversion': conversion,
+            })
+            items.append(item)
+        return items
+    
+    def unfinished(self):
+        """Canciones que aún no se han descargado (incluye las interrumpidas)"""
+        return self.items((PENDING, RESOLVING, DOWNLOADING, TRANSCODING, FAILED))
+    
+    def counts(self):
+        """Retorna el número de canciones en cada estado"""
+        with self._read_lock:
+            rows = self._read_conn.execute('SELECT state, COUNT(*) FROM items GROUP BY state').fetchall()
+        return dict(rows)
+    
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo escritor"""
+        if self._writer.is_alive():
+            self._ops.put(None)
+            self._writer.join()
+        self._read_conn.close()
+    
+    def _submit(self, op, wait=False):
+        if not wait:
+            self._ops.put((op, None))
+            return None
+        done = threading.Event()
+        box = {}
+        self._ops.put((op, (done, box)))
+        done.wait()
+        if 'error' in box:
+            raise Exception(f"Error en la cola persistente: {box['error']}")
+        return box.get('result')
+    
+    def _write_loop(self):
+        """Hilo escritor: aplica las operaciones en lotes, una transacción por lote"""
+        conn = self._writer_conn
+        stopping = False
+        while not stopping:
+            first = self._ops.get()
+            batch = [first]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stopping = None in batch
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                with conn:
+                    for op, waiter in entries:
+                        result = self._apply(conn, op)
+                        if waiter:
+                            waiter[1]['result'] = result
+            except Exception:
+                # El lote entero se deshizo: se repite operación a operación
+                # para que solo se pierda la que falla
+                for op, waiter in entries:
+                    self._apply_one(conn, op, waiter)
+            for _, waiter in entries:
+                if waiter:
+                    waiter[0].set()
+        conn.close()
+    
+    def _apply_one(self, conn, op, waiter):
+        """Aplica una operación en su propia transacción; el error va a quien la envió"""
+        try:
+            with conn:
+                result = self._apply(conn, op)
+        except Exception as e:
+            if waiter:
+                waiter[1].pop('result', None)
+                waiter[1]['error'] = e
+            else:
+                print(f"Error escribiendo la cola de descargas ({op[0]}): {e}")
+            return
+        if waiter:
+            waiter[1]['result'] = result
+    
+    def _apply(self, conn, op):
+        kind = op[0]
+        now = time.time()
+        if kind == 'add':
+            _, rows, state = op
+            ids = []
+            for song in rows:
+                cursor = conn.execute(
+                    'INSERT INTO items (query, url, title, song, state, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                    # Los términos sin resolver solo se guardan enteros si traen
+                    # algo más que la búsqueda (ej. la duración esperada)
+                    (song.get('query'), song.get('url'), song.get('title'),
+                     json.dumps(song) if song.get('url') or len(song) > 1 else None, state, now)
+                )
+                ids.append(cursor.lastrowid)
+            return ids
+        if kind == 'update':
+            _, item_id, fields = op
+            values = {key: fields[key] for key in _FIELDS if key in fields}
+            if 'song' in fields:
+                values['song'] = json.dumps(fields['song'])
+            if not values:
+                return None
+            values['updated'] = now
+            assignments = ', '.join(f"{key} = ?" for key in values)
+            conn.execute(f"UPDATE items SET {assignments} WHERE id = ?", (*values.values(), item_id))
+        elif kind == 'attempt':
+            _, item_id, output_path = op
+            conn.execute(
+                'UPDATE items SET state = ?, attempts = attempts + 1, error = NULL, '
+                'output_path = COALESCE(?, output_path), updated = ? WHERE id = ?',
+                (DOWNLOADING, output_path, now, item_id)
+            )
+        elif kind == 'remove':
+            states = op[1]
+            if states:
+                conn.execute(f"DELETE FROM items WHERE state IN ({','.join('?' * len(states))})", states)
+            else:
+                conn.execute('DELETE FROM items')
+        return None
@@ -0,0 +1,126 @@
+"""
+Elección del mejor resultado de búsqueda para las canciones de una lista
+"""
+import math
+import re
+
+from library import normalize_text
+
+# Pesos de cada señal en la puntuación final
+TITLE_WEIGHT = 3.0
+DURATION_WEIGHT = 2.0
+CHANNEL_WEIGHT = 1.0
+VIEWS_WEIGHT = 0.5
+VARIANT_PENALTY = 1.5
+
+# Versiones que casi nunca son lo que se busca, salvo que la búsqueda las pida
+VARIANT_WORDS = {
+    'live', 'vivo', 'directo', 'concert', 'concierto', 'cover', 'karaoke', 'instrumental', 'remix',
+    'acoustic', 'acustico', 'nightcore', 'slowed', 'reverb', 'sped', '8d', 'reaction', 'tutorial',
+    'lesson', 'compilation', 'recopilacion', 'album', 'mix', 'mashup', 'hours', 'hour', 'horas', 'hora',
+}
+
+# Duración razonable de una canción cuando no se conoce la esperada (segundos)
+TYPICAL_DURATION = (90, 600)
+# Más allá de esta duración es casi seguro un álbum completo o una recopilación
+MAX_SONG_DURATION = 1200
+
+_CHANNEL_RE = re.compile(r'( - topic$|vevo$|official|oficial|records$|music$)', re.IGNORECASE)
+
+
+def parse_duration(text):
+    """
+    Convierte "3:45", "1:02:03" o "225" a segundos
+    
+    Returns:
+        int: Segundos, o None si el texto no es una duración
+    """
+    text = (text or '').strip()
+    if not re.fullmatch(r'\d+(:\d{1,2}){0,2}', text):
+        return None
+    seconds = 0
+    for part in text.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds or None
+
+
+class ResultRanker:
+    """
+    Puntúa los resultados de una búsqueda según lo que probablemente se buscaba
+    
+    Combina el parecido del título con la búsqueda, si la duración es la de
+    una canción (o la esperada), si el canal es oficial y las visitas. Todo
+    se calcula con operaciones de conjuntos sobre palabras ya normalizadas,
+    así que puntuar miles de resultados tarda milisegundos.
+    """
+    
+    def score(self, query, results, expected_duration=None):
+        """
+        Puntúa los resultados de una búsqueda
+        
+        Args:
+            query (str): Término buscado (ej. "artista - canción")
+            results (list): Resultados de search_song
+            expected_duration (int): Duración esperada en segundos (opcional)
+        
+        Returns:
+            list: Una puntuación por resultado, en el mismo orden
+        """
+        words = set(normalize_text(query).split())
+        variants_wanted = words & VARIANT_WORDS
+        max_views = max((result.get('views') or 0 for result in results), default=0)
+        log_max_views = math.log10(max_views + 1) or 1.0
+        
+        scores = []
+        for result in results:
+            title_words = set(normalize_text(result.get('title')).split())
+            uploader = result.get('uploader') or ''
+            uploader_words = set(normalize_text(uploader).split())
+            
+            # Palabras de la búsqueda presentes en el título o el canal
+            found = len(words & (title_words | uploader_words)) / len(words) if words else 0.0
+            extra = title_words - words - uploader_words
+            title_score = found - 0.05 * min(len(extra), 10)
+            
+            variants = (title_words & VARIANT_WORDS) - variants_wanted
+            score = TITLE_WEIGHT * title_score - VARIANT_PENALTY * min(len(variants), 2)
+            score += DURATION_WEIGHT * self._duration_score(result.get('duration') or 0, expected_duration)
+            
+            channel = 0.0
+            if _CHANNEL_RE.search(uploader.strip()):
+                channel += 0.5
+            if uploader_words and uploader_words <= words | {'topic', 'vevo', 'official', 'oficial'}:
+                channel += 0.5
+            score += CHANNEL_WEIGHT * channel
+            score += VIEWS_WEIGHT * math.log10((result.get('views') or 0) + 1) / log_max_views
+            scores.append(score)
+        return scores
+    
+    @staticmethod
+    def _duration_score(duration, expected):
+        """1 si la duración encaja, hasta -1 si es muy distinta"""
+        if not duration:
+            return 0.0
+        if expected:
+            # Relativa a la esperada: ±10% apenas resta y el doble de duración da -1
+            return 1.0 - min(2.0, 2.0 * abs(duration - expected) / expected)
+        low, high = TYPICAL_DURATION
+        if duration > MAX_SONG_DURATION:
+            return -1.0
+        if duration < low:
+            return duration / low - 0.5
+        if duration > high:
+            return 1.0 - 2.0 * (duration - high) / (MAX_SONG_DURATION - high)
+        return 1.0
+    
+    def rank(self, query, results, expected_duration=None):
+        """
+        Ordena los resultados del más al menos probable
+        
+        Returns:
+            list: Los mismos resultados, con 'score', ordenados (estable ante empates)
+        """
+        scores = self.score(query, results, expected_duration)
+        ranked = [dict(result, score=round(score, 3)) for result, score in zip(results, scores)]
+        ranked.sort(key=lambda result: result['score'], reverse=True)
+        return ranked
@@ -0,0 +1,224 @@
+"""
+Reintentos con espera exponencial y límite de peticiones por servidor
+"""
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from config import (
+    RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST,
+    SEARCH_RATE_LIMIT_PER_SECOND, SEARCH_RATE_LIMIT_BURST,
+)
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+# Límite propio de las búsquedas: una lista larga no debe frenar las descargas ni al revés
+SEARCH_HOST = 'youtube-search'
+
+# Errores que no se arreglan reintentando (el video no existe, es privado...)
+_PERMANENT_PATTERNS = re.compile(
+    r'video unavailable|private video|is not available|has been removed|'
+    r'account .*terminated|copyright|sign in to confirm your age|age-restricted|'
+    r'members-only|unsupported url|not a valid url|is not a valid|'
+    r'http error 404|http error 410|ffmpeg no está instalado|no such file',
+    re.IGNORECASE
+)
+# Errores de red o de saturación del servidor
+_TRANSIENT_PATTERNS = re.compile(
+    r'timed? ?out|temporar|connection (reset|refused|aborted)|remote end closed|'
+    r'network is unreachable|name resolution|getaddrinfo|incompleteread|'
+    r'http error (403|408|429|5\d\d)|too many requests|unable to download webpage|'
+    r'read operation|ssl|eof occurred|broken pipe',
+    re.IGNORECASE
+)
+
+
+def classify_error(error):
+    """
+    Decide si un error merece reintentarse
+    
+    Args:
+        error (Exception | str): Excepción o mensaje de error
+    
+    Returns:
+        str: TRANSIENT o PERMANENT
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    message = str(error)
+    if _PERMANENT_PATTERNS.search(message):
+        return PERMANENT
+    if _TRANSIENT_PATTERNS.search(message):
+        return TRANSIENT
+    # Ante la duda no se reintenta: un error desconocido repetido solo retrasa la cola
+    return PERMANENT
+
+
+def host_of(url):
+    """Servidor de una URL (o 'youtube' para búsquedas ytsearch:)"""
+    host = urlparse(url).hostname if '://' in url else None
+    if not host:
+        return 'youtube'
+    # youtu.be, m.youtube.com y music.youtube.com comparten límite
+    if host == 'youtu.be' or host.endswith('youtube.com'):
+        return 'youtube'
+    return host
+
+
+class RetryError(Exception):
+    """Error final de una operación, con su clasificación y los intentos hechos"""
+    
+    def __init__(self, error, kind, attempts):
+        super().__init__(str(error))
+        self.error = error
+        self.kind = kind
+        self.attempts = attempts
+
+
+class TokenBucket:
+    """Limitador de peticiones: 'rate' por segundo con ráfagas de hasta 'burst'"""
+    
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Bloquea hasta que haya una ficha disponible
+        
+        Returns:
+            float: Segundos esperados
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RetryPolicy:
+    """
+    Ejecuta operaciones con reintentos para errores transitorios
+    
+    La espera crece exponencialmente con "full jitter" (un valor aleatorio
+    entre 0 y el tope del intento) para que los workers que fallaron a la
+    vez no vuelvan a la vez. Cada intento pasa antes por el limitador del
+    servidor, compartido por todos los hilos que usan la política.
+    """
+    
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                 rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST, host_limits=None):
+        """
+        Args:
+            attempts (int): Intentos totales por operación
+            base_delay (float): Espera máxima tras el primer fallo, en segundos
+            max_delay (float): Tope de la espera entre intentos
+            rate (float): Peticiones por segundo a cada servidor (0 = sin
+                límite para ningún servidor)
+            burst (int): Peticiones que pueden salir seguidas
+            host_limits (dict): Servidor -> (rate, burst) para los que tienen
+                un límite distinto (por defecto, las búsquedas)
+        """
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate = rate
+        self.burst = burst
+        if host_limits is None:
+            host_limits = {SEARCH_HOST: (SEARCH_RATE_LIMIT_PER_SECOND, SEARCH_RATE_LIMIT_BURST)}
+        self.host_limits = host_limits
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, host):
+        """Limitador compartido de un servidor"""
+        with self._lock:
+            if host not in self._buckets:
+                rate, burst = self.host_limits.get(host, (self.rate, self.burst))
+                self._buckets[host] = TokenBucket(rate if self.rate else 0, burst)
+            return self._buckets[host]
+    
+    def delay(self, attempt):
+        """Espera antes del reintento número 'attempt' (1 = primer reintento)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+    
+    def call(self, func, *args, host='youtube', on_retry=None, **kwargs):
+        """
+        Llama a func reintentando los errores transitorios
+        
+        Args:
+            func (callable): Operación a ejecutar
+            host (str): Servidor al que se aplica el límite de peticiones
+            on_retry (callable): Recibe (intento, error, espera) antes de cada reintento
+        
+        Returns:
+            El valor de func
+        
+        Raises:
+            RetryError: Si el error es permanente o se agotan los intentos
+        """
+        bucket = self.bucket(host)
+        for attempt in range(1, self.attempts + 1):
+            waited = bucket.acquire()
+            if waited:
+                with self._lock:
+                    self.throttled_seconds += waited
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == PERMANENT or attempt == self.attempts:
+                    raise RetryError(e, kind, attempt) from e
+                delay = self.delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                if on_retry:
+                    on_retry(attempt, e, delay)
+                time.sleep(delay)
+    
+    def stats(self):
+        """Retorna los reintentos hechos y el tiempo esperado por el limitador"""
+        with self._lock:
+            return {'retries': self.retries, 'throttled_seconds': self.throttled_seconds}
+
+
+def summarize_failures(failures, limit=10):
+    """
+    Resume los fallos de una cola para mostrarlos una sola vez al final
+    
+    Args:
+        failures (list): Diccionarios con 'title', 'message' y 'kind'
+        limit (int): Fallos a listar uno por uno
+    
+    Returns:
+        str: Texto con los totales por tipo y los primeros fallos
+    """
+    transient = sum(1 for failure in failures if failure['kind'] == TRANSIENT)
+    permanent = len(failures) - transient
+    lines = [
+        f"Fallaron {len(failures)} descargas: {permanent} no disponibles, "
+        f"{transient} por errores de red tras agotar los reintentos"
+    ]
+    for failure in failures[:limit]:
+        lines.append(f"• {failure['title'][:50]}: {failure['message']}")
+    if len(failures) > limit:
+        lines.append(f"... y {len(failures) - limit} más")
+    return "\n".join(lines)
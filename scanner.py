@@ -0,0 +1,285 @@
+"""
+Importación de carpetas de música existentes a la biblioteca
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from archive import AUDIO_EXTENSIONS, extract_video_id, split_filename_id
+from config import CACHE_DIR, SCAN_WORKERS, SCAN_BATCH, ensure_dirs, get_ffprobe_path
+
+
+def probe_files(paths, ffprobe):
+    """
+    Lee etiquetas y duración de varios archivos con ffprobe
+    
+    Se ejecuta en los procesos del pool, así que solo recibe y devuelve
+    datos simples.
+    
+    Args:
+        paths (list): Archivos de audio
+        ffprobe (str): Ruta de ffprobe (None = solo el nombre del archivo)
+    
+    Returns:
+        list: Tuplas (ruta, info); info es None si el archivo no se pudo leer
+    """
+    return [(path, probe_file(path, ffprobe)) for path in paths]
+
+
+def probe_file(path, ffprobe):
+    """
+    Info de un archivo de audio en el formato de yt-dlp (id, title, uploader,
+    duration, webpage_url)
+    
+    Returns:
+        dict: Info del archivo, o None si ffprobe no lo reconoce como audio
+    """
+    title, video_id = split_filename_id(Path(path).stem)
+    info = {'id': video_id, 'title': title}
+    if not ffprobe:
+        return info
+    
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-print_format', 'json', '-select_streams', 'a:0',
+         '-show_entries', 'format=duration:format_tags:stream=codec_name', str(path)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        return None
+    try:
+        data = json.loads(result.stdout.decode('utf-8', 'replace'))
+    except ValueError:
+        return None
+    if not data.get('streams'):
+        return None
+    
+    fmt = data.get('format', {})
+    tags = {key.lower(): value for key, value in fmt.get('tags', {}).items()}
+    # yt-dlp guarda la URL del video en 'purl' o en 'comment' al incrustar metadatos
+    url = next((tags[key] for key in ('purl', 'comment') if extract_video_id(tags.get(key))), None)
+    try:
+        duration = round(float(fmt['duration']))
+    except (KeyError, ValueError):
+        duration = None
+    info.update({
+        'id': video_id or extract_video_id(url),
+        'title': tags.get('title') or title,
+        'uploader': tags.get('artist') or tags.get('album_artist'),
+        'duration': duration,
+        'webpage_url': url,
+    })
+    return info
+
+
+class ScanManifest:
+    """Tamaño y fecha de modificación de cada archivo ya leído, en SQLite"""
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Ruta del archivo SQLite (por defecto en CACHE_DIR)
+        """
+        if path is None:
+            ensure_dirs()
+        self.path = str(path or CACHE_DIR / 'scan_manifest.sqlite3')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY,'
+            ' size INTEGER NOT NULL,'
+            ' mtime INTEGER NOT NULL,'
+            ' probed INTEGER NOT NULL,'
+            ' scanned REAL NOT NULL)'
+        )
+        self._conn.commit()
+    
+    def under(self, folder):
+        """
+        Archivos registrados dentro de una carpeta
+        
+        Returns:
+            dict: Ruta -> (tamaño, mtime en ns, leído con ffprobe)
+        """
+        prefix = os.path.join(str(folder), '')
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT path, size, mtime, probed FROM files WHERE path >= ? AND path < ?',
+                (prefix, prefix + '\U0010ffff')
+            ).fetchall()
+        return {path: (size, mtime, bool(probed)) for path, size, mtime, probed in rows}
+    
+    def record(self, entries):
+        """
+        Registra archivos ya leídos
+        
+        Args:
+            entries (list): Tuplas (ruta, tamaño, mtime en ns, leído con ffprobe)
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO files (path, size, mtime, probed, scanned) VALUES (?, ?, ?, ?, ?)',
+                [(path, size, mtime, int(probed), now) for path, size, mtime, probed in entries]
+            )
+            self._conn.commit()
+    
+    def forget(self, paths):
+        """Quita archivos que ya no existen"""
+        with self._lock:
+            self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in paths])
+            self._conn.commit()
+    
+    def close(self):
+        """Cierra la conexión"""
+        with self._lock:
+            self._conn.close()
+
+
+class LibraryScanner:
+    """
+    Escanea carpetas de música y llena la biblioteca y el índice de descargas
+    
+    ffprobe se lanza desde un pool de procesos, en lotes, para leer muchos
+    archivos a la vez. El manifiesto guarda el tamaño y la fecha de cada
+    archivo leído: en el siguiente escaneo solo se leen los nuevos o
+    modificados, y un escaneo interrumpido continúa donde se quedó porque
+    cada lote se registra en cuanto termina.
+    """
+    
+    def __init__(self, library, archive, workers=SCAN_WORKERS, batch_size=SCAN_BATCH, manifest=None):
+        """
+        Args:
+            library (LibraryCatalog): Catálogo a llenar
+            archive (DownloadArchive): Índice de descargas a llenar
+            workers (int): Procesos que ejecutan ffprobe
+            batch_size (int): Archivos por tarea del pool
+            manifest (ScanManifest): Manifiesto (por defecto en CACHE_DIR)
+        """
+        self.library = library
+        self.archive = archive
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.manifest = manifest or ScanManifest()
+    
+    def scan(self, folder, progress=None):
+        """
+        Escanea una carpeta (incluye subcarpetas)
+        
+        Args:
+            folder (str): Carpeta de música
+            progress (callable): Recibe (archivos leídos, archivos por leer)
+        
+        Returns:
+            dict: found, probed, unchanged, removed, failed y elapsed
+        """
+        start = time.monotonic()
+        folder = Path(folder).resolve()
+        ffprobe = get_ffprobe_path()
+        files = self._walk(folder)
+        known = self.manifest.under(folder)
+        
+        changed = []
+        for path, (size, mtime) in files.items():
+            previous = known.get(path)
+            # Los archivos indexados sin ffprobe se vuelven a leer cuando está disponible
+            if previous is None or previous[:2] != (size, mtime) or (ffprobe and not previous[2]):
+                changed.append(path)
+        removed = [path for path in known if path not in files]
+        if removed:
+            self.library.remove(removed)
+            self.archive.remove(removed)
+            self.manifest.forget(removed)
+        
+        probed = failed = 0
+        batches = [changed[i:i + self.batch_size] for i in range(0, len(changed), self.batch_size)]
+        if batches:
+            if progress:
+                progress(0, len(changed))
+            for results in self._probe(batches, ffprobe):
+                failed += self._store(results, files, bool(ffprobe))
+                probed += len(results)
+                if progress:
+                    progress(probed, len(changed))
+        
+        return {
+            'found': len(files),
+            'probed': probed,
+            'unchanged': len(files) - len(changed),
+            'removed': len(removed),
+            'failed': failed,
+            'elapsed': time.monotonic() - start,
+        }
+    
+    @staticmethod
+    def _walk(folder):
+        """Archivos de audio de la carpeta con su tamaño y mtime en ns"""
+        files = {}
+        pending = [str(folder)]
+        while pending:
+            current = pending.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError as e:
+                print(f"No se pudo leer {current}: {e}")
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return files
+    
+    def _probe(self, batches, ffprobe):
+        """Lee los lotes en el pool de procesos y los devuelve según terminan"""
+        if not ffprobe or self.workers == 1 or len(batches) == 1:
+            # Sin ffprobe solo se lee el nombre del archivo: no compensa lanzar procesos
+            for batch in batches:
+                yield probe_files(batch, ffprobe)
+            return
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+            futures = [pool.submit(probe_files, batch, ffprobe) for batch in batches]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+    
+    def _store(self, results, files, probed):
+        """
+        Guarda un lote en la biblioteca, el índice y el manifiesto
+        
+        Returns:
+            int: Archivos que ffprobe no pudo leer
+        """
+        library_entries = []
+        archive_entries = []
+        manifest_entries = []
+        failed = 0
+        for path, info in results:
+            size, mtime = files[path]
+            # Los ilegibles también se registran para no reintentarlos en cada escaneo
+            manifest_entries.append((path, size, mtime, probed))
+            if info is None:
+                failed += 1
+                continue
+            codec = os.path.splitext(path)[1].lower().lstrip('.')
+            library_entries.append((path, info, codec))
+            archive_entries.append((path, info['id'], info['title'], codec))
+        # El manifiesto se escribe al final: si el escaneo se corta, el lote se vuelve a leer
+        self.library.add_many(library_entries)
+        self.archive.add_many(archive_entries)
+        self.manifest.record(manifest_entries)
+        return failed
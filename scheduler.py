@@ -0,0 +1,333 @@
+"""
+Planificador de descargas en paralelo
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+
+from config import DOWNLOAD_WORKERS, TRANSCODE_WORKERS, DEDUP_ENABLED
+from dedup import find_duplicates
+from queue_store import DOWNLOADING, TRANSCODING, DONE, FAILED
+from retry import classify_error
+from transcoder import TranscodePool
+
+
+class _QueueHooks:
+    """
+    Hooks de yt-dlp que guardan en la cola persistente el archivo .part en
+    curso y el paso a FFmpeg, y reenvían el progreso al ItemProgress
+    """
+    
+    def __init__(self, store, item_id, progress=None):
+        self.store = store
+        self.item_id = item_id
+        self.progress = progress
+        self._part_path = None
+        self._state = DOWNLOADING
+    
+    def on_progress(self, d):
+        part_path = d.get('tmpfilename')
+        if d['status'] == 'downloading' and part_path and part_path != self._part_path:
+            self._part_path = part_path
+            self.store.update(self.item_id, part_path=part_path)
+        if self.progress:
+            self.progress.on_progress(d)
+    
+    def on_postprocess(self, d):
+        if d['status'] == 'started' and self._state != TRANSCODING:
+            self._state = TRANSCODING
+            self.store.update(self.item_id, state=TRANSCODING)
+        if self.progress:
+            self.progress.on_postprocess(d)
+
+
+class DownloadScheduler:
+    """
+    Descarga una cola de canciones con varios workers en paralelo
+    
+    Si el descargador separa la descarga de la conversión (fetch_audio y
+    transcode_download), la cola funciona como un pipeline de dos etapas:
+    los workers de red solo descargan y pasan cada archivo a un pool de
+    FFmpeg con tantos workers como núcleos, así la red y la CPU trabajan a
+    la vez. La cola entre etapas es acotada para no llenar el disco.
+    """
+    
+    def __init__(self, downloader, workers=DOWNLOAD_WORKERS, on_progress=None, tracker=None, store=None,
+                 transcode_workers=TRANSCODE_WORKERS, dedup=DEDUP_ENABLED):
+        """
+        Args:
+            downloader: Objeto con un método download_song(url, output_path)
+                que retorna (éxito, mensaje, modo de conversión)
+            workers (int): Número de descargas simultáneas
+            on_progress (callable): Función que recibe un dict por cada evento
+            tracker (ProgressTracker): Seguimiento en bytes de cada descarga (opcional)
+            store (DownloadQueueStore): Cola persistente donde guardar el estado
+                de las canciones que traen 'queue_id' (opcional)
+            transcode_workers (int): Conversiones simultáneas (0 = cada worker
+                descarga y convierte su canción, sin pipeline)
+            dedup (bool): Descargar una sola vez las canciones repetidas
+        """
+        self.downloader = downloader
+        self.workers = max(1, int(workers))
+        self.on_progress = on_progress
+        self.tracker = tracker
+        self.store = store
+        self.transcode_workers = transcode_workers
+        self.dedup = dedup
+        self._transcoder = None
+        self._fetch_seconds = 0.0
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+    
+    def _use_pipeline(self):
+        """Indica si el descargador permite separar descarga y conversión"""
+        if not self.transcode_workers or not hasattr(self.downloader, 'fetch_audio'):
+            return False
+        output_format = getattr(self.downloader, '_output_format', None)
+        return bool(output_format and output_format()[0])
+    
+    def cancel(self):
+        """Cancela las descargas que aún no han empezado"""
+        self._cancelled.set()
+    
+    def run(self, songs, output_path=None, profile=None):
+        """
+        Descarga todas las canciones y bloquea hasta terminar
+        
+        Las canciones se lanzan agrupadas por perfil de salida, para que las
+        instancias de yt-dlp y los ajustes de FFmpeg de cada perfil se
+        reutilicen en lugar de alternarse canción a canción. Antes se
+        apartan las canciones repetidas (mismo video o misma canción subida
+        varias veces), que cuentan como omitidas y se listan en 'duplicates'.
+        
+        Args:
+            songs (list): Lista de diccionarios con al menos 'url' y 'title'
+            output_path (str): Ruta de salida, salvo para las canciones que
+                traen su propio 'output_path' (opcional)
+            profile (str): Perfil de salida de la cola, salvo para las
+                canciones que traen su propio 'profile' (opcional)
+            
+        Returns:
+            dict: Resumen con totales, tiempo y rendimiento
+        """
+        self._cancelled.clear()
+        songs = list(songs)
+        total = len(songs)
+        summary = {
+            'total': total,
+            'succeeded': 0,
+            'failed': 0,
+            'skipped': 0,
+            'cancelled': 0,
+            'results': [None] * total,
+            'failures': [],
+            'copied': 0,
+            'transcoded': 0,
+            'duplicates': [],
+        }
+        start = time.monotonic()
+        retry = getattr(self.downloader, 'retry', None)
+        retry_before = retry.stats() if retry else None
+        self._fetch_seconds = 0.0
+        self._transcoder = TranscodePool(self.transcode_workers) if self._use_pipeline() else None
+        
+        def record(index, status, message, conversion=None):
+            summary['results'][index] = (status, message)
+            summary[status] += 1
+            if conversion and status == 'succeeded':
+                summary['copied' if conversion == 'copy' else 'transcoded'] += 1
+            if status == 'failed':
+                # Los fallos se reúnen para un único informe al final, sin detener la cola
+                summary['failures'].append({
+                    'index': index,
+                    'title': songs[index].get('title', ''),
+                    'url': songs[index].get('url'),
+                    'message': message,
+                    'kind': classify_error(message),
+                })
+        
+        duplicates = find_duplicates(songs, profile, output_path) if self.dedup else {}
+        for index, (kept, reason) in sorted(duplicates.items()):
+            record(index, *self._skip_duplicate(index, songs[index], songs[kept], total))
+            summary['duplicates'].append({
+                'index': index,
+                'title': songs[index].get('title', ''),
+                'url': songs[index].get('url'),
+                'kept_index': kept,
+                'kept_title': songs[kept].get('title', ''),
+                'reason': reason,
+            })
+        
+        conversions = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='descarga') as executor:
+                futures = {
+                    executor.submit(self._download_one, index, songs[index], total, output_path, profile): index
+                    for index in self._group_by_profile(songs, profile) if index not in duplicates
+                }
+                for future in as_completed(futures):
+                    result = future.result()
+                    if isinstance(result, Future):
+                        # Descargada; el resultado llega cuando termine FFmpeg
+                        conversions[result] = futures[future]
+                    else:
+                        record(futures[future], *result)
+            for future in as_completed(conversions):
+                record(conversions[future], *future.result())
+        finally:
+            if self._transcoder:
+                self._transcoder.shutdown()
+        
+        if self._transcoder:
+            summary['stages'] = {
+                'fetch_workers': self.workers,
+                'fetch_seconds': self._fetch_seconds,
+                'transcode_workers': self._transcoder.workers,
+                'transcode_seconds': self._transcoder.busy_seconds,
+                # Tiempo que la red esperó a FFmpeg con la cola llena
+                'transcode_wait_seconds': self._transcoder.wait_seconds,
+            }
+        
+        if self.store:
+            self.store.flush()
+        elapsed = time.monotonic() - start
+        finished = summary['succeeded'] + summary['failed'] + summary['skipped']
+        summary['elapsed'] = elapsed
+        summary['songs_per_minute'] = finished * 60 / elapsed if elapsed > 0 else 0.0
+        summary['failures'].sort(key=lambda failure: failure['index'])
+        if retry:
+            # Solo los reintentos y esperas de esta ejecución
+            summary.update({key: value - retry_before[key] for key, value in retry.stats().items()})
+        if self.tracker:
+            summary['progress'] = self.tracker.snapshot()
+            summary['bytes_per_second'] = summary['progress']['downloaded_bytes'] / elapsed if elapsed > 0 else 0.0
+        return summary
+    
+    @staticmethod
+    def _group_by_profile(songs, profile):
+        """Índices de las canciones agrupados por perfil, en orden de primera aparición"""
+        first_seen = {}
+        for index, song in enumerate(songs):
+            first_seen.setdefault(song.get('profile') or profile, index)
+        return sorted(range(len(songs)), key=lambda index: first_seen[songs[index].get('profile') or profile])
+    
+    def _skip_duplicate(self, index, song, kept, total):
+        """Marca como resuelta una canción repetida sin descargarla"""
+        message = f"✓ Duplicado de: {kept.get('title', '')[:50]}"
+        if self.tracker:
+            self.tracker.item(index, song.get('title', '')).finish(True)
+        if self.store and song.get('queue_id') is not None:
+            self.store.update(song['queue_id'], state=DONE, error=None)
+        self._emit(index, total, song, 'skipped', message, 0.0)
+        return 'skipped', message
+    
+    def _download_one(self, index, song, total, output_path, profile=None):
+        """Descarga una canción de la cola (se ejecuta en un worker)"""
+        if self._cancelled.is_set():
+            if self.tracker:
+                self.tracker.item(index, song.get('title', '')).finish(False)
+            self._emit(index, total, song, 'cancelled', "Cancelado", 0.0)
+            return 'cancelled', "Cancelado"
+        
+        start = time.monotonic()
+        # Una descarga interrumpida se reanuda en la misma carpeta, donde quedó su .part
+        output_path = song.get('output_path') or output_path
+        queue_id = song.get('queue_id') if self.store else None
+        profile = song.get('profile') or profile
+        # Solo se pasa el perfil si hay uno, para admitir descargadores sin perfiles
+        profile_kwargs = {'profile': profile} if profile else {}
+        item = self.tracker.item(index, song.get('title', '')) if self.tracker else None
+        find_downloaded = getattr(self.downloader, 'find_downloaded', None)
+        if find_downloaded:
+            try:
+                existing = find_downloaded(song['url'], output_path, song.get('title'), **profile_kwargs)
+            except Exception as e:
+                print(f"Error consultando índice de descargas: {e}")
+                existing = None
+            if existing:
+                message = f"✓ Ya descargado: {song['title'][:50]}"
+                if item:
+                    item.finish(True)
+                if queue_id is not None:
+                    self.store.update(queue_id, state=DONE, filepath=existing, error=None)
+                self._emit(index, total, song, 'skipped', message, time.monotonic() - start)
+                return 'skipped', message
+        
+        self._emit(index, total, song, 'started', f"Descargando: {song['title'][:50]}", 0.0)
+        progress = item
+        if queue_id is not None:
+            self.store.start_attempt(queue_id, output_path)
+            progress = _QueueHooks(self.store, queue_id, item)
+        
+        if self._transcoder:
+            fetch_start = time.monotonic()
+            try:
+                info, source = self.downloader.fetch_audio(song['url'], progress=progress, **profile_kwargs)
+            except Exception as e:
+                return self._finish(index, song, total, item, queue_id, start, False, f"✗ Error: {str(e)}")
+            finally:
+                with self._lock:
+                    self._fetch_seconds += time.monotonic() - fetch_start
+            # Bloquea si FFmpeg va por detrás, para que el worker no siga descargando
+            return self._transcoder.submit(
+                self._transcode_one, index, song, total, item, queue_id, start, info, source, output_path,
+                progress, profile_kwargs
+            )
+        
+        kwargs = dict(profile_kwargs)
+        if progress:
+            kwargs['progress'] = progress
+        try:
+            success, message, conversion = self.downloader.download_song(
+                song['url'], output_path, title=song.get('title'), force=True, **kwargs
+            )
+        except Exception as e:
+            success, message, conversion = False, f"✗ Error: {str(e)}", None
+        return self._finish(index, song, total, item, queue_id, start, success, message, conversion)
+    
+    def _transcode_one(self, index, song, total, item, queue_id, start, info, source, output_path,
+                       progress, profile_kwargs):
+        """Convierte una canción ya descargada (se ejecuta en un worker de FFmpeg)"""
+        try:
+            success, message, conversion = self.downloader.transcode_download(
+                info, source, output_path, progress=progress, **profile_kwargs
+            )
+        except Exception as e:
+            success, message, conversion = False, f"✗ Error: {str(e)}", None
+        return self._finish(index, song, total, item, queue_id, start, success, message, conversion)
+    
+    def _finish(self, index, song, total, item, queue_id, start, success, message, conversion=None):
+        """Registra el resultado de una canción y notifica el evento"""
+        if item:
+            item.finish(success)
+        if queue_id is not None:
+            if success:
+                self.store.update(queue_id, state=DONE, error=None, conversion=conversion)
+            else:
+                self.store.update(queue_id, state=FAILED, error=message)
+        elapsed = time.monotonic() - start
+        
+        status = 'succeeded' if success else 'failed'
+        self._emit(index, total, song, status, message, elapsed, conversion)
+        return status, message, conversion
+    
+    def _emit(self, index, total, song, status, message, elapsed, conversion=None):
+        """Notifica un evento de progreso"""
+        if not self.on_progress:
+            return
+        event = {
+            'index': index,
+            'total': total,
+            'song': song,
+            'status': status,
+            'message': message,
+            'elapsed': elapsed,
+            # 'copy' si se guardó sin recodificar, 'transcode' si pasó por FFmpeg
+            'conversion': conversion,
+        }
+        # Serializar las notificaciones para que el callback no tenga que ser thread-safe
+        with self._lock:
+            try:
+                self.on_progress(event)
+            except Exception as e:
+                print(f"Error notificando progreso: {e}")
@@ -0,0 +1,182 @@
+"""
+Sesiones reutilizables de yt-dlp
+"""
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Opciones que cambian en cada trabajo (carpeta y nombre de salida): se
+# aplican a la instancia solo durante el préstamo y no separan perfiles
+LOAN_OPTS = ('outtmpl', 'paths')
+
+
+class _HookRouter:
+    """
+    Hooks fijos de una instancia del pool que reenvían a los callbacks de
+    quien la tiene prestada en ese momento
+    """
+    
+    def __init__(self):
+        self.progress = None
+        self.postprocessor = None
+    
+    def on_progress(self, d):
+        if self.progress:
+            self.progress(d)
+    
+    def on_postprocessor(self, d):
+        if self.postprocessor:
+            self.postprocessor(d)
+
+
+class YDLSessionPool:
+    """
+    Mantiene instancias de yt_dlp.YoutubeDL ya inicializadas, una pila por
+    perfil de opciones, para no recrear extractores, cookies y conexiones
+    HTTP en cada llamada.
+    
+    Cada instancia se presta a un solo hilo a la vez, por lo que el pool
+    puede usarse desde varios hilos simultáneamente. La plantilla de salida
+    y las carpetas (LOAN_OPTS) no forman parte del perfil, así que las
+    descargas a carpetas distintas reutilizan las mismas instancias.
+    """
+    
+    def __init__(self, max_idle_per_profile=8, max_idle=24):
+        """
+        Args:
+            max_idle_per_profile (int): Instancias libres a conservar por perfil
+            max_idle (int): Instancias libres en total; se cierran primero
+                las de los perfiles usados hace más tiempo
+        """
+        self.max_idle_per_profile = max_idle_per_profile
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _profile_key(opts):
+        """Clave estable para un diccionario de opciones (sin LOAN_OPTS)"""
+        return json.dumps(
+            {name: value for name, value in opts.items() if name not in LOAN_OPTS}, sort_keys=True, default=repr
+        )
+    
+    @staticmethod
+    def _lend(ydl, opts):
+        """
+        Aplica las opciones del préstamo a una instancia
+        
+        Returns:
+            dict: Valores anteriores, para _restore
+        """
+        saved = {name: ydl.params.get(name) for name in LOAN_OPTS}
+        outtmpl = opts.get('outtmpl')
+        if outtmpl is not None:
+            # yt-dlp guarda las plantillas como dict {'default': ..., 'chapter': ...}
+            templates = dict(saved['outtmpl']) if isinstance(saved['outtmpl'], dict) else {}
+            templates.update(outtmpl if isinstance(outtmpl, dict) else {'default': outtmpl})
+            ydl.params['outtmpl'] = templates
+        if opts.get('paths') is not None:
+            ydl.params['paths'] = dict(opts['paths'])
+        return saved
+    
+    @staticmethod
+    def _restore(ydl, saved):
+        for name, value in saved.items():
+            if value is None:
+                ydl.params.pop(name, None)
+            else:
+                ydl.params[name] = value
+    
+    @contextmanager
+    def acquire(self, opts, progress_hook=None, postprocessor_hook=None):
+        """
+        Presta una instancia de YoutubeDL configurada con opts
+        
+        Los hooks, la plantilla de salida y las carpetas no forman parte del
+        perfil: se aplican solo mientras dura el préstamo.
+        
+        Args:
+            opts (dict): Opciones de yt-dlp
+            progress_hook (callable): Hook de progreso de descarga (opcional)
+            postprocessor_hook (callable): Hook de postprocesado (opcional)
+            
+        Yields:
+            yt_dlp.YoutubeDL: Instancia lista para usar
+        """
+        key = self._profile_key(opts)
+        entry = None
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                entry = idle.pop()
+                self.reused += 1
+        
+        if entry is None:
+            import yt_dlp
+            router = _HookRouter()
+            params = {name: value for name, value in opts.items() if name not in LOAN_OPTS}
+            params['progress_hooks'] = list(opts.get('progress_hooks') or []) + [router.on_progress]
+            params['postprocessor_hooks'] = (
+                list(opts.get('postprocessor_hooks') or []) + [router.on_postprocessor]
+            )
+            entry = (yt_dlp.YoutubeDL(params), router)
+            with self._lock:
+                self.created += 1
+        
+        ydl, router = entry
+        saved = self._lend(ydl, opts)
+        router.progress = progress_hook
+        router.postprocessor = postprocessor_hook
+        try:
+            yield ydl
+        finally:
+            router.progress = None
+            router.postprocessor = None
+            self._restore(ydl, saved)
+            evicted = []
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(idle) < self.max_idle_per_profile:
+                    idle.append(entry)
+                    entry = None
+                # Tope global: cerrar las instancias de los perfiles menos usados
+                total = sum(len(instances) for instances in self._idle.values())
+                while total > self.max_idle:
+                    oldest_key, oldest = next(iter(self._idle.items()))
+                    if oldest:
+                        evicted.append(oldest.pop(0))
+                        total -= 1
+                    if not oldest:
+                        del self._idle[oldest_key]
+            if entry is not None:
+                evicted.append(entry)
+            for old_ydl, _ in evicted:
+                try:
+                    old_ydl.close()
+                except Exception:
+                    pass
+    
+    def warm_up(self):
+        """Importa yt_dlp por adelantado (tarda varios cientos de milisegundos)"""
+        import yt_dlp
+    
+    def stats(self):
+        """Retorna cuántas instancias se crearon y cuántas se reutilizaron"""
+        with self._lock:
+            idle = sum(len(instances) for instances in self._idle.values())
+        return {'created': self.created, 'reused': self.reused, 'idle': idle}
+    
+    def close(self):
+        """Cierra todas las instancias libres"""
+        with self._lock:
+            instances = [ydl for idle in self._idle.values() for ydl, _ in idle]
+            self._idle.clear()
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
@@ -0,0 +1,214 @@
+"""
+Streaming de audio para las vistas previas
+"""
+import subprocess
+
+from config import get_ffmpeg_path
+
+# Margen para cabeceras del contenedor y variaciones de bitrate
+RANGE_HEADER_BYTES = 64 * 1024
+RANGE_SAFETY_FACTOR = 1.25
+
+STREAM_OPTS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'no_warnings': True,
+    'socket_timeout': 30,
+}
+
+
+def resolve_stream(session, url, format=None):
+    """
+    Obtiene la URL directa del audio sin descargarlo
+    
+    Args:
+        session (YDLSessionPool): Pool de yt-dlp
+        url (str): URL de YouTube
+        format (str): Selector de formato de yt-dlp (opcional)
+        
+    Returns:
+        dict: URL directa, cabeceras HTTP y datos del formato elegido
+    """
+    opts = STREAM_OPTS if not format else {**STREAM_OPTS, 'format': format}
+    with session.acquire(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    
+    # Con un solo formato seleccionado yt-dlp deja sus datos en el nivel superior
+    fmt = (info.get('requested_formats') or [info])[0]
+    return {
+        'url': fmt['url'],
+        'http_headers': fmt.get('http_headers') or info.get('http_headers') or {},
+        'ext': fmt.get('ext'),
+        'abr': fmt.get('abr') or fmt.get('tbr'),
+        'filesize': fmt.get('filesize') or fmt.get('filesize_approx'),
+        'duration': info.get('duration'),
+        'title': info.get('title'),
+    }
+
+
+def estimate_preview_bytes(stream_info, seconds):
+    """
+    Estima cuántos bytes del archivo hacen falta para reproducir N segundos
+    
+    Returns:
+        int: Bytes estimados, o None si no hay datos suficientes
+    """
+    abr = stream_info.get('abr')
+    filesize = stream_info.get('filesize')
+    duration = stream_info.get('duration')
+    if abr:
+        needed = abr * 1000 / 8 * seconds
+    elif filesize and duration:
+        needed = filesize / duration * seconds
+    else:
+        return None
+    estimate = int(needed * RANGE_SAFETY_FACTOR) + RANGE_HEADER_BYTES
+    return min(estimate, filesize) if filesize else estimate
+
+
+def fetch_preview_range(stream_info, seconds, dest, timeout=30):
+    """
+    Descarga solo el principio del audio con una petición HTTP Range
+    
+    Si el servidor ignora el Range, se lee igualmente solo la parte
+    estimada y se corta la conexión.
+    
+    Args:
+        stream_info (dict): Resultado de resolve_stream
+        seconds (float): Segundos de audio necesarios
+        dest (Path): Archivo de destino
+        timeout (int): Timeout de la conexión en segundos
+        
+    Returns:
+        dict: Métricas con bytes descargados, tamaño total y bytes ahorrados
+    """
+    import urllib.request
+    
+    needed = estimate_preview_bytes(stream_info, seconds)
+    if needed is None:
+        raise Exception("No se puede estimar el tamaño del fragmento")
+    
+    headers = dict(stream_info.get('http_headers') or {})
+    headers['Range'] = f"bytes=0-{needed - 1}"
+    request = urllib.request.Request(stream_info['url'], headers=headers)
+    
+    fetched = 0
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        ranged = response.status == 206
+        total = stream_info.get('filesize')
+        content_range = response.headers.get('Content-Range', '')
+        if ranged and '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+            total = int(content_range.rsplit('/', 1)[1])
+        elif not ranged and response.headers.get('Content-Length', '').isdigit():
+            total = int(response.headers['Content-Length'])
+        
+        with open(dest, 'wb') as f:
+            while fetched < needed:
+                data = response.read(min(64 * 1024, needed - fetched))
+                if not data:
+                    break
+                f.write(data)
+                fetched += len(data)
+    
+    return {
+        'ranged': ranged,
+        'bytes_fetched': fetched,
+        'bytes_total': total,
+        'bytes_saved': max(0, total - fetched) if total else 0,
+    }
+
+
+class PCMStream:
+    """Decodifica un fragmento de audio a PCM de 16 bits con FFmpeg por una tubería"""
+    
+    def __init__(self, source, duration, sample_rate=44100, channels=2, start=0,
+                 http_headers=None, ffmpeg_path=None):
+        """
+        Args:
+            source (str): URL directa o ruta de archivo
+            duration (float): Segundos a decodificar
+            sample_rate (int): Frecuencia de salida
+            channels (int): Canales de salida
+            start (float): Segundo desde el que empezar
+            http_headers (dict): Cabeceras para la petición HTTP (opcional)
+            ffmpeg_path (str): Ejecutable de FFmpeg (por defecto el encontrado en config)
+        """
+        self.source = source
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.start = start
+        self.http_headers = http_headers or {}
+        self.ffmpeg_path = ffmpeg_path or get_ffmpeg_path()
+        self.bytes_per_second = sample_rate * channels * 2
+        self.process = None
+    
+    def _command(self):
+        """Construye la línea de comandos de FFmpeg"""
+        cmd = [self.ffmpeg_path, '-nostdin', '-hide_banner', '-loglevel', 'error']
+        if self.http_headers and '://' in self.source:
+            headers = ''.join(f"{k}: {v}\r\n" for k, v in self.http_headers.items())
+            cmd += ['-headers', headers]
+        if self.start:
+            cmd += ['-ss', str(self.start)]
+        cmd += [
+            '-t', str(self.duration),
+            '-i', self.source,
+            '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', str(self.sample_rate), '-ac', str(self.channels),
+            'pipe:1',
+        ]
+        return cmd
+    
+    def chunks(self, chunk_seconds=0.5, first_chunk_seconds=0.25):
+        """
+        Genera bloques de PCM a medida que FFmpeg los decodifica
+        
+        El primer bloque es más corto para empezar a sonar cuanto antes.
+        
+        Yields:
+            bytes: Muestras PCM intercaladas
+        """
+        if not self.ffmpeg_path:
+            raise Exception("FFmpeg no está instalado")
+        
+        process = self.process = subprocess.Popen(
+            self._command(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+        )
+        frame = self.channels * 2
+        size = int(self.bytes_per_second * first_chunk_seconds) // frame * frame
+        chunk_size = int(self.bytes_per_second * chunk_seconds) // frame * frame
+        try:
+            while True:
+                try:
+                    data = process.stdout.read(size)
+                except (ValueError, OSError):
+                    # close() desde otro hilo ya cerró la tubería
+                    break
+                if not data:
+                    break
+                # Nunca entregar un frame partido
+                extra = len(data) % frame
+                if extra:
+                    data = data[:-extra]
+                if data:
+                    yield data
+                size = chunk_size
+        finally:
+            self.close()
+    
+    def close(self):
+        """Detiene FFmpeg si sigue en ejecución"""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.terminate()
+        try:
+            process.stdout.close()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
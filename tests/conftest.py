@@ -0,0 +1,7 @@
+"""
+Configuración de pytest: los módulos del programa están en la raíz del repositorio
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,24 @@
+"""
+Caché de búsquedas: las planas y las completas no se mezclan
+"""
+from cache import SearchCache
+
+FULL = [{'id': 'aaaaaaaaaaa', 'title': 'Canción', 'duration': 200, 'views': 1000}]
+FLAT = [{'id': 'aaaaaaaaaaa', 'title': 'Canción', 'duration': 0, 'views': 0}]
+
+
+def test_flat_results_do_not_answer_full_searches(tmp_path):
+    cache = SearchCache(tmp_path / 'cache.sqlite3')
+    cache.put('Artista - Canción', 5, FLAT, flat=True)
+    
+    assert cache.get('artista - canción', 5) is None
+    assert cache.get('artista - canción', 5, flat=True) == FLAT
+
+
+def test_full_results_answer_flat_searches(tmp_path):
+    cache = SearchCache(tmp_path / 'cache.sqlite3')
+    cache.put('Artista - Canción', 5, FULL)
+    
+    assert cache.get('artista - canción', 5, flat=True) == FULL
+    assert cache.get('artista - canción', 5) == FULL
+    assert cache.stats()['hits'] == 2
@@ -0,0 +1,27 @@
+"""
+Detección de canciones duplicadas en la cola
+"""
+from dedup import find_duplicates
+
+
+def test_same_title_without_duration_is_not_merged():
+    songs = [
+        {'id': 'aaaaaaaaaaa', 'title': 'Intro'},
+        {'id': 'bbbbbbbbbbb', 'title': 'Intro'},
+        {'id': 'ccccccccccc', 'title': 'Intro', 'duration': 95},
+    ]
+    assert find_duplicates(songs) == {}
+
+
+def test_same_video_id_is_merged_without_duration():
+    songs = [{'id': 'aaaaaaaaaaa', 'title': 'Intro'}, {'id': 'aaaaaaaaaaa', 'title': 'Intro (Letra)'}]
+    assert find_duplicates(songs) == {1: (0, 'id')}
+
+
+def test_same_title_and_duration_is_merged():
+    songs = [
+        {'id': 'aaaaaaaaaaa', 'title': 'Queen - Bohemian Rhapsody', 'duration': 354},
+        {'id': 'bbbbbbbbbbb', 'title': 'Queen - Bohemian Rhapsody (Official Video)', 'duration': 358},
+        {'id': 'ccccccccccc', 'title': 'Queen - Bohemian Rhapsody', 'duration': 420},
+    ]
+    assert find_duplicates(songs) == {1: (0, 'title')}
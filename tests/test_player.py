@@ -0,0 +1,292 @@
+"""
+Reproductor: latencia de las órdenes y órdenes rápidas sin fugas
+
+Se sustituyen pygame, el decodificador (PCMStream) y yt-dlp por versiones
+falsas que cuentan cuántos decodificadores hay activos a la vez.
+"""
+import random
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import player
+from player import AudioPlayer, IDLE, PAUSED, PLAYING
+from workspace import WorkspaceManager
+
+SAMPLE_RATE = 22050
+CHANNELS = 2
+CHUNK_SECONDS = 0.5
+
+
+class DecoderCounter:
+    """Decodificadores activos y máximo simultáneo"""
+    
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.started = 0
+        self._lock = threading.Lock()
+    
+    def open(self):
+        with self._lock:
+            self.active += 1
+            self.started += 1
+            self.peak = max(self.peak, self.active)
+    
+    def close(self):
+        with self._lock:
+            self.active -= 1
+
+
+class FakeChannel:
+    def __init__(self):
+        self.playing = False
+        self.paused = False
+    
+    def play(self, sound):
+        self.playing = True
+    
+    def queue(self, sound):
+        pass
+    
+    def stop(self):
+        self.playing = False
+    
+    def pause(self):
+        self.paused = True
+    
+    def unpause(self):
+        self.paused = False
+    
+    def get_busy(self):
+        return self.playing
+    
+    def set_volume(self, volume):
+        pass
+
+
+class FakeMusic:
+    """pygame.mixer.music: un solo archivo a la vez, como el real"""
+    
+    def __init__(self, decoders):
+        self.decoders = decoders
+        self.loaded = None
+        self.playing = False
+        self.paused = False
+    
+    def load(self, path):
+        self.loaded = path
+    
+    def play(self):
+        if not self.playing:
+            self.decoders.open()
+        self.playing = True
+        self.paused = False
+    
+    def stop(self):
+        if self.playing:
+            self.decoders.close()
+        self.playing = False
+    
+    def unload(self):
+        self.loaded = None
+    
+    def pause(self):
+        self.paused = True
+    
+    def unpause(self):
+        self.paused = False
+    
+    def get_busy(self):
+        return self.playing and not self.paused
+    
+    def get_pos(self):
+        return 0
+    
+    def set_volume(self, volume):
+        pass
+
+
+def fake_pygame(decoders, channel):
+    mixer = types.SimpleNamespace(
+        init=lambda: None,
+        get_init=lambda: (SAMPLE_RATE, -16, CHANNELS),
+        find_channel=lambda force=False: channel,
+        Sound=lambda buffer=None: buffer,
+        music=FakeMusic(decoders),
+    )
+    return types.SimpleNamespace(mixer=mixer, error=Exception)
+
+
+def fake_pcm_stream(decoders):
+    class FakePCMStream:
+        """Entrega bloques de PCM al instante, como un FFmpeg muy rápido"""
+        
+        def __init__(self, url, seconds, sample_rate, channels, start=0, http_headers=None):
+            self.seconds = seconds
+            self.closed = threading.Event()
+            self._open = False
+            self._lock = threading.Lock()
+        
+        def chunks(self):
+            with self._lock:
+                if self.closed.is_set():
+                    return
+                self._open = True
+                decoders.open()
+            try:
+                chunk = bytes(int(SAMPLE_RATE * CHUNK_SECONDS) * CHANNELS * 2)
+                produced = 0.0
+                while produced < self.seconds and not self.closed.is_set():
+                    time.sleep(0.001)
+                    yield chunk
+                    produced += CHUNK_SECONDS
+            finally:
+                self.close()
+        
+        def close(self):
+            with self._lock:
+                self.closed.set()
+                if self._open:
+                    self._open = False
+                    decoders.close()
+    
+    return FakePCMStream
+
+
+@pytest.fixture
+def fakes(monkeypatch, tmp_path):
+    decoders = DecoderCounter()
+    channel = FakeChannel()
+    pygame = fake_pygame(decoders, channel)
+    monkeypatch.setitem(sys.modules, 'pygame', pygame)
+    monkeypatch.setattr(player, 'get_ffmpeg_path', lambda: 'ffmpeg')
+    monkeypatch.setattr(player, 'PCMStream', fake_pcm_stream(decoders))
+    monkeypatch.setattr(player, 'resolve_stream', lambda session, url, format=None: {'url': url, 'http_headers': {}})
+    
+    workspaces = WorkspaceManager(tmp_path / 'temp')
+    audio = AudioPlayer(session=object(), workspaces=workspaces)
+    audio.pygame_available = True
+    
+    # Órdenes enviadas y ejecutadas, para saber cuándo el trabajador termina
+    sent, handled = [], []
+    send, handle = audio._send, audio._handle_command
+    
+    def counting_send(command, *args):
+        sent.append(command)
+        send(command, *args)
+    
+    def counting_handle(command, args):
+        try:
+            handle(command, args)
+        finally:
+            handled.append(command)
+    
+    audio._send = counting_send
+    audio._handle_command = counting_handle
+    fakes = types.SimpleNamespace(
+        player=audio, decoders=decoders, channel=channel, pygame=pygame, workspaces=workspaces,
+        drained=lambda: len(handled) == len(sent),
+    )
+    yield fakes
+    # El trabajador no debe tocar pygame después de quitar las versiones falsas
+    audio.stop()
+    wait_until(fakes.drained)
+
+
+def wait_until(predicate, timeout=2.0):
+    """Segundos hasta que predicate() es verdadero (falla si vence timeout)"""
+    start = time.perf_counter()
+    while not predicate():
+        if time.perf_counter() - start > timeout:
+            raise AssertionError("La condición no se cumplió a tiempo")
+        time.sleep(0.0005)
+    return time.perf_counter() - start
+
+
+def test_controls_take_effect_within_milliseconds(fakes):
+    audio, channel, decoders = fakes.player, fakes.channel, fakes.decoders
+    audio.play_preview('https://www.youtube.com/watch?v=aaaaaaaaaaa', duration_limit=30)
+    wait_until(lambda: audio.state == PLAYING)
+    time.sleep(0.05)
+    
+    audio.pause()
+    assert wait_until(lambda: audio.state == PAUSED and channel.paused) < 0.02
+    paused_at = audio.get_elapsed()
+    time.sleep(0.05)
+    assert audio.get_elapsed() == pytest.approx(paused_at, abs=0.002)
+    
+    audio.resume()
+    assert wait_until(lambda: audio.state == PLAYING and not channel.paused) < 0.02
+    
+    audio.stop()
+    assert wait_until(lambda: decoders.active == 0 and not channel.playing) < 0.02
+    assert audio.state == IDLE
+
+
+def stress(audio, urls, commands=400):
+    random.seed(0)
+    for _ in range(commands):
+        action = random.random()
+        if action < 0.5:
+            audio.play_preview(random.choice(urls), duration_limit=30)
+        elif action < 0.7:
+            audio.stop()
+        elif action < 0.85:
+            audio.pause()
+        else:
+            audio.resume()
+        if random.random() < 0.3:
+            time.sleep(random.uniform(0, 0.002))
+    audio.stop()
+
+
+def test_rapid_commands_streaming(fakes):
+    audio, decoders = fakes.player, fakes.decoders
+    urls = [f"https://www.youtube.com/watch?v=video{i:06d}" for i in range(10)]
+    stress(audio, urls)
+    
+    wait_until(lambda: decoders.active == 0 and fakes.drained())
+    assert decoders.started > 0
+    assert decoders.peak == 1
+    assert audio.state == IDLE
+
+
+def test_rapid_commands_downloaded_preview_leaves_no_temp_files(fakes, monkeypatch):
+    audio, decoders, workspaces = fakes.player, fakes.decoders, fakes.workspaces
+    # Sin FFmpeg el reproductor descarga el fragmento a una carpeta temporal
+    monkeypatch.setattr(player, 'get_ffmpeg_path', lambda: None)
+    
+    def download_preview(url, duration_limit, folder, name, format):
+        time.sleep(0.001)
+        path = folder / f"{name}.mp3"
+        path.write_bytes(b'\0' * 1024)
+        return path
+    
+    audio._download_preview = download_preview
+    urls = [f"https://www.youtube.com/watch?v=video{i:06d}" for i in range(10)]
+    stress(audio, urls)
+    
+    wait_until(lambda: decoders.active == 0 and fakes.drained())
+    wait_until(lambda: not any(workspaces.root.iterdir()))
+    assert decoders.started > 0
+    assert decoders.peak == 1
+    assert audio.state == IDLE
+
+
+def test_library_file_plays_without_network(fakes, monkeypatch, tmp_path):
+    audio, decoders = fakes.player, fakes.decoders
+    song = tmp_path / 'Canción.mp3'
+    song.write_bytes(b'\0' * 1024)
+    
+    def no_network(*args, **kwargs):
+        raise AssertionError("Una canción de la biblioteca no debe resolverse en YouTube")
+    
+    monkeypatch.setattr(player, 'resolve_stream', no_network)
+    audio.play_preview(str(song), duration_limit=30)
+    wait_until(lambda: audio.state == PLAYING and decoders.active == 1)
+    audio.stop()
+    wait_until(lambda: decoders.active == 0 and fakes.drained())
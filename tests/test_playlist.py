@@ -0,0 +1,49 @@
+"""
+Lectura de listas de canciones
+"""
+import json
+
+from playlist import iter_playlist
+
+
+def read(tmp_path, text, name='lista.csv'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return list(iter_playlist(path))
+
+
+def test_headerless_csv_starting_with_column_name(tmp_path):
+    # Listas antiguas sin cabecera cuya primera canción se llama como una columna
+    assert read(tmp_path, "Time\nMoney\n") == [{'query': 'Time'}, {'query': 'Money'}]
+    assert read(tmp_path, "Song\nName\nAlbum\n") == [{'query': 'Song'}, {'query': 'Name'}, {'query': 'Album'}]
+
+
+def test_headerless_csv_keeps_separators_in_titles(tmp_path):
+    entries = read(tmp_path, "Song; with; semicolons\nAnother; song; here\n")
+    assert entries == [{'query': 'Song; with; semicolons'}, {'query': 'Another; song; here'}]
+    entries = read(tmp_path, "AC|DC - Thunderstruck\nSystem | Toxicity\n")
+    assert entries == [{'query': 'AC|DC - Thunderstruck'}, {'query': 'System | Toxicity'}]
+
+
+def test_headerless_csv_with_duration(tmp_path):
+    entries = read(tmp_path, "Time,6:53\nMoney;6:22\n")
+    assert entries[0] == {'query': 'Time', 'duration': 413}
+    assert read(tmp_path, "Time;6:53\nMoney;6:22\n") == [
+        {'query': 'Time', 'duration': 413}, {'query': 'Money', 'duration': 382},
+    ]
+
+
+def test_csv_with_header(tmp_path):
+    entries = read(tmp_path, "Track Name,Artist Name(s),Duration (ms)\nBohemian Rhapsody,Queen,354000\n")
+    assert entries == [{'query': 'Queen - Bohemian Rhapsody', 'duration': 354}]
+    entries = read(tmp_path, "Artist;Title;Link\nQueen;Bohemian Rhapsody;https://youtu.be/fJ9rUzIMcZQ\n")
+    assert entries == [{
+        'url': 'https://youtu.be/fJ9rUzIMcZQ', 'title': 'Queen - Bohemian Rhapsody', 'id': 'fJ9rUzIMcZQ',
+    }]
+
+
+def test_json_reads_back_queue_entries(tmp_path):
+    songs = [{'query': 'Queen - Bohemian Rhapsody', 'duration': 354}, {'query': 'Time'}]
+    assert read(tmp_path, json.dumps(songs), 'lista.json') == songs
+    text = ''.join(json.dumps(song) + '\n' for song in songs)
+    assert read(tmp_path, text, 'lista.jsonl') == songs
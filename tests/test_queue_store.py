@@ -0,0 +1,70 @@
+"""
+Cola persistente: una operación que falla no deshace las demás del lote
+"""
+import threading
+import time
+
+from queue_store import DONE, FAILED, PENDING, DownloadQueueStore
+
+
+def test_failing_op_only_drops_itself(tmp_path):
+    store = DownloadQueueStore(tmp_path / 'queue.sqlite3')
+    first, second = store.add([{'url': 'https://a', 'title': 'A'}, {'url': 'https://b', 'title': 'B'}])
+    
+    # Se detiene al escritor para que las siguientes operaciones formen un solo lote
+    entered, gate = threading.Event(), threading.Event()
+    apply = store._apply
+    
+    def gated_apply(conn, op):
+        if op == ('noop',) and not gate.is_set():
+            entered.set()
+            gate.wait()
+        return apply(conn, op)
+    
+    store._apply = gated_apply
+    blocker = threading.Thread(target=store.flush)
+    blocker.start()
+    assert entered.wait(2)
+    
+    store.update(first, state=FAILED, error='sin red')
+    errors = []
+    
+    def bad_add():
+        try:
+            # Un resultado que no se puede guardar como JSON
+            store.add([{'url': 'https://c', 'title': 'C', 'info': object()}])
+        except Exception as e:
+            errors.append(e)
+    
+    adder = threading.Thread(target=bad_add)
+    adder.start()
+    store.update(second, state=DONE)
+    deadline = time.monotonic() + 2
+    while store._ops.qsize() < 3:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    
+    gate.set()
+    blocker.join(2)
+    adder.join(2)
+    store.flush()
+    
+    assert len(errors) == 1 and 'cola persistente' in str(errors[0])
+    items = {item['queue_id']: item for item in store.items()}
+    assert len(items) == 2
+    assert items[first]['state'] == FAILED and items[first]['error'] == 'sin red'
+    assert items[second]['state'] == DONE
+    store.close()
+
+
+def test_failing_update_is_reported_without_waiter(tmp_path, capsys):
+    store = DownloadQueueStore(tmp_path / 'queue.sqlite3')
+    item_id, = store.add([{'url': 'https://a', 'title': 'A'}])
+    store.update(item_id, song={'info': object()})
+    store.update(item_id, state=PENDING, error=None)
+    store.flush()
+    
+    assert 'Error escribiendo la cola de descargas (update)' in capsys.readouterr().out
+    assert store.items()[0]['state'] == PENDING
+    store.close()
+
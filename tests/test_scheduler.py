@@ -0,0 +1,29 @@
+"""
+Planificador: el modo de conversión se guarda también sin pipeline
+"""
+from queue_store import DONE, DownloadQueueStore
+from scheduler import DownloadScheduler
+
+
+class FakeDownloader:
+    """Descarga y convierte en un solo paso (como download_song)"""
+    
+    def download_song(self, url, output_path=None, title=None, force=False, progress=None):
+        mode = 'copy' if url.endswith('opus') else 'transcode'
+        return True, f"✓ Descargado: {url}", mode
+
+
+def test_single_stage_records_conversion(tmp_path):
+    store = DownloadQueueStore(tmp_path / 'queue.sqlite3')
+    songs = [{'url': f"fake://{i}-{'opus' if i % 2 else 'aac'}", 'title': f"Canción {i}"} for i in range(4)]
+    for song, queue_id in zip(songs, store.add(songs)):
+        song['queue_id'] = queue_id
+    
+    scheduler = DownloadScheduler(FakeDownloader(), workers=2, store=store, transcode_workers=0, dedup=False)
+    summary = scheduler.run(songs)
+    store.flush()
+    
+    assert summary['copied'] == 2 and summary['transcoded'] == 2
+    items = store.items((DONE,))
+    assert [item['conversion'] for item in items] == ['transcode', 'copy', 'transcode', 'copy']
+    store.close()
@@ -0,0 +1,53 @@
+"""
+Pool de instancias de yt-dlp
+"""
+import sys
+import types
+
+import pytest
+
+from session import YDLSessionPool
+
+
+class FakeYoutubeDL:
+    closed = 0
+    
+    def __init__(self, params):
+        self.params = dict(params)
+        outtmpl = self.params.get('outtmpl', {})
+        self.params['outtmpl'] = outtmpl if isinstance(outtmpl, dict) else {'default': outtmpl}
+    
+    def close(self):
+        FakeYoutubeDL.closed += 1
+
+
+@pytest.fixture(autouse=True)
+def fake_yt_dlp(monkeypatch):
+    FakeYoutubeDL.closed = 0
+    monkeypatch.setitem(sys.modules, 'yt_dlp', types.SimpleNamespace(YoutubeDL=FakeYoutubeDL))
+
+
+def test_output_folder_does_not_split_profiles():
+    pool = YDLSessionPool()
+    for i in range(50):
+        with pool.acquire({'format': 'bestaudio', 'outtmpl': f"/tmp/fetch/video{i}/%(id)s.%(ext)s"}) as ydl:
+            assert ydl.params['outtmpl']['default'] == f"/tmp/fetch/video{i}/%(id)s.%(ext)s"
+    assert pool.stats() == {'created': 1, 'reused': 49, 'idle': 1}
+    
+    # Fuera del préstamo la instancia no conserva la carpeta del último trabajo
+    with pool.acquire({'format': 'bestaudio'}) as ydl:
+        assert 'video49' not in ydl.params['outtmpl'].get('default', '')
+
+
+def test_idle_instances_are_capped():
+    pool = YDLSessionPool(max_idle_per_profile=8, max_idle=4)
+    for i in range(10):
+        with pool.acquire({'format': f"perfil{i}"}):
+            pass
+    assert pool.stats()['idle'] == 4
+    assert FakeYoutubeDL.closed == 6
+    
+    # Se conservan los perfiles usados más recientemente
+    with pool.acquire({'format': 'perfil9'}):
+        pass
+    assert pool.stats()['created'] == 10
@@ -0,0 +1,212 @@
+"""
+Streaming de vistas previas contra un servidor HTTP local
+
+El servidor sirve un WAV generado en la prueba; las pruebas que decodifican
+necesitan FFmpeg y se omiten si no está instalado.
+"""
+import io
+import math
+import struct
+import threading
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import get_ffmpeg_path
+from streaming import RANGE_HEADER_BYTES, PCMStream, estimate_preview_bytes, fetch_preview_range
+
+SAMPLE_RATE = 22050
+CHANNELS = 2
+FRAME = CHANNELS * 2
+
+
+def make_wav(seconds, sample_rate=44100):
+    """Tono de 440 Hz en estéreo"""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        sample = int(12000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+        frames += struct.pack('<hh', sample, sample)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class AudioServer:
+    """Servidor HTTP en un hilo que sirve un archivo y anota las peticiones"""
+    
+    def __init__(self, data, honor_range=True):
+        self.data = data
+        self.honor_range = honor_range
+        self.ranges = []
+        self.sent = 0
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body, status = server.data, 200
+                requested = self.headers.get('Range')
+                server.ranges.append(requested)
+                if requested and server.honor_range:
+                    start, _, end = requested.removeprefix('bytes=').partition('-')
+                    start, end = int(start), min(int(end or len(server.data) - 1), len(server.data) - 1)
+                    body, status = server.data[start:end + 1], 206
+                self.send_response(status)
+                self.send_header('Content-Type', 'audio/wav')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 206:
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{len(server.data)}")
+                self.end_headers()
+                try:
+                    for i in range(0, len(body), 16 * 1024):
+                        self.wfile.write(body[i:i + 16 * 1024])
+                        server.sent += len(body[i:i + 16 * 1024])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/audio.wav"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture(scope='module')
+def wav():
+    return make_wav(3)
+
+
+@pytest.fixture
+def server(wav):
+    server = AudioServer(wav)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def ffmpeg():
+    path = get_ffmpeg_path()
+    if not path:
+        pytest.skip("FFmpeg no está instalado")
+    return path
+
+
+def test_pcm_stream_decodes_requested_seconds(server, ffmpeg):
+    stream = PCMStream(server.url, 2, SAMPLE_RATE, CHANNELS, ffmpeg_path=ffmpeg)
+    chunks = list(stream.chunks(chunk_seconds=0.5, first_chunk_seconds=0.25))
+    
+    assert chunks
+    assert len(chunks[0]) <= int(SAMPLE_RATE * 0.25) * FRAME
+    assert all(len(chunk) % FRAME == 0 for chunk in chunks)
+    total = sum(len(chunk) for chunk in chunks)
+    assert total == pytest.approx(2 * SAMPLE_RATE * FRAME, rel=0.02)
+    # Es el tono, no silencio
+    assert any(chunk.strip(b'\0') for chunk in chunks)
+    assert stream.process is None
+
+
+def test_pcm_stream_stops_and_reaps_ffmpeg(server, ffmpeg):
+    stream = PCMStream(server.url, 3, SAMPLE_RATE, CHANNELS, ffmpeg_path=ffmpeg)
+    chunks = stream.chunks()
+    assert next(chunks)
+    process = stream.process
+    assert process.poll() is None
+    
+    # Cerrar el generador a medias (como al pulsar Detener) termina FFmpeg
+    chunks.close()
+    assert stream.process is None
+    assert process.poll() is not None
+    assert process.stdout.closed
+
+
+def test_pcm_stream_close_from_another_thread(server, ffmpeg):
+    stream = PCMStream(server.url, 3, SAMPLE_RATE, CHANNELS, ffmpeg_path=ffmpeg)
+    chunks = stream.chunks()
+    assert next(chunks)
+    process = stream.process
+    
+    closer = threading.Thread(target=stream.close)
+    closer.start()
+    closer.join(timeout=5)
+    assert not closer.is_alive()
+    assert process.poll() is not None
+    # El generador termina sin colgarse ni lanzar errores
+    for _ in chunks:
+        pass
+
+
+def stream_info(server, **extra):
+    return {'url': server.url, 'http_headers': {'User-Agent': 'test'}, 'abr': 128, **extra}
+
+
+def test_estimate_preview_bytes():
+    # 10 s a 128 kbps: 160 000 bytes más el margen
+    assert estimate_preview_bytes({'abr': 128}, 10) == int(160000 * 1.25) + RANGE_HEADER_BYTES
+    # Sin bitrate se usa el tamaño medio por segundo
+    assert estimate_preview_bytes({'filesize': 3_000_000, 'duration': 300}, 10) == (
+        int(100000 * 1.25) + RANGE_HEADER_BYTES
+    )
+    # Nunca más que el archivo entero
+    assert estimate_preview_bytes({'abr': 128, 'filesize': 50_000}, 10) == 50_000
+    assert estimate_preview_bytes({'filesize': 50_000}, 10) is None
+
+
+def test_fetch_preview_range_ranged(server, wav, tmp_path):
+    dest = tmp_path / 'preview.wav'
+    info = stream_info(server)
+    needed = estimate_preview_bytes(info, 2)
+    metrics = fetch_preview_range(info, 2, dest)
+    
+    assert server.ranges == [f"bytes=0-{needed - 1}"]
+    assert metrics == {
+        'ranged': True,
+        'bytes_fetched': needed,
+        'bytes_total': len(wav),
+        'bytes_saved': len(wav) - needed,
+    }
+    assert dest.read_bytes() == wav[:needed]
+
+
+def test_fetch_preview_range_server_ignores_range(wav, tmp_path):
+    server = AudioServer(wav, honor_range=False)
+    try:
+        dest = tmp_path / 'preview.wav'
+        info = stream_info(server, filesize=len(wav))
+        needed = estimate_preview_bytes(info, 2)
+        metrics = fetch_preview_range(info, 2, dest)
+    finally:
+        server.close()
+    
+    # Responde 200 con el archivo entero, pero solo se lee lo estimado
+    assert server.ranges == [f"bytes=0-{needed - 1}"]
+    assert metrics['ranged'] is False
+    assert metrics['bytes_fetched'] == needed
+    assert metrics['bytes_total'] == len(wav)
+    assert metrics['bytes_saved'] == len(wav) - needed
+    assert dest.read_bytes() == wav[:needed]
+
+
+def test_fetch_preview_range_whole_file_saves_nothing(server, wav, tmp_path):
+    dest = tmp_path / 'preview.wav'
+    # Un fragmento más largo que la canción: se descarga todo y no se ahorra nada
+    metrics = fetch_preview_range(stream_info(server, filesize=len(wav)), 60, dest)
+    
+    assert metrics['bytes_fetched'] == len(wav)
+    assert metrics['bytes_saved'] == 0
+    assert dest.read_bytes() == wav
+
+
+def test_fetch_preview_range_without_estimate(server, tmp_path):
+    with pytest.raises(Exception, match="estimar"):
+        fetch_preview_range({'url': server.url}, 2, tmp_path / 'preview.wav')
+    assert server.ranges == []
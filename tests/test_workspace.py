@@ -0,0 +1,63 @@
+"""
+Carpetas de claim(): se conservan para reanudar, pero no se acumulan
+"""
+import os
+import time
+
+from workspace import STABLE_DIR, WorkspaceManager
+from config import TEMP_ORPHAN_AGE
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "La condición no se cumplió a tiempo"
+        time.sleep(0.01)
+
+
+def make_fetch(root, name, age=0):
+    folder = root / STABLE_DIR / name
+    folder.mkdir(parents=True)
+    part = folder / 'aaaaaaaaaaa.webm.part'
+    part.write_bytes(b'\0' * 1024)
+    stamp = time.time() - age
+    os.utime(part, (stamp, stamp))
+    os.utime(folder, (stamp, stamp))
+    return part
+
+
+def test_startup_reaps_only_stale_fetch_dirs(tmp_path):
+    root = tmp_path / 'temp'
+    old = make_fetch(root, 'aaaaaaaaaaa-mp3', age=TEMP_ORPHAN_AGE + 60)
+    recent = make_fetch(root, 'bbbbbbbbbbb-mp3', age=60)
+    
+    WorkspaceManager(root)
+    wait_until(lambda: not old.parent.exists())
+    assert recent.exists()
+
+
+def test_stale_fetch_dir_in_use_is_kept(tmp_path):
+    root = tmp_path / 'temp'
+    manager = WorkspaceManager(root)
+    workspace = manager.claim('aaaaaaaaaaa-mp3')
+    part = workspace.file('aaaaaaaaaaa.webm.part')
+    part.write_bytes(b'\0')
+    stamp = time.time() - TEMP_ORPHAN_AGE - 60
+    os.utime(part, (stamp, stamp))
+    os.utime(workspace.path, (stamp, stamp))
+    
+    assert manager.reap_orphans() == 0
+    assert part.exists()
+
+
+def test_discard_removes_dropped_downloads(tmp_path):
+    root = tmp_path / 'temp'
+    manager = WorkspaceManager(root)
+    dropped = make_fetch(root, 'aaaaaaaaaaa-mp3')
+    in_use = manager.claim('bbbbbbbbbbb-mp3')
+    
+    manager.discard([dropped, in_use.file('bbbbbbbbbbb.webm.part'), tmp_path / 'otro' / 'x.part'])
+    wait_until(lambda: not dropped.parent.exists())
+    assert in_use.path.exists()
+    # Borrada la carpeta, se puede volver a reclamar
+    wait_until(lambda: manager.claim('aaaaaaaaaaa-mp3') is not None)
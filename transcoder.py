@@ -0,0 +1,203 @@
+"""
+Conversión de audio con FFmpeg en un pool de workers
+"""
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import TRANSCODE_WORKERS, TRANSCODE_QUEUE_SIZE, get_ffmpeg_path
+
+# Códec de FFmpeg y extensión de archivo para cada formato de salida
+# (los mismos que usa FFmpegExtractAudio de yt-dlp)
+CODECS = {
+    'mp3': ('libmp3lame', 'mp3'),
+    'aac': ('aac', 'm4a'),
+    'm4a': ('aac', 'm4a'),
+    'opus': ('libopus', 'opus'),
+    'vorbis': ('libvorbis', 'ogg'),
+    'flac': ('flac', 'flac'),
+    'wav': (None, 'wav'),
+}
+
+# Extensión con la que se guarda cada códec de origen al copiarlo sin recodificar
+COPY_EXTENSIONS = {'aac': 'm4a', 'opus': 'opus', 'vorbis': 'ogg', 'mp3': 'mp3', 'flac': 'flac'}
+
+# Stream de YouTube a pedir según el formato de salida, para poder copiarlo
+PREFERRED_FORMATS = {
+    'm4a': 'bestaudio[ext=m4a]/bestaudio/best',
+    'aac': 'bestaudio[ext=m4a]/bestaudio/best',
+    'opus': 'bestaudio[acodec=opus]/bestaudio/best',
+    'vorbis': 'bestaudio[acodec=vorbis]/bestaudio/best',
+    'mp3': 'bestaudio[acodec=mp3]/bestaudio/best',
+}
+
+# Un origen con más bitrate que el pedido se recodifica si lo supera en este factor
+COPY_BITRATE_TOLERANCE = 1.15
+
+
+def output_extension(codec):
+    """Extensión del archivo final para un códec de salida"""
+    return CODECS.get(codec, (None, codec))[1]
+
+
+def normalize_codec(acodec):
+    """Nombre de códec de yt-dlp ('mp4a.40.2', 'opus'...) a su familia ('aac', 'opus'...)"""
+    if not acodec or acodec == 'none':
+        return None
+    acodec = acodec.lower()
+    if acodec.startswith('mp4a') or acodec == 'aac':
+        return 'aac'
+    return acodec.split('.')[0]
+
+
+def preferred_format(codec):
+    """Selector de formato de yt-dlp que favorece un stream copiable al códec pedido"""
+    return PREFERRED_FORMATS.get(codec, 'bestaudio/best')
+
+
+def can_copy(source_codec, source_abr, codec, quality=None):
+    """
+    Decide si el audio descargado puede guardarse sin recodificar
+    
+    Args:
+        source_codec (str): Códec del audio descargado (familia, ej. 'aac')
+        source_abr (float): Bitrate del audio descargado en kbps (opcional)
+        codec (str): Formato de salida pedido ('best' = el del origen)
+        quality (str): Bitrate pedido en kbps (opcional)
+    
+    Returns:
+        bool: True si basta con copiar el audio a su contenedor
+    """
+    if source_codec not in COPY_EXTENSIONS:
+        return False
+    if codec == 'best':
+        return True
+    target = 'aac' if codec == 'm4a' else codec
+    if source_codec != target:
+        return False
+    # Recodificar a más bitrate no mejora nada; solo se recodifica para reducirlo
+    quality = str(quality or '')
+    if quality.isdigit() and int(quality) > 10 and source_abr:
+        return source_abr <= int(quality) * COPY_BITRATE_TOLERANCE
+    return True
+
+
+def build_ffmpeg_args(source, dest, codec, quality=None, ffmpeg_path=None):
+    """
+    Construye el comando de FFmpeg para convertir un archivo
+    
+    Args:
+        source (str): Archivo descargado
+        dest (str): Archivo de salida
+        codec (str): Formato de salida (ej. 'mp3')
+        quality (str): Bitrate en kbps, o calidad VBR 0-10 como en yt-dlp
+    
+    Returns:
+        list: Argumentos del proceso
+    """
+    encoder = CODECS.get(codec, (codec, codec))[0]
+    args = [ffmpeg_path or get_ffmpeg_path(), '-y', '-loglevel', 'error', '-i', str(source), '-vn']
+    if encoder:
+        args += ['-acodec', encoder]
+    if quality and codec not in ('flac', 'wav'):
+        quality = str(quality)
+        if quality.isdigit() and int(quality) > 10:
+            args += ['-b:a', f"{quality}k"]
+        elif codec == 'mp3':
+            args += ['-q:a', quality]
+    return args + [str(dest)]
+
+
+def transcode(source, dest, codec, quality=None, copy=False):
+    """
+    Convierte un archivo con FFmpeg
+    
+    Escribe primero en un archivo temporal junto al destino y lo renombra al
+    terminar, para que nunca quede un archivo final a medias.
+    
+    Args:
+        copy (bool): Si es True, solo cambia el contenedor sin recodificar
+    
+    Returns:
+        Path: Archivo convertido
+    """
+    dest = Path(dest)
+    partial = dest.with_name(f"{dest.stem}.part{dest.suffix}")
+    if copy:
+        args = [get_ffmpeg_path(), '-y', '-loglevel', 'error', '-i', str(source), '-vn', '-acodec', 'copy', str(partial)]
+    else:
+        args = build_ffmpeg_args(source, partial, codec, quality)
+    result = subprocess.run(
+        args,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        partial.unlink(missing_ok=True)
+        error = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise Exception(f"FFmpeg falló: {error[-1] if error else result.returncode}")
+    os.replace(partial, dest)
+    return dest
+
+
+class TranscodePool:
+    """
+    Workers de FFmpeg con una cola acotada
+    
+    Cada worker lanza un proceso de FFmpeg, así que la conversión usa todos
+    los núcleos. submit() bloquea cuando hay demasiados archivos esperando:
+    las descargas se frenan en lugar de llenar el disco de temporales.
+    """
+    
+    def __init__(self, workers=TRANSCODE_WORKERS, max_pending=TRANSCODE_QUEUE_SIZE):
+        """
+        Args:
+            workers (int): Conversiones simultáneas
+            max_pending (int): Archivos descargados que pueden esperar turno
+        """
+        self.workers = max(1, int(workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ffmpeg')
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, int(max_pending)))
+        self._lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+    
+    def submit(self, func, *args):
+        """
+        Encola una conversión (bloquea si la cola está llena)
+        
+        Returns:
+            Future: Resultado de func(*args)
+        """
+        start = time.monotonic()
+        self._slots.acquire()
+        waited = time.monotonic() - start
+        with self._lock:
+            self.wait_seconds += waited
+        try:
+            future = self._executor.submit(self._run, func, args)
+        except Exception:
+            self._slots.release()
+            raise
+        return future
+    
+    def _run(self, func, args):
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.busy_seconds += time.monotonic() - start
+            self._slots.release()
+    
+    def shutdown(self, wait=True):
+        """Espera a las conversiones en curso y detiene los workers"""
+        self._executor.shutdown(wait=wait)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -0,0 +1,330 @@
+"""
+Carpetas temporales por trabajo dentro de TEMP_DIR
+"""
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import TEMP_DIR, TEMP_QUOTA_BYTES, TEMP_QUOTA_WAIT, TEMP_ORPHAN_AGE, ensure_dirs
+
+# Reintentos al borrar una carpeta con archivos aún abiertos (Windows)
+CLEANUP_ATTEMPTS = 5
+CLEANUP_RETRY_DELAY = 0.5
+
+_WORKSPACE_RE = re.compile(r'^[a-z]+-(\d+)-[0-9a-f]{8}$')
+# Restos de versiones que usaban nombres fijos dentro de TEMP_DIR
+_LEGACY_PATTERNS = ('preview_audio*', 'preview.*')
+# Carpetas con nombre fijo (una por video y perfil) que sobreviven a un cierre
+# para reanudar los .part; el recolector solo borra las abandonadas hace más
+# de TEMP_ORPHAN_AGE
+STABLE_DIR = 'fetch'
+_STABLE_NAME_RE = re.compile(r'^[\w.-]+$')
+
+
+class Workspace:
+    """Carpeta temporal exclusiva de un trabajo; se borra al liberarla"""
+    
+    def __init__(self, manager, path):
+        self.manager = manager
+        self.path = path
+    
+    def file(self, name):
+        """Ruta de un archivo dentro de la carpeta"""
+        return self.path / name
+    
+    def release(self):
+        """Programa el borrado de la carpeta (no bloquea)"""
+        self.manager.release(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+
+
+class WorkspaceManager:
+    """
+    Reparte carpetas temporales únicas para que descargas y vistas previas
+    simultáneas nunca compartan nombres de archivo
+    
+    El borrado se hace en un hilo aparte, que reintenta más tarde si un
+    archivo sigue abierto, así la reproducción y las descargas no esperan
+    al disco. Al crearse, el gestor borra las carpetas que dejaron procesos
+    que ya no existen.
+    """
+    
+    def __init__(self, root=None, quota_bytes=TEMP_QUOTA_BYTES, quota_wait=TEMP_QUOTA_WAIT):
+        """
+        Args:
+            root (str): Carpeta base (por defecto TEMP_DIR)
+            quota_bytes (int): Espacio máximo que pueden ocupar los temporales
+            quota_wait (float): Segundos que create() espera a que se libere espacio
+        """
+        if root is None:
+            ensure_dirs()
+        self.root = Path(root or TEMP_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self.quota_wait = quota_wait
+        self.removed = 0
+        self._claimed = set()
+        self._claim_lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._freed = threading.Condition()
+        self._cleaner = threading.Thread(target=self._cleanup_loop, name='limpieza-temp', daemon=True)
+        self._cleaner.start()
+        self._pending.put((None, 0))  # Primera tarea: recoger huérfanos
+    
+    def create(self, prefix='job'):
+        """
+        Crea una carpeta temporal nueva
+        
+        Si los temporales superan la cuota, espera a que se liberen; si no
+        se liberan a tiempo, lanza una excepción en lugar de llenar el disco.
+        
+        Args:
+            prefix (str): Tipo de trabajo, para reconocer la carpeta (ej. 'preview')
+        
+        Returns:
+            Workspace: Carpeta lista para usar
+        """
+        self._wait_for_space()
+        path = self.root / f"{prefix}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path.mkdir(parents=True)
+        return Workspace(self, path)
+    
+    def claim(self, name):
+        """
+        Reserva una carpeta de nombre fijo dentro de TEMP_DIR/fetch
+        
+        La carpeta no se borra al cerrar el programa, así que una descarga
+        interrumpida encuentra su .part en el mismo sitio y yt-dlp la reanuda.
+        Dentro de un mismo proceso solo un trabajo puede usarla a la vez.
+        
+        Args:
+            name (str): Nombre de la carpeta (ej. '<id del video>-<perfil>')
+        
+        Returns:
+            Workspace: Carpeta reservada, o None si otro trabajo la está usando
+        """
+        name = re.sub(r'[^\w.-]', '_', name)
+        path = self.root / STABLE_DIR / name
+        with self._claim_lock:
+            if path in self._claimed:
+                return None
+            self._claimed.add(path)
+        try:
+            self._wait_for_space()
+            path.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            self.keep(path)
+            raise
+        return Workspace(self, path)
+    
+    def keep(self, workspace):
+        """
+        Deja de usar una carpeta de claim() sin borrarla, para reanudar su
+        descarga más tarde
+        
+        Args:
+            workspace (Workspace | str): Carpeta reservada con claim()
+        """
+        path = workspace.path if isinstance(workspace, Workspace) else Path(workspace)
+        with self._claim_lock:
+            self._claimed.discard(path)
+    
+    def discard(self, paths):
+        """
+        Borra las carpetas de claim() de descargas que ya no se van a
+        reanudar (ej. al limpiar la cola); las que están en uso se conservan
+        
+        Args:
+            paths (list): Archivos .part guardados en la cola o sus carpetas
+        """
+        for path in paths:
+            path = Path(path)
+            if path.parent.parent == self.root / STABLE_DIR:
+                path = path.parent
+            if path.parent != self.root / STABLE_DIR or not self.owns(path):
+                continue
+            with self._claim_lock:
+                if path in self._claimed:
+                    continue
+                # Nadie puede reclamarla hasta que el hilo de limpieza la borre
+                self._claimed.add(path)
+            self._pending.put((path, 0))
+    
+    def _wait_for_space(self):
+        """Espera a que los temporales bajen de la cuota, o lanza una excepción"""
+        if not self.quota_bytes:
+            return
+        deadline = time.monotonic() + self.quota_wait
+        with self._freed:
+            while self.usage() > self.quota_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(
+                        f"Los temporales ocupan más de {self.quota_bytes / 1e6:.0f} MB "
+                        f"en {self.root}; espera a que terminen las conversiones"
+                    )
+                self._freed.wait(min(remaining, 1.0))
+    
+    def release(self, workspace):
+        """
+        Programa el borrado de una carpeta temporal
+        
+        Args:
+            workspace (Workspace | str): Carpeta creada con create() o claim()
+        """
+        path = workspace.path if isinstance(workspace, Workspace) else Path(workspace)
+        if not self.owns(path):
+            raise Exception(f"{path} no es una carpeta temporal de {self.root}")
+        self._pending.put((path, 0))
+    
+    def owns(self, path):
+        """Indica si una ruta es una carpeta temporal de este gestor"""
+        path = Path(path)
+        if path.parent == self.root / STABLE_DIR:
+            return bool(_STABLE_NAME_RE.match(path.name))
+        return path.parent == self.root and bool(_WORKSPACE_RE.match(path.name))
+    
+    def usage(self):
+        """Bytes que ocupan ahora los temporales"""
+        total = 0
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(folder, name))
+                except OSError:
+                    pass
+        return total
+    
+    def reap_orphans(self):
+        """
+        Borra las carpetas de procesos que ya terminaron, los archivos de
+        versiones anteriores y las carpetas de claim() que nadie ha tocado
+        en TEMP_ORPHAN_AGE (las recientes se conservan para reanudarlas)
+        
+        Returns:
+            int: Carpetas y archivos borrados
+        """
+        removed = 0
+        now = time.time()
+        for entry in self.root.iterdir():
+            match = _WORKSPACE_RE.match(entry.name)
+            if match:
+                pid = int(match.group(1))
+                if pid == os.getpid() or not self._is_orphan(pid, entry, now):
+                    continue
+            elif not any(entry.match(pattern) for pattern in _LEGACY_PATTERNS):
+                continue
+            try:
+                self._remove(entry)
+                removed += 1
+            except OSError as e:
+                print(f"No se pudo borrar {entry}: {e}")
+        return removed + self._reap_stale_fetches(now)
+    
+    def _reap_stale_fetches(self, now):
+        """Borra las carpetas de claim() abandonadas; retorna cuántas"""
+        removed = 0
+        stable = self.root / STABLE_DIR
+        if not stable.is_dir():
+            return 0
+        for entry in stable.iterdir():
+            if now - self._last_modified(entry) <= TEMP_ORPHAN_AGE:
+                continue
+            with self._claim_lock:
+                if entry in self._claimed:
+                    continue
+                self._claimed.add(entry)
+            try:
+                self._remove(entry)
+                removed += 1
+            except OSError as e:
+                print(f"No se pudo borrar {entry}: {e}")
+            finally:
+                self.keep(entry)
+        return removed
+    
+    @staticmethod
+    def _last_modified(path):
+        """Última modificación de una carpeta o de cualquier archivo dentro"""
+        try:
+            latest = path.stat().st_mtime
+            for folder, _, files in os.walk(path):
+                for name in files:
+                    latest = max(latest, os.path.getmtime(os.path.join(folder, name)))
+        except OSError:
+            return time.time()
+        return latest
+    
+    @staticmethod
+    def _is_orphan(pid, path, now):
+        """Indica si la carpeta pertenece a un proceso que ya no existe"""
+        if os.name == 'nt':
+            # En Windows os.kill termina el proceso, así que se decide por antigüedad
+            try:
+                return now - path.stat().st_mtime > TEMP_ORPHAN_AGE
+            except OSError:
+                return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+    
+    @staticmethod
+    def _remove(path):
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    
+    def _cleanup_loop(self):
+        """Hilo de limpieza: borra carpetas y reintenta más tarde las ocupadas"""
+        retries = []
+        while True:
+            timeout = None
+            if retries:
+                timeout = max(0.0, min(when for when, _, _ in retries) - time.monotonic())
+            tasks = []
+            try:
+                tasks.append(self._pending.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            tasks += [(path, attempts) for when, path, attempts in retries if when <= now]
+            retries = [retry for retry in retries if retry[0] > now]
+            
+            for path, attempts in tasks:
+                if path is None:
+                    try:
+                        removed = self.reap_orphans()
+                        if removed:
+                            print(f"Temporales huérfanos eliminados: {removed}")
+                    except Exception as e:
+                        print(f"Error limpiando temporales antiguos: {e}")
+                    continue
+                try:
+                    self._remove(path)
+                    self.removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    if attempts + 1 < CLEANUP_ATTEMPTS:
+                        retries.append((now + CLEANUP_RETRY_DELAY * (attempts + 1), path, attempts + 1))
+                        continue
+                    print(f"No se pudo borrar {path}: {e}")
+                # Una carpeta de claim() no se vuelve a entregar hasta estar borrada
+                self.keep(path)
+            with self._freed:
+                self._freed.notify_all()